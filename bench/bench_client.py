@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Measures latency percentiles and throughput of Client methods against local fake servers
+
+A FakeSocketServer and a FakeRPCServer (see fakeserver.py) are started in
+this process and the client is pointed at them, so results only depend on
+the client, the configured latency and payload size. Caching is disabled
+unless --cached is given, so every call makes its round trip. Methods that
+need a package that is not installed (e.g. web3) are reported as skipped.
+
+    python3 bench/bench_client.py [-n CALLS] [-c CONCURRENCY] [--latency MS] [--orders N] [--batch N] [METHOD ...]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import etherdelta
+from fakeserver import TOKEN, FakeRPCServer, FakeSocketServer
+
+# Throwaway key, only ever used against the fake node
+PRIVATE_KEY = '4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318'
+ACCOUNT = '0x2c7536E3605D9C16a7a3D7b1898e529396a65c23'
+
+
+def methods(client, order, batch):
+    accounts = [ACCOUNT] * batch
+    pairs = [(ACCOUNT, TOKEN)] * batch
+    orders = [order] * batch
+    tokens = ['0x%040x' % (i + 1) for i in range(batch)]
+    expires = 6000000
+    return [
+        ('get_orderbook', lambda: client.get_orderbook(TOKEN)),
+        ('get_sell_orderbook', lambda: client.get_sell_orderbook(TOKEN)),
+        ('get_buy_orderbook', lambda: client.get_buy_orderbook(TOKEN)),
+        ('get_orderbooks', lambda: client.get_orderbooks(tokens)),
+        ('get_order', lambda: client.get_order(TOKEN, order['id'])),
+        ('get_ticker', lambda: client.get_ticker('BAT')),
+        ('get_tickers', lambda: client.get_tickers()),
+        ('get_token_address', lambda: client.get_token_address('BAT')),
+        ('post_order', lambda: client.post_order(order)),
+        ('get_eth_balances', lambda: client.get_eth_balances(accounts)),
+        ('get_token_balances', lambda: client.get_token_balances(pairs)),
+        ('get_etherdelta_token_balances', lambda: client.get_etherdelta_token_balances(pairs)),
+        ('get_amounts_filled', lambda: client.get_amounts_filled(orders)),
+        ('get_available_volumes', lambda: client.get_available_volumes(orders)),
+        ('get_block_number', lambda: client.get_block_number()),
+        ('get_eth_balance', lambda: client.get_eth_balance(ACCOUNT)),
+        ('get_token_balance', lambda: client.get_token_balance(ACCOUNT, TOKEN)),
+        ('get_etherdelta_eth_balance', lambda: client.get_etherdelta_eth_balance(ACCOUNT)),
+        ('get_etherdelta_token_balance', lambda: client.get_etherdelta_token_balance(ACCOUNT, TOKEN)),
+        ('get_amount_filled', lambda: client.get_amount_filled(TOKEN, order)),
+        ('get_available_volume', lambda: client.get_available_volume(TOKEN, order)),
+        # fake orders are not signed, so they are not validated
+        ('plan_fill', lambda: client.plan_fill(TOKEN, 'buy', 5, validate=False)),
+        ('create_order', lambda: client.create_order('buy', expires, 0.0004, 100, TOKEN, None, PRIVATE_KEY)),
+        ('trade', lambda: client.trade(order, 0.0001, PRIVATE_KEY)),
+        ('cancel_order', lambda: client.cancel_order(order, PRIVATE_KEY)),
+        ('cancel_orders', lambda: client.cancel_orders(orders, PRIVATE_KEY, workers=1)),
+    ]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def measure(fn, calls, concurrency):
+    latencies = []
+    lock = threading.Lock()
+
+    def timed(_):
+        t = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        for i in range(calls):
+            timed(i)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(timed, range(calls)))
+    wall = time.perf_counter() - start
+    return sorted(latencies), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('methods', nargs='*', help='methods to run, all by default')
+    parser.add_argument('-n', '--calls', type=int, default=200)
+    parser.add_argument('-c', '--concurrency', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds the fake servers wait before replying')
+    parser.add_argument('--orders', type=int, default=50, help='orders per side in market replies')
+    parser.add_argument('--tickers', type=int, default=100, help='tickers in market replies')
+    parser.add_argument('--batch', type=int, default=20, help='items per bulk call')
+    parser.add_argument('--cached', action='store_true', help='keep the default ticker and market caches')
+    args = parser.parse_args()
+
+    sockets = FakeSocketServer(latency=args.latency / 1000.0, orders=args.orders, tickers=args.tickers).start()
+    rpc = FakeRPCServer(latency=args.latency / 1000.0).start()
+    if args.cached:
+        client = etherdelta.Client(rpc_url=rpc.url)
+    else:
+        client = etherdelta.Client(ticker_ttl=0, market_ttl=0, rpc_url=rpc.url)
+    client.websocket_url = sockets.url
+
+    order = client.get_sell_orderbook(TOKEN)[0]
+    selected = [m for m in methods(client, order, args.batch) if not args.methods or m[0] in args.methods]
+
+    print('%d calls, concurrency %d, latency %.1f ms, %d orders per side, batch %d\n'
+          % (args.calls, args.concurrency, args.latency, args.orders, args.batch))
+    print('%-30s %9s %9s %9s %9s %10s' % ('', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'calls/s'))
+    for name, fn in selected:
+        try:
+            result = fn()
+        except ImportError as e:
+            skipped = e
+        else:
+            # bulk methods return per-item exceptions instead of raising
+            skipped = next((r for r in result if isinstance(r, ImportError)), None) if isinstance(result, list) else None
+            if skipped is None:
+                latencies, wall = measure(fn, args.calls, args.concurrency)
+        if skipped is not None:
+            sys.stdout.write('%-30s skipped: %s\n' % (name, skipped))
+            continue
+        print('%-30s %9.3f %9.3f %9.3f %9.3f %10.1f' % (
+            name, percentile(latencies, 50) * 1e3, percentile(latencies, 90) * 1e3,
+            percentile(latencies, 99) * 1e3, latencies[-1] * 1e3, len(latencies) / wall))
+
+    client.close()
+    sockets.close()
+    rpc.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compares decoding socket.io market frames with json, orjson and the topic-only skip path
+
+Frames are either read from files holding one raw frame each, as received
+from the WebSocket API (e.g. '42["market",{...}]'), or generated with the
+fake server's market payload in a few sizes. Every decoder is checked for
+identical output before it is timed. orjson is only measured when it is
+installed.
+
+    python3 bench/bench_decode.py [-r REPEAT] [FRAME_FILE ...]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from etherdelta import frames
+from fakeserver import TOKEN, fake_market
+
+# (orders per side, tickers, trades)
+SIZES = ((50, 100, 20), (500, 500, 100), (2000, 1500, 500))
+
+
+def generated_frames():
+    for orders, tickers, trades in SIZES:
+        payload = fake_market(TOKEN, orders=orders, tickers=tickers, trades=trades)
+        name = '%d orders, %d tickers' % (orders, tickers)
+        yield name, '42' + json.dumps(['market', payload])
+
+
+def recorded_frames(paths):
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            yield os.path.basename(path), f.read().strip()
+
+
+def decoders():
+    result = [('json', lambda message: json.loads(message[2:]))]
+    if frames.orjson is not None:
+        result.append(('orjson', lambda message: frames.orjson.loads(message[2:])))
+    return result
+
+
+def best(fn, message, repeat):
+    number = max(1, int(2e6 // len(message)))
+    return min(timeit.repeat(lambda: fn(message), number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('frames', nargs='*', help='files holding one raw frame each')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    selected = list(recorded_frames(args.frames)) if args.frames else list(generated_frames())
+    if frames.orjson is None:
+        print('orjson is not installed, only json is measured\n')
+    for name, message in selected:
+        expected = json.loads(message[2:])
+        for decoder, fn in decoders():
+            if fn(message) != expected:
+                raise SystemExit('%s decodes %s differently' % (decoder, name))
+        if frames.frame_topic(message) != expected[0]:
+            raise SystemExit('frame_topic reads the wrong topic from ' + name)
+
+        print('%s, %.1f kB' % (name, len(message) / 1024.0))
+        baseline = None
+        for decoder, fn in decoders() + [('skip (frame_topic)', frames.frame_topic)]:
+            seconds = best(fn, message, args.repeat)
+            baseline = baseline or seconds
+            print('  %-20s %10.3f ms %8.1fx' % (decoder, seconds * 1e3, baseline / seconds))
+        print('')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compares order hashing through solidity_sha256 with the packed-bytes fast path
+
+Every implementation is checked for identical output on the same random
+orders before it is timed. solidity_sha256 is only measured when web3 is
+installed; the hex round trip it performs is always measured with a
+stdlib replica.
+
+    python3 bench/bench_hash.py [-n ORDERS] [-r REPEAT]
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etherdelta import addressEtherDelta
+from etherdelta.signing import ORDER_TYPES, order_hash, order_hashes, solidity_sha256
+
+
+def random_orders(n, seed=1):
+    rng = random.Random(seed)
+    orders = []
+    for _ in range(n):
+        token = '0x' + '%040x' % rng.getrandbits(160)
+        amount = rng.getrandbits(72)
+        amountBase = rng.getrandbits(64)
+        if rng.random() < 0.5:
+            tokenGet, amountGet, tokenGive, amountGive = token, amount, '0x' + '0' * 40, amountBase
+        else:
+            tokenGet, amountGet, tokenGive, amountGive = '0x' + '0' * 40, amountBase, token, amount
+        orders.append([addressEtherDelta, tokenGet, amountGet, tokenGive, amountGive, rng.randint(5000000, 6000000), rng.randint(0, 10000000000)])
+    return orders
+
+
+def hex_round_trip(values):
+    # Replica of what solidity_sha256 does for this layout: hex-encode each
+    # value, join the strings, convert back to bytes and hash
+    parts = []
+    for abi_type, value in zip(ORDER_TYPES, values):
+        if abi_type == 'address':
+            parts.append(value[2:].lower().rjust(40, '0'))
+        else:
+            parts.append('%064x' % value)
+    return hashlib.sha256(bytes.fromhex(''.join(parts))).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--orders', type=int, default=10000)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    orders = random_orders(args.orders)
+    expected = [hex_round_trip(o) for o in orders]
+
+    candidates = [
+        ('hex round trip', lambda: [hex_round_trip(o) for o in orders]),
+        ('order_hash', lambda: [order_hash(*o) for o in orders]),
+        ('order_hashes', lambda: order_hashes(orders)),
+    ]
+    try:
+        import web3  # noqa: F401
+        candidates.insert(0, ('solidity_sha256', lambda: [solidity_sha256(ORDER_TYPES, o) for o in orders]))
+    except ImportError:
+        print('web3 is not installed, skipping solidity_sha256\n')
+
+    results = {}
+    print('%-18s %12s %12s %8s' % ('', 'best s', 'us/order', 'speedup'))
+    for name, fn in candidates:
+        assert fn() == expected, name + ' does not match'
+        results[name] = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+    baseline = results[candidates[0][0]]
+    for name, _ in candidates:
+        best = results[name]
+        print('%-18s %12.4f %12.2f %7.1fx' % (name, best, best / len(orders) * 1e6, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Measures the cold-start cost of `import etherdelta` and of creating a Client
+
+Each sample runs in a fresh interpreter so nothing is cached in-process.
+
+    python3 bench/bench_import.py [-n RUNS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPETS = [
+    ('python startup', 'pass'),
+    ('import etherdelta', 'import etherdelta'),
+    ('etherdelta.Client()', 'import etherdelta; etherdelta.Client()'),
+]
+
+TIMER = '''
+import time
+t = time.perf_counter()
+{code}
+print(time.perf_counter() - t)
+'''
+
+
+def sample(code):
+    out = subprocess.check_output([sys.executable, '-c', TIMER.format(code=code)], cwd=ROOT)
+    return float(out)
+
+
+def slowest_imports(n=10):
+    # -X importtime reports cumulative microseconds per imported module on stderr
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import etherdelta'],
+                          cwd=ROOT, stderr=subprocess.PIPE, universal_newlines=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    print('%-24s %10s %10s %10s' % ('', 'min ms', 'median ms', 'max ms'))
+    for name, code in SNIPPETS:
+        times = [sample(code) * 1000 for _ in range(args.runs)]
+        print('%-24s %10.2f %10.2f %10.2f' % (name, min(times), statistics.median(times), max(times)))
+
+    print('\nslowest imports (cumulative ms)')
+    for cumulative, module in slowest_imports():
+        print('%10.2f %s' % (cumulative / 1000.0, module))
+    print('\nweb3 imported by `import etherdelta`: %s' % subprocess.check_output(
+        [sys.executable, '-c', 'import sys, etherdelta; print("web3" in sys.modules)'], cwd=ROOT).decode().strip())
+
+
+if __name__ == '__main__':
+    main()
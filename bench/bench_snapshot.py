@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Times saving and restoring order book snapshots against a plain JSON file
+
+Books of generated orders are written with write_snapshot and with
+json.dump, then read back: opening the snapshot, decoding every book,
+decoding every book without expired orders, and seeding LocalOrderBooks
+from it as restore_snapshot does. The restored books are checked against
+the saved ones before anything is timed.
+
+    python3 bench/bench_snapshot.py [-n ORDERS] [-t TOKENS] [-r REPEAT]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from etherdelta import LocalOrderBook, frames
+from etherdelta.snapshot import Snapshot, write_snapshot
+from fakeserver import _hex, fake_market, fake_order
+
+BLOCK_NUMBER = 5500000
+
+
+def fake_books(orders, tokens, seed=1):
+    rng = random.Random(seed)
+    per_side = max(1, orders // (2 * tokens))
+    books = {}
+    for _ in range(tokens):
+        token_addr = _hex(rng, 20)
+        books[token_addr] = {
+            'buys': [fake_order(rng, token_addr, 'buy') for _ in range(per_side)],
+            'sells': [fake_order(rng, token_addr, 'sell') for _ in range(per_side)],
+        }
+    return books
+
+
+def best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--orders', type=int, default=50000)
+    parser.add_argument('-t', '--tokens', type=int, default=50)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    books = fake_books(args.orders, args.tokens)
+    tickers = fake_market('', tickers=args.tokens)['returnTicker']
+    orders = sum(len(book['buys']) + len(book['sells']) for book in books.values())
+    directory = tempfile.mkdtemp()
+    snapshot_path = os.path.join(directory, 'books.snap')
+    json_path = os.path.join(directory, 'books.json')
+
+    def save_json():
+        with open(json_path, 'w') as f:
+            json.dump({'books': books, 'tickers': tickers, 'block_number': BLOCK_NUMBER}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load_json():
+        with open(json_path, 'rb') as f:
+            return json.load(f)
+
+    def open_snapshot():
+        Snapshot(snapshot_path).close()
+
+    def decode(block_number=None):
+        with Snapshot(snapshot_path) as snapshot:
+            return snapshot.books(block_number)
+
+    def restore():
+        with Snapshot(snapshot_path) as snapshot:
+            for token_addr in snapshot.tokens:
+                LocalOrderBook(token_addr).load_snapshot(snapshot.book(token_addr, BLOCK_NUMBER))
+
+    write_snapshot(snapshot_path, books, tickers, BLOCK_NUMBER)
+    save_json()
+    if decode() != books or load_json()['books'] != books:
+        raise SystemExit('restored books differ from the saved ones')
+
+    print('%d orders in %d books, orjson %s' % (orders, len(books), 'installed' if frames.orjson else 'not installed'))
+    print('  snapshot %.1f MB, JSON %.1f MB\n' % (os.path.getsize(snapshot_path) / 1e6, os.path.getsize(json_path) / 1e6))
+    timings = [
+        ('save, JSON', save_json),
+        ('save, snapshot', lambda: write_snapshot(snapshot_path, books, tickers, BLOCK_NUMBER)),
+        ('load, JSON', load_json),
+        ('open snapshot', open_snapshot),
+        ('decode every book', decode),
+        ('decode unexpired orders', lambda: decode(BLOCK_NUMBER)),
+        ('restore LocalOrderBooks', restore),
+    ]
+    for name, fn in timings:
+        seconds = best(fn, args.repeat)
+        print('  %-24s %10.3f ms %10.2f us/order' % (name, seconds * 1e3, seconds * 1e6 / orders))
+    for path in (snapshot_path, json_path):
+        os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the EtherDelta WebSocket API and an Ethereum JSON-RPC node
+
+FakeSocketServer speaks socket.io (EIO=3) over a stdlib RFC 6455 WebSocket
+and answers `getMarket` with `market` and `message` with `messageResult`.
+FakeRPCServer answers eth_call, eth_getBalance, eth_blockNumber,
+eth_getBlockByNumber, eth_getTransactionCount, eth_gasPrice, eth_getLogs
+and eth_sendRawTransaction, including batches. Both add a configurable latency
+to every reply, and the market payload size is set by the number of orders,
+tickers and trades.
+
+    python3 bench/fakeserver.py [--latency MS] [--jitter MS] [--orders N] [--tickers N]
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+TOKEN = '0x0d8775f648430679a709e98d2b0cb6250d2887ef'
+
+
+def _hex(rng, nbytes):
+    return '0x' + '%0*x' % (nbytes * 2, rng.getrandbits(nbytes * 8))
+
+
+def fake_order(rng, token_addr, side):
+    """
+    Returns an order shaped like the ones in a `market` reply
+    """
+    price = rng.uniform(0.0001, 0.001)
+    amount = rng.randint(10 ** 18, 10 ** 22)
+    amountBase = int(amount * price)
+    if side == 'buy':
+        tokenGet, amountGet, tokenGive, amountGive = token_addr, amount, ZERO_ADDRESS, amountBase
+    else:
+        tokenGet, amountGet, tokenGive, amountGive = ZERO_ADDRESS, amountBase, token_addr, amount
+    return {
+        'id': _hex(rng, 32)[2:] + '_' + side,
+        'user': _hex(rng, 20),
+        'tokenGet': tokenGet,
+        'amountGet': str(amountGet),
+        'tokenGive': tokenGive,
+        'amountGive': str(amountGive),
+        'expires': str(rng.randint(5000000, 6000000)),
+        'nonce': str(rng.randint(0, 10000000000)),
+        'v': rng.choice([27, 28]),
+        'r': _hex(rng, 32),
+        's': _hex(rng, 32),
+        'price': repr(price),
+        'amount': str(amount if side == 'buy' else -amount),
+        'availableVolume': str(amount),
+        'ethAvailableVolume': repr(amount / 1e18),
+        'availableVolumeBase': str(amountBase),
+        'ethAvailableVolumeBase': repr(amountBase / 1e18),
+        'amountFilled': None,
+        'updated': '2018-02-02T19:42:59.089Z',
+    }
+
+
+def fake_market(token_addr, orders=50, tickers=100, trades=20, seed=1):
+    """
+    Returns a `market` payload with the given number of orders per side,
+    tickers and trades
+
+    :return: payload
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    market = {
+        'returnTicker': {},
+        'trades': [],
+        'orders': {
+            'buys': [fake_order(rng, token_addr, 'buy') for _ in range(orders)] if token_addr else [],
+            'sells': [fake_order(rng, token_addr, 'sell') for _ in range(orders)] if token_addr else [],
+        },
+    }
+    for i in range(tickers):
+        address = TOKEN if i == 0 else _hex(rng, 20)
+        market['returnTicker']['ETH_' + ('BAT' if i == 0 else 'T%d' % i)] = {
+            'tokenAddr': address, 'quoteVolume': 1000.0, 'baseVolume': 1.0, 'last': 0.0004,
+            'percentChange': 0, 'bid': 0.0004, 'ask': 0.00041}
+    for _ in range(trades if token_addr else 0):
+        market['trades'].append({'txHash': _hex(rng, 32), 'date': '2018-02-02T19:42:59.000Z', 'price': '0.0004',
+                                 'side': rng.choice(['buy', 'sell']), 'amount': '100', 'amountBase': '0.04',
+                                 'buyer': _hex(rng, 20), 'seller': _hex(rng, 20), 'tokenAddr': token_addr})
+    return market
+
+
+def _recv_exact(conn, n):
+    data = b''
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+def _read_frame(conn):
+    header = _recv_exact(conn, 2)
+    opcode = header[0] & 0x0f
+    length = header[1] & 0x7f
+    if length == 126:
+        length = struct.unpack('>H', _recv_exact(conn, 2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', _recv_exact(conn, 8))[0]
+    mask = _recv_exact(conn, 4) if header[1] & 0x80 else None
+    data = _recv_exact(conn, length)
+    if mask:
+        # unmask 4 bytes at a time through one big integer XOR
+        key = int.from_bytes((mask * (length // 4 + 1))[:length], 'big')
+        data = (int.from_bytes(data, 'big') ^ key).to_bytes(length, 'big')
+    return opcode, data
+
+
+def _frame(data, opcode=1):
+    n = len(data)
+    if n < 126:
+        header = struct.pack('>BB', 0x80 | opcode, n)
+    elif n < 65536:
+        header = struct.pack('>BBH', 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack('>BBQ', 0x80 | opcode, 127, n)
+    return header + data
+
+
+class FakeSocketServer(object):
+    """
+    socket.io (EIO=3) server answering getMarket and message
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, orders=50, tickers=100, trades=20, ping_interval=25000, jitter=0):
+        """
+        :param latency: seconds before each reply
+        :type latency: float
+        :param jitter: up to this many extra seconds before each reply, so replies can arrive out of order
+        :type jitter: float
+        :param orders: orders per side in `market` replies for a token
+        :type orders: int
+        :param tickers: tickers in `market` replies
+        :type tickers: int
+        :param trades: trades in `market` replies for a token
+        :type trades: int
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.orders = orders
+        self.tickers = tickers
+        self.trades = trades
+        self.ping_interval = ping_interval
+        self.requests = 0
+        self._markets = {}
+        self._lock = threading.Lock()
+        self._sock = socket.socket()
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(64)
+        self.host, self.port = self._sock.getsockname()[:2]
+        self._closed = False
+
+    @property
+    def url(self):
+        return 'ws://%s:%d/socket.io/?EIO=3&transport=websocket' % (self.host, self.port)
+
+    def start(self):
+        thread = threading.Thread(target=self._accept, name='fake-socket-server')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def close(self):
+        self._closed = True
+        self._sock.close()
+
+    def market(self, token_addr):
+        # replies are encoded once per token and reused
+        with self._lock:
+            frame = self._markets.get(token_addr)
+            if frame is None:
+                payload = fake_market(token_addr, self.orders, self.tickers, self.trades)
+                frame = self._markets[token_addr] = _frame(('42' + json.dumps(['market', payload])).encode('utf-8'))
+            return frame
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            thread = threading.Thread(target=self._serve, args=(conn,), name='fake-socket-conn')
+            thread.daemon = True
+            thread.start()
+
+    def _handshake(self, conn):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = conn.recv(4096)
+            if not chunk:
+                raise EOFError
+            request += chunk
+        key = b''
+        for line in request.split(b'\r\n'):
+            if line.lower().startswith(b'sec-websocket-key:'):
+                key = line.split(b':', 1)[1].strip()
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+        conn.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+
+    def _serve(self, conn):
+        send_lock = threading.Lock()
+
+        def send(frame):
+            with send_lock:
+                conn.sendall(frame)
+
+        def reply(frame):
+            delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+            if delay:
+                timer = threading.Timer(delay, send, args=(frame,))
+                timer.daemon = True
+                timer.start()
+            else:
+                send(frame)
+
+        try:
+            self._handshake(conn)
+            send(_frame(('0' + json.dumps({'sid': 'fake', 'upgrades': [], 'pingInterval': self.ping_interval,
+                                            'pingTimeout': 60000})).encode('utf-8')))
+            send(_frame(b'40'))
+            while not self._closed:
+                opcode, data = _read_frame(conn)
+                if opcode == 8:
+                    send(_frame(b'', 8))
+                    return
+                if opcode == 9:
+                    send(_frame(data, 10))
+                    continue
+                if data == b'2':
+                    send(_frame(b'3'))
+                    continue
+                if data[:2] != b'42':
+                    continue
+                event = json.loads(data[2:].decode('utf-8'))
+                with self._lock:
+                    self.requests += 1
+                if event[0] == 'getMarket':
+                    arg = event[1] if len(event) > 1 else {}
+                    reply(self.market((arg or {}).get('token') or ''))
+                elif event[0] == 'message':
+                    reply(_frame(('42' + json.dumps(['messageResult', [202, {'ok': True}]])).encode('utf-8')))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+
+class FakeRPCServer(object):
+    """
+    Ethereum JSON-RPC stub over HTTP, with batch support
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, block_number=5000000, balance=10 ** 18, block_time=None):
+        """
+        :param latency: seconds before each HTTP response
+        :type latency: float
+        :param block_number: block number reported by eth_blockNumber
+        :type block_number: int
+        :param block_time: seconds between blocks, None to stay at block_number
+        :type block_time: float
+        :param balance: value returned by eth_getBalance and eth_call
+        :type balance: int
+        """
+        self.latency = latency
+        self.block_number = block_number
+        self.block_time = block_time
+        self.balance = balance
+        self._started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                response = json.dumps(server.handle(json.loads(body.decode('utf-8')))).encode('utf-8')
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+
+    @property
+    def url(self):
+        return 'http://%s:%d/' % (self.host, self.port)
+
+    def start(self):
+        thread = threading.Thread(target=self._httpd.serve_forever, name='fake-rpc-server')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def head(self):
+        """
+        Returns the current (block number, timestamp)
+        """
+        if not self.block_time:
+            return self.block_number, int(self._started)
+        blocks = int((time.time() - self._started) / self.block_time)
+        return self.block_number + blocks, int(self._started + blocks * self.block_time)
+
+    def handle(self, request):
+        if isinstance(request, list):
+            return [self._call(item) for item in request]
+        return self._call(request)
+
+    def _call(self, request):
+        with self._lock:
+            self.requests += 1
+        method = request.get('method')
+        params = request.get('params') or []
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        if method in ('eth_call', 'eth_getBalance'):
+            response['result'] = '0x%064x' % self.balance
+        elif method == 'eth_blockNumber':
+            response['result'] = hex(self.head()[0])
+        elif method == 'eth_getBlockByNumber':
+            number, timestamp = self.head()
+            response['result'] = {'number': hex(number), 'hash': '0x%064x' % number, 'timestamp': hex(timestamp)}
+        elif method == 'eth_getTransactionCount':
+            response['result'] = '0x0'
+        elif method == 'eth_gasPrice':
+            response['result'] = hex(10 ** 9)
+        elif method == 'eth_getLogs':
+            response['result'] = []
+        elif method == 'eth_sendRawTransaction':
+            raw = params[0] if params else ''
+            response['result'] = '0x' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        else:
+            response['error'] = {'code': -32601, 'message': 'the method ' + str(method) + ' does not exist'}
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds before each reply')
+    parser.add_argument('--jitter', type=float, default=0, help='up to this many extra milliseconds before each socket reply')
+    parser.add_argument('--orders', type=int, default=50, help='orders per side in market replies')
+    parser.add_argument('--tickers', type=int, default=100, help='tickers in market replies')
+    parser.add_argument('--socket-port', type=int, default=8765)
+    parser.add_argument('--rpc-port', type=int, default=8545)
+    args = parser.parse_args()
+    sockets = FakeSocketServer(port=args.socket_port, latency=args.latency / 1000.0, orders=args.orders,
+                               tickers=args.tickers, jitter=args.jitter / 1000.0).start()
+    rpc = FakeRPCServer(port=args.rpc_port, latency=args.latency / 1000.0).start()
+    print('socket.io: ' + sockets.url)
+    print('JSON-RPC:  ' + rpc.url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
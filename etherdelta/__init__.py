@@ -1,46 +1,260 @@
 #!/usr/bin/python3
 __version__ = '0.0.1'
 
-import hashlib
-import websocket
-import _thread
-import time
 import json
+import logging
 import random
-import sys
 import os
-import web3
-from web3 import Web3, HTTPProvider
-from operator import itemgetter
-from collections import OrderedDict
-# The functions below are used for our solidity_sha256() function
-#from web3.utils.normalizers import abi_ens_resolver
-from web3.utils.abi import map_abi_data
-from eth_utils import add_0x_prefix, remove_0x_prefix
-from web3.utils.encoding import hex_encode_abi_type
+import threading
+import time
+from itertools import islice
+from .lazy import LazyImport
+from .session import SocketSession, PooledSession, SessionError
+from .order import Order, to_decimal
+from .orderbook import LocalOrderBook, OrderIndex
+from .subscription import Subscription, EVENTS
+from .cache import TTLCache, TickerIndex
+from .rpc import JSONRPC, PooledJSONRPC, ProviderJSONRPC, RPCError, http_endpoint, rpc_provider
+from .pool import EndpointPool
+from .abi import load_abi, get_contract, encode_call
+from .signing import solidity_sha256, sign_order, sign_orders, sign_transactions
+from .nonce import NonceManager
+from .chain import ChainHead
+from .validation import InvalidOrder, check_orders, order_row
+from .snapshot import Snapshot, SnapshotError, write_snapshot
+from .planner import Fill, FillPlan, eligible_orders, order_id, plan_fills
+from .metrics import Hooks, MetricsCollector
+from . import history
+
+# web3 is heavy to import, so it is only loaded on first use
+Web3 = LazyImport('web3', 'Web3')
+HTTPProvider = LazyImport('web3', 'HTTPProvider')
+HexBytes = LazyImport('hexbytes', 'HexBytes')
 
 # etherdelta_2's contract address
 addressEtherDelta = '0x8d12A197cB00D4747a1fe03395095ce2A5CC6819'
-w3 = Web3(HTTPProvider('https://mainnet.infura.io/'))
+rpcURL = 'https://mainnet.infura.io/'
+websocketURL = 'wss://socket05.etherdelta.com/socket.io/?EIO=3&transport=websocket'
+forkdeltaWebsocketURL = 'wss://api.forkdelta.com/socket.io/?EIO=3&transport=websocket'
+# Transaction defaults for trade and cancel_order; the gas price is only
+# used when the node's estimate is not available
+defaultGas = 250000
+defaultGasPrice = 1000000000    # 1 Gwei
+_w3 = None
+
+logger = logging.getLogger(__name__)
+
+def log_event(level, event, **fields):
+    """
+    Logs an event as `event key=value ...`, with the event name and fields
+    also attached to the record (record.event, record.fields) for structured
+    handlers. Nothing is formatted unless the level is enabled.
+    """
+    if logger.isEnabledFor(level):
+        message = ' '.join([event] + ['%s=%s' % (k, v) for k, v in fields.items()])
+        logger.log(level, message, extra={'event': event, 'fields': fields})
+
+def get_default_web3():
+    """
+    Returns the Web3 instance shared by clients created without a provider,
+    connected to rpcURL on first use
+
+    :return: web3
+    :rtype: Web3
+    """
+    global _w3
+    if _w3 is None:
+        _w3 = Web3(HTTPProvider(rpcURL))
+    return _w3
+
+def __getattr__(name):
+    # Module attributes that are built on first access (PEP 562)
+    if name == 'w3':
+        return get_default_web3()
+    if name in ('AsyncClient', 'AsyncForkDeltaClient'):
+        from . import aio
+        return getattr(aio, name)
+    raise AttributeError('module ' + __name__ + ' has no attribute ' + name)
 
 class Client:
     ws = None
     websocket_url = None
+    session = None
 
-    def __init__(self):
-        self.websocket_url = 'wss://socket05.etherdelta.com/socket.io/?EIO=3&transport=websocket'
+    def __init__(self, ticker_ttl=60, market_ttl=5, rpc_url=None, provider=None, hooks=None, websocket_urls=None, hedge_delay=None):
+        """
+        :param ticker_ttl: seconds to cache ticker data
+        :type ticker_ttl: float
+        :param market_ttl: seconds to reuse a market snapshot for order lookups
+        :type market_ttl: float
+        :param rpc_url: JSON-RPC endpoint, or a list of endpoints to pool, defaults to rpcURL
+                        unless a provider is given
+        :type rpc_url: str
+        :param provider: web3 provider, defaults to an HTTPProvider for rpc_url; JSON-RPC reads
+                         go through it too unless rpc_url is given
+        :type provider: BaseProvider
+        :param hooks: instrumentation hooks for the socket and JSON-RPC calls, e.g. a MetricsCollector
+        :type hooks: Hooks
+        :param websocket_urls: WebSocket endpoints to pool instead of websocket_url
+        :type websocket_urls: list
+        :param hedge_delay: seconds before a pending read is also sent to the next pooled endpoint, None to never hedge
+        :type hedge_delay: float
+        """
+        self.hooks = hooks
+        self.websocket_url = websocketURL
+        self.websocket_urls = websocket_urls
+        self.hedge_delay = hedge_delay
+        self.market_cache = TTLCache(ticker_ttl)
+        self.order_cache = TTLCache(market_ttl)
+        # results of balance and volume reads, keyed by block number and
+        # dropped whenever the chain head moves
+        self.read_cache = TTLCache(float('inf'))
+        self.chain_head = None
+        # local order books by token, saved by save_snapshot
+        self.local_books = {}
+        self._snapshot_stop = None
+        if rpc_url is None and provider is not None:
+            rpc_url = http_endpoint(provider)
+        self.rpc_url = rpc_url
+        self.provider = provider
+        self._w3 = None
+        if isinstance(rpc_url, (list, tuple)):
+            self.rpc = PooledJSONRPC(rpc_url, hooks=hooks, hedge_delay=hedge_delay)
+        elif provider is not None and rpc_url == http_endpoint(provider):
+            self.rpc = ProviderJSONRPC(provider, hooks=hooks)
+        else:
+            self.rpc = JSONRPC(rpc_url or rpcURL, hooks=hooks)
+        self.nonce_manager = NonceManager(self._fetch_nonce)
         self.bootstrap()
 
     def bootstrap(self):
-        token_abi = None
-        with open(os.path.join(os.path.dirname(__file__), './contracts/token.json'), 'r') as token_abi_definition:
-            token_abi = json.load(token_abi_definition)
-        self.token_abi = token_abi
-        global addressEtherDelta
-        addressEtherDelta = Web3.toChecksumAddress(addressEtherDelta)
-        with open(os.path.join(os.path.dirname(__file__), './contracts/etherdelta.json'), 'r') as abi_definition:
-            abiEtherDelta = json.load(abi_definition)
-        self.contractEtherDelta = w3.eth.contract(address=addressEtherDelta, abi=abiEtherDelta)
+        # ABIs are parsed once per process and contract objects are shared
+        # between clients, see etherdelta.abi
+        self.token_abi = load_abi('token')
+
+    @property
+    def w3(self):
+        """
+        Web3 instance of this client, created on first use
+        """
+        if self._w3 is None:
+            if self.provider is not None:
+                self._w3 = Web3(self.provider)
+            elif isinstance(self.rpc, PooledJSONRPC):
+                self._w3 = Web3(rpc_provider(self.rpc))
+            elif self.rpc_url is not None:
+                self._w3 = Web3(HTTPProvider(self.rpc_url))
+            else:
+                self._w3 = get_default_web3()
+        return self._w3
+
+    @property
+    def contractEtherDelta(self):
+        return get_contract(self.w3, 'etherdelta', addressEtherDelta)
+
+    def _fetch_nonce(self, account):
+        return self.w3.eth.getTransactionCount(account, 'pending')
+
+    def get_session(self):
+        """
+        Returns the persistent WebSocket session, creating it on first use
+
+        :return: session
+        :rtype: SocketSession
+        """
+        if self.session is None:
+            if self.websocket_urls:
+                self.session = PooledSession(self.websocket_urls, self.hedge_delay, hooks=self.hooks)
+            else:
+                self.session = SocketSession(self.websocket_url, hooks=self.hooks)
+        return self.session
+
+    def close(self):
+        """
+        Closes the persistent WebSocket session and stops the chain head and
+        periodic snapshots
+        """
+        self.stop_snapshots()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        if self.chain_head is not None:
+            self.chain_head.close()
+            self.chain_head = None
+
+    def invalidate_cache(self):
+        """
+        Drops cached market data and reads so the next call fetches them again
+        """
+        self.market_cache.invalidate()
+        self.order_cache.invalidate()
+        self.read_cache.invalidate()
+
+    def start_chain_head(self, interval=2, ws_url=None):
+        """
+        Starts tracking the chain head in the background, replacing the
+        current tracker with one using these settings
+
+        :param interval: seconds between polls of the node
+        :type interval: float
+        :param ws_url: WebSocket JSON-RPC endpoint to subscribe to new heads on instead of polling
+        :type ws_url: str
+        :return: chain head
+        :rtype: ChainHead
+        """
+        if self.chain_head is not None:
+            self.chain_head.close()
+        head = ChainHead(self._head_rpc(), interval, ws_url)
+        head.add_listener(self._on_new_block)
+        self.chain_head = head
+        return head.start()
+
+    def get_chain_head(self):
+        """
+        Returns the chain head tracker, creating it on first use
+
+        The tracker only refreshes when asked until it is started, e.g. with
+        client.get_chain_head().start() or start_chain_head.
+
+        :return: chain head
+        :rtype: ChainHead
+        """
+        if self.chain_head is None:
+            head = ChainHead(self._head_rpc())
+            head.add_listener(self._on_new_block)
+            self.chain_head = head
+        return self.chain_head
+
+    def _head_rpc(self):
+        return self.rpc
+
+    def _on_new_block(self, number):
+        self.read_cache.invalidate()
+
+    def _get_order_index(self, token_addr):
+        return self.order_cache.get(token_addr.lower(), lambda: self._fetch_order_index(token_addr))
+
+    def _fetch_order_index(self, token_addr):
+        msg = self._get_market(token_addr)
+        if msg and msg['orders']:
+            index = OrderIndex(msg['orders'])
+            self.order_cache.put(token_addr.lower(), index)
+            return index
+        return None
+
+    def _get_ticker_index(self):
+        def fetch():
+            msg = self._get_market('', '0x0000000000000000000000000000000000000000')
+            if msg and msg['returnTicker']:
+                return TickerIndex(msg['returnTicker'])
+            return None
+        return self.market_cache.get('tickers', fetch) or TickerIndex({})
+
+    def _get_market(self, token_addr='', user='', timeout=30, max_tries=3):
+        emitMessage = '42["getMarket",' + json.JSONEncoder().encode({'token': token_addr, 'user': user}) + ']'
+        # replies are matched to their token in case they arrive out of order
+        key = token_addr.lower() if token_addr else None
+        return self.get_session().request(emitMessage, 'market', timeout, max_tries, key)
 
     def get_eth_balance(self, account):
         """
@@ -52,8 +266,8 @@ class Client:
         :rtype: float
         """
         account = Web3.toChecksumAddress(account)
-        balance = w3.eth.getBalance(account)
-        return w3.fromWei(balance, 'ether')
+        balance = self.w3.eth.getBalance(account)
+        return self.w3.fromWei(balance, 'ether')
 
     def get_token_balance(self, account, token_addr):
         """
@@ -67,10 +281,10 @@ class Client:
         :rtype: int
         """
         token_addr = Web3.toChecksumAddress(token_addr)
-        contractToken = w3.eth.contract(address=token_addr, abi=self.token_abi)
+        contractToken = get_contract(self.w3, 'token', token_addr)
         account = Web3.toChecksumAddress(account)
         balance = contractToken.call().balanceOf(account)
-        return w3.fromWei(balance, 'ether')
+        return self.w3.fromWei(balance, 'ether')
 
     def get_etherdelta_eth_balance(self, account):
         """
@@ -83,7 +297,7 @@ class Client:
         """
         account = Web3.toChecksumAddress(account)
         balance = self.contractEtherDelta.call().balanceOf(token='0x0000000000000000000000000000000000000000', user=account)
-        return w3.fromWei(balance, 'ether')
+        return self.w3.fromWei(balance, 'ether')
 
     def get_etherdelta_token_balance(self, account, token_addr):
         """
@@ -100,7 +314,7 @@ class Client:
         balance = 0
         if token_addr:
             balance = self.contractEtherDelta.call().balanceOf(token=token_addr, user=account)
-        return w3.fromWei(balance, 'ether')
+        return self.w3.fromWei(balance, 'ether')
 
     def get_token_address(self, symbol):
         """
@@ -111,15 +325,7 @@ class Client:
         :return: token address
         :rtype: str
         """
-        ticker = self.get_ticker(symbol)
-        tokenAddr = ''
-        if ticker != None:
-            if ticker:
-                if hasattr(ticker, 'result'):
-                    if ticker.result:
-                        if ticker.result['tokenAddr']:
-                            tokenAddr = ticker.result['tokenAddr']
-        return tokenAddr
+        return self._get_ticker_index().token_address(symbol)
 
     def get_orderbook(self, token_addr):
         """
@@ -130,19 +336,10 @@ class Client:
         :return: orderbook
         :rtype: list
         """
-        result = {}
-        def done():
-            yield result
-        def callback(msg):
-            nonlocal result
-            self.ws.close()
-            if msg:
-                if msg['orders']:
-                    result = msg['orders']
-            done()
-        emitMessage = '42["getMarket",{"token":"' + token_addr + '","user":""}]'
-        self.listen_once_and_close('getMarket', emitMessage, 'market', callback)
-        return next(done())
+        index = self._fetch_order_index(token_addr)
+        if index is None:
+            return {}
+        return index.snapshot
 
     def get_order(self, token_addr, order_id):
         """
@@ -155,25 +352,10 @@ class Client:
         :return: order
         :rtype: object
         """
-        result = {}
-        def done():
-            yield result
-        def callback(msg):
-            nonlocal result
-            self.ws.close()
-            if msg:
-                if msg['orders']:
-                    orders = msg['orders']
-                    for o in orders['sells']:
-                        if o['id'] == order_id:
-                            result = o
-                    for o in orders['buys']:
-                        if o['id'] == order_id:
-                            result = o
-            done()
-        emitMessage = '42["getMarket",{"token":"' + token_addr + '","user":""}]'
-        self.listen_once_and_close('getMarket', emitMessage, 'market', callback)
-        return next(done())
+        index = self._get_order_index(token_addr)
+        if index is None:
+            return {}
+        return index.get(order_id) or {}
 
     def get_sell_orderbook(self, token_addr):
         """
@@ -184,19 +366,8 @@ class Client:
         :return: sell orderbook list
         :rtype: list
         """
-        result = []
-        def done():
-            yield result
-        def callback(msg):
-            nonlocal result
-            self.ws.close()
-            if msg['orders']:
-                if msg['orders']['sells']:
-                    result = msg['orders']['sells']
-            done()
-        emitMessage = '42["getMarket",{"token":"' + token_addr + '","user":""}]'
-        self.listen_once_and_close('getMarket', emitMessage, 'market', callback)
-        return next(done())
+        orders = self.get_orderbook(token_addr)
+        return orders.get('sells') or []
 
     def get_buy_orderbook(self, token_addr):
         """
@@ -207,20 +378,255 @@ class Client:
         :return: buy orderbook list
         :rtype: list
         """
-        result = []
-        def done():
-            yield result
-        def callback(msg):
-            nonlocal result
-            self.ws.close()
-            if msg['orders']:
-                if msg['orders']['buys']:
-                    result = msg['orders']['buys']
-                    return done()
-            return done()
-        emitMessage = '42["getMarket",{"token":"' + token_addr + '","user":""}]'
-        self.listen_once_and_close('getMarket', emitMessage, 'market', callback)
-        return next(done())
+        orders = self.get_orderbook(token_addr)
+        return orders.get('buys') or []
+
+    def get_markets(self, token_addrs, user='', concurrency=16, timeout=10, max_tries=2):
+        """
+        Fetches the markets of many tokens at once over the persistent session
+
+        Up to `concurrency` requests are in flight at a time and replies are
+        matched back to their token, so a slow or empty market only holds up
+        its own request.
+
+        :param token_addrs: token addresses
+        :type token_addrs: list
+        :param user: account whose own orders and trades are included
+        :type user: str
+        :param concurrency: maximum number of requests in flight
+        :type concurrency: int
+        :param timeout: seconds to wait for each reply
+        :type timeout: float
+        :param max_tries: number of attempts per token
+        :type max_tries: int
+        :return: market of every token, or the exception for tokens that failed
+        :rtype: dict
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        token_addrs = list(dict.fromkeys(token_addrs))
+        if not token_addrs:
+            return {}
+
+        def fetch(token_addr):
+            try:
+                msg = self._get_market(token_addr, user, timeout, max_tries)
+            except Exception as e:
+                return e
+            if not msg:
+                return SessionError('no market reply for ' + token_addr)
+            return msg
+
+        self.get_session().connect()
+        with ThreadPoolExecutor(min(concurrency, len(token_addrs))) as pool:
+            return dict(zip(token_addrs, pool.map(fetch, token_addrs)))
+
+    def get_orderbooks(self, token_addrs, concurrency=16, timeout=10, max_tries=2):
+        """
+        Returns the orderbooks of many tokens, fetched concurrently, see get_markets
+
+        :param token_addrs: token addresses
+        :type token_addrs: list
+        :param concurrency: maximum number of requests in flight
+        :type concurrency: int
+        :param timeout: seconds to wait for each reply
+        :type timeout: float
+        :param max_tries: number of attempts per token
+        :type max_tries: int
+        :return: orderbook of every token, or the exception for tokens that failed
+        :rtype: dict
+        """
+        markets = self.get_markets(token_addrs, '', concurrency, timeout, max_tries)
+        return dict((token_addr, self._market_orderbook(token_addr, msg)) for token_addr, msg in markets.items())
+
+    def _market_orderbook(self, token_addr, msg):
+        if isinstance(msg, Exception):
+            return msg
+        if not msg.get('orders'):
+            return {}
+        index = OrderIndex(msg['orders'])
+        self.order_cache.put(token_addr.lower(), index)
+        return index.snapshot
+
+    def get_local_orderbook(self, token_addr):
+        """
+        Returns an order book for a token that is kept up to date in memory
+        from pushed updates
+
+        :param token_addr: token address
+        :type token_addr: str
+        :return: orderbook
+        :rtype: LocalOrderBook
+        """
+        book = LocalOrderBook(token_addr)
+        book.attach(self)
+        self.local_books[book.token_addr] = book
+        return book
+
+    def save_snapshot(self, path):
+        """
+        Saves the order books, the ticker map and the last block number to a
+        snapshot file that restore_snapshot loads after a restart
+
+        The books are the local order books, plus the cached market snapshots
+        of tokens that have no local book.
+
+        :param path: snapshot file
+        :type path: str
+        :return: number of orders saved
+        :rtype: int
+        """
+        books = dict((token_addr, index.snapshot) for token_addr, index in self.order_cache.items() if index)
+        for token_addr, book in list(self.local_books.items()):
+            books[token_addr] = book.snapshot()
+        tickers = self.market_cache.peek('tickers')
+        block_number = self.chain_head.number if self.chain_head is not None else None
+        return write_snapshot(path, books, tickers.tickers if tickers else None, block_number)
+
+    def start_snapshots(self, path, interval=60):
+        """
+        Saves a snapshot every `interval` seconds from a background thread,
+        see save_snapshot
+
+        :param path: snapshot file
+        :type path: str
+        :param interval: seconds between snapshots
+        :type interval: float
+        """
+        self.stop_snapshots()
+        stop = self._snapshot_stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.save_snapshot(path)
+                except Exception as e:
+                    log_event(logging.WARNING, 'snapshot_failed', path=path, error=repr(e))
+
+        thread = threading.Thread(target=run, name='etherdelta-snapshots')
+        thread.daemon = True
+        thread.start()
+
+    def stop_snapshots(self):
+        """
+        Stops the periodic snapshots started with start_snapshots
+        """
+        if self._snapshot_stop is not None:
+            self._snapshot_stop.set()
+            self._snapshot_stop = None
+
+    def restore_snapshot(self, path, reconcile=True):
+        """
+        Loads a snapshot saved by save_snapshot into local order books that
+        are kept up to date from pushed updates right away
+
+        Orders that expired since the snapshot are dropped and the ticker map
+        is cached unless a fresher one already is. With `reconcile`, each
+        book is then replaced by a fresh `getMarket` snapshot from a
+        background thread, see reconcile_books. Until then, the books hold the
+        saved orders plus every update pushed since the restore.
+
+        :param path: snapshot file
+        :type path: str
+        :param reconcile: refresh the books from the API in the background
+        :type reconcile: bool
+        :return: order books by token
+        :rtype: dict
+        """
+        with Snapshot(path) as snapshot:
+            try:
+                block_number = self.get_block_number()
+            except Exception:
+                block_number = snapshot.block_number
+            books = self._restore_books(snapshot, block_number, self.get_session())
+        self.get_session().connect()
+        if reconcile and books:
+            thread = threading.Thread(target=self.reconcile_books, args=(list(books),), name='etherdelta-reconcile')
+            thread.daemon = True
+            thread.start()
+        return books
+
+    def _restore_books(self, snapshot, block_number, session):
+        tickers = snapshot.tickers
+        if tickers and not self.market_cache.peek('tickers'):
+            self.market_cache.put('tickers', TickerIndex(tickers))
+        books = {}
+        for token_addr in snapshot.tokens:
+            orders = snapshot.book(token_addr, block_number)
+            book = LocalOrderBook(token_addr)
+            book._subscribe(session, self)
+            book._seed(orders)
+            books[book.token_addr] = book
+        old = [book for token_addr, book in self.local_books.items() if token_addr in books]
+        self.local_books.update(books)
+        for book in old:
+            book.detach()
+        return books
+
+    def reconcile_books(self, token_addrs=None, concurrency=16, timeout=10, max_tries=2):
+        """
+        Replaces local order books with fresh snapshots fetched concurrently,
+        while they keep applying pushed updates
+
+        :param token_addrs: tokens to refresh, defaults to every local book
+        :type token_addrs: list
+        :param concurrency: maximum number of requests in flight
+        :type concurrency: int
+        :param timeout: seconds to wait for each reply
+        :type timeout: float
+        :param max_tries: number of attempts per token
+        :type max_tries: int
+        :return: the exception of every token that could not be refreshed
+        :rtype: dict
+        """
+        books = self._reconciling(token_addrs)
+        try:
+            fresh = self.get_orderbooks(list(books), concurrency, timeout, max_tries)
+        except Exception as e:
+            fresh = dict.fromkeys(books, e)
+        return self._reconciled(books, fresh)
+
+    def _reconciling(self, token_addrs):
+        if token_addrs is None:
+            token_addrs = list(self.local_books)
+        books = dict((t.lower(), self.local_books[t.lower()]) for t in token_addrs if t.lower() in self.local_books)
+        for book in books.values():
+            book._begin_reconcile()
+        return books
+
+    @staticmethod
+    def _reconciled(books, fresh):
+        failed = {}
+        for token_addr, book in books.items():
+            orders = fresh.get(token_addr)
+            if isinstance(orders, Exception):
+                log_event(logging.WARNING, 'reconcile_failed', token=token_addr, error=repr(orders))
+                failed[token_addr] = orders
+                orders = None
+            book._finish_reconcile(orders)
+        return failed
+
+    def subscribe(self, token_addr=None, events=EVENTS, user=None, maxsize=1000, overflow='drop_oldest'):
+        """
+        Subscribes to the events the WebSocket API pushes for a token
+
+        :param token_addr: token address, None for every token
+        :type token_addr: str
+        :param events: event topics, any of 'orders', 'trades' and 'funds'
+        :type events: list
+        :param user: only events of this account, None for every account
+        :type user: str
+        :param maxsize: number of events buffered for a slow consumer
+        :type maxsize: int
+        :param overflow: when the buffer is full, 'drop_oldest' discards the oldest event
+                         and 'block' stops reading from the socket until there is room
+        :type overflow: str
+        :return: subscription, iterating over (topic, payload) events
+        :rtype: Subscription
+        """
+        session = self.get_session()
+        subscription = Subscription(session, token_addr, events, user, maxsize, overflow)
+        session.connect()
+        return subscription
 
     def get_amount_filled(self, token_addr, order_id):
         """
@@ -228,25 +634,15 @@ class Client:
 
         :param token_addr: token address
         :type token_addr: str
-        :param order_id: order ID
-        :type order_id: str
+        :param order_id: order ID, or the order itself to skip the lookup
+        :type order_id: str, dict or Order
         :return: filled amount
         :rtype: int
         """
-        order = self.get_order(token_addr, order_id)
-        if order == None:
+        args = self._get_order_args(token_addr, order_id)
+        if args is None:
             return None
-        amountGet = int('{:.0f}'.format(float(order['amountGet'])))
-        amountGive = int('{:.0f}'.format(float(order['amountGive'])))
-        tokenGet = Web3.toChecksumAddress(order['tokenGet'])
-        tokenGive = Web3.toChecksumAddress(order['tokenGive'])
-        expires = int(order['expires'])
-        nonce = int(order['nonce'])
-        user = Web3.toChecksumAddress(order['user'])
-        v = int(order['v'])
-        r = Web3.toBytes(hexstr=order['r'])
-        s = Web3.toBytes(hexstr=order['s'])
-        amount_filled = self.contractEtherDelta.call().amountFilled(tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s)
+        amount_filled = self.contractEtherDelta.call().amountFilled(*args)
         return amount_filled
 
     def get_available_volume(self, token_addr, order_id):
@@ -255,27 +651,330 @@ class Client:
 
         :param token_addr: token address
         :type token_addr: str
-        :param order_id: order ID
-        :type order_id: str
+        :param order_id: order ID, or the order itself to skip the lookup
+        :type order_id: str, dict or Order
         :return: available volume
         :rtype: int
         """
-        order = self.get_order(token_addr, order_id)
-        if order == None:
+        args = self._get_order_args(token_addr, order_id)
+        if args is None:
             return None
-        amountGet = int('{:.0f}'.format(float(order['amountGet'])))
-        amountGive = int('{:.0f}'.format(float(order['amountGive'])))
-        tokenGet = Web3.toChecksumAddress(order['tokenGet'])
-        tokenGive = Web3.toChecksumAddress(order['tokenGive'])
-        expires = int(order['expires'])
-        nonce = int(order['nonce'])
-        user = Web3.toChecksumAddress(order['user'])
-        v = int(order['v'])
-        r = Web3.toBytes(hexstr=order['r'])
-        s = Web3.toBytes(hexstr=order['s'])
-        available_volume = self.contractEtherDelta.call().availableVolume(tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s)
+        available_volume = self.contractEtherDelta.call().availableVolume(*args)
         return available_volume
 
+    def get_eth_balances(self, accounts):
+        """
+        Returns the ETH balances of many accounts in one JSON-RPC batch
+
+        :param accounts: accounts
+        :type accounts: list
+        :return: balances in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return self._batch(self._eth_balance_calls(accounts), self._from_wei)
+
+    def get_token_balances(self, pairs):
+        """
+        Returns the token balances of many (account, token_addr) pairs in one JSON-RPC batch
+
+        :param pairs: (account, token_addr) pairs
+        :type pairs: list
+        :return: balances in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return self._batch(self._token_balance_calls(pairs), self._from_wei)
+
+    def get_etherdelta_token_balances(self, pairs):
+        """
+        Returns the EtherDelta balances of many (account, token_addr) pairs in one JSON-RPC batch
+
+        :param pairs: (account, token_addr) pairs, use the zero address for ETH
+        :type pairs: list
+        :return: balances in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return self._batch(self._etherdelta_balance_calls(pairs), self._from_wei)
+
+    def get_amounts_filled(self, orders):
+        """
+        Returns the amounts filled of many orders in one JSON-RPC batch
+
+        :param orders: orders
+        :type orders: list
+        :return: filled amounts in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return self._batch(self._order_calls(orders, 'amountFilled'), self._to_int)
+
+    def get_available_volumes(self, orders, validate=False, block_number=None):
+        """
+        Returns the available volumes of many orders in one JSON-RPC batch
+
+        :param orders: orders
+        :type orders: list
+        :param validate: only send the orders that pass validate_orders, the others get an InvalidOrder
+        :type validate: bool
+        :param block_number: block number to check expiry against when validating, defaults to a cached one
+        :type block_number: int
+        :return: available volumes in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        calls = self._order_calls(orders, 'availableVolume')
+        if validate:
+            calls = self._valid_calls(calls, orders, self.validate_orders(orders, block_number))
+        return self._batch(calls, self._to_int)
+
+    def validate_orders(self, orders, block_number=None, workers=None, executor=None):
+        """
+        Checks orders locally before spending any RPC on them: expiry against
+        the block number, the order hash and the signer of v/r/s, see
+        etherdelta.validation.check_orders
+
+        :param orders: orders
+        :type orders: list
+        :param block_number: block number to check expiry against, defaults to get_block_number()
+        :type block_number: int
+        :param workers: number of processes to start for large books, None to check them in this process
+        :type workers: int
+        :param executor: process pool for large books, reused across calls
+        :type executor: Executor
+        :return: reason each order is invalid, None for valid orders
+        :rtype: list
+        """
+        if block_number is None:
+            block_number = self._cached_block_number()
+        return check_orders(orders, block_number, addressEtherDelta, workers, executor)
+
+    def filter_orders(self, orders, block_number=None, workers=None, executor=None):
+        """
+        Returns the orders that pass validate_orders
+
+        :param orders: orders
+        :type orders: list
+        :return: valid orders
+        :rtype: list
+        """
+        reasons = self.validate_orders(orders, block_number, workers, executor)
+        return [order for order, reason in zip(orders, reasons) if reason is None]
+
+    def plan_fill(self, token_addr, side, eth_amount, user=None, confirm=True, validate=True, min_fill=0):
+        """
+        Plans filling eth_amount ETH of a token across as many orders as it
+        takes, best price first, see etherdelta.planner.plan_fills
+
+        The orders come from the local order book of the token when there is
+        one, else from a fresh snapshot. Own and expired orders are skipped
+        before any RPC. With `confirm`, the available volume of every order
+        in the plan is read from the contract in one batch and the plan is
+        redone with it, until every fill is confirmed; reads are cached until
+        the next block, so planning again on every book update only reads
+        orders that were not planned before.
+
+        :param token_addr: token address
+        :type token_addr: str
+        :param side: 'buy' to buy tokens from sell orders, 'sell' to sell tokens to buy orders
+        :type side: str
+        :param eth_amount: size in ETH
+        :type eth_amount: float or Decimal
+        :param user: account whose orders are skipped, usually your own
+        :type user: str
+        :param confirm: read available volumes from the contract
+        :type confirm: bool
+        :param validate: check orders locally before reading their volumes, see validate_orders
+        :type validate: bool
+        :param min_fill: smallest fill worth a transaction, in ETH
+        :type min_fill: float or Decimal
+        :return: plan
+        :rtype: FillPlan
+        """
+        orders = self._plan_orders(token_addr, side)
+        block_number = self.get_block_number()
+        volumes = self._plan_volumes(block_number, validate)
+        lookahead = 0
+        while True:
+            plan = plan_fills(orders, side, eth_amount, volumes, user, block_number, min_fill)
+            pending = [fill.order for fill in plan.fills if not fill.confirmed]
+            if not confirm or not pending:
+                return plan
+            pending += self._lookahead(orders, side, user, block_number, volumes, plan, lookahead)
+            self._confirmed_volumes(volumes, pending, self.get_available_volumes(pending, validate, block_number))
+            # when orders turn out to have less volume than the book says,
+            # also confirm more of the orders after the plan every round
+            lookahead = max(2 * lookahead, len(pending))
+
+    def _plan_orders(self, token_addr, side):
+        book = self.local_books.get(token_addr.lower())
+        if book is not None:
+            return book.asks() if side == 'buy' else book.bids()
+        if side == 'buy':
+            return self._best_first(self.get_sell_orderbook(token_addr), side)
+        return self._best_first(self.get_buy_orderbook(token_addr), side)
+
+    @staticmethod
+    def _best_first(orders, side):
+        priced = []
+        unpriced = []
+        for order in orders:
+            try:
+                priced.append((float(order['price']), order))
+            except (KeyError, TypeError, ValueError):
+                unpriced.append(order)
+        priced.sort(key=lambda item: item[0], reverse=side == 'sell')
+        # orders without a price go last on either side
+        return [order for _, order in priced] + unpriced
+
+    def _plan_volumes(self, block_number, validate):
+        # volumes confirmed by earlier plans in this block, dropped with the
+        # other reads when the chain head moves
+        key = ('plan_volumes', block_number, validate)
+        volumes = self.read_cache.peek(key)
+        if volumes is None:
+            volumes = {}
+            self.read_cache.put(key, volumes)
+        return volumes
+
+    @staticmethod
+    def _lookahead(orders, side, user, block_number, volumes, plan, count):
+        planned = set(order_id(fill.order) for fill in plan.fills)
+        later = (order for order in eligible_orders(orders, side, user, block_number)
+                 if order_id(order) not in planned and order_id(order) not in volumes)
+        return list(islice(later, count))
+
+    @staticmethod
+    def _confirmed_volumes(volumes, orders, results):
+        errors = [result for result in results if isinstance(result, Exception) and not isinstance(result, InvalidOrder)]
+        if errors and len(errors) == len(results):
+            # the node could not be asked at all, rather than some orders being unfillable
+            raise errors[0]
+        for order, result in zip(orders, results):
+            volumes[order_id(order)] = 0 if isinstance(result, Exception) else result
+
+    def _cached_block_number(self):
+        number = self._recent_block_number()
+        return self.get_block_number() if number is None else number
+
+    def _recent_block_number(self):
+        # without a running chain head, a block number read less than one
+        # poll interval ago is as fresh as a running head would give
+        head = self.get_chain_head()
+        if head.running or head.number is None or time.monotonic() - head.updated >= head.interval:
+            return None
+        return head.number
+
+    @staticmethod
+    def _valid_calls(calls, orders, reasons):
+        return [call if reason is None else InvalidOrder(reason, order_row(order)[0])
+                for call, order, reason in zip(calls, orders, reasons)]
+
+    def _eth_balance_calls(self, accounts):
+        calls = []
+        for account in accounts:
+            try:
+                calls.append(('eth_getBalance', [Web3.toChecksumAddress(account), 'latest']))
+            except Exception as e:
+                calls.append(e)
+        return calls
+
+    def _token_balance_calls(self, pairs):
+        calls = []
+        for account, token_addr in pairs:
+            try:
+                data = encode_call('token', 'balanceOf', [Web3.toChecksumAddress(account)])
+                calls.append(self._eth_call(Web3.toChecksumAddress(token_addr), data))
+            except Exception as e:
+                calls.append(e)
+        return calls
+
+    def _etherdelta_balance_calls(self, pairs):
+        calls = []
+        for account, token_addr in pairs:
+            try:
+                data = encode_call('etherdelta', 'balanceOf', [Web3.toChecksumAddress(token_addr), Web3.toChecksumAddress(account)])
+                calls.append(self._eth_call(self.contractEtherDelta.address, data))
+            except Exception as e:
+                calls.append(e)
+        return calls
+
+    def _order_calls(self, orders, fn_name):
+        calls = []
+        for order in orders:
+            try:
+                data = encode_call('etherdelta', fn_name, self._order_args(order))
+                calls.append(self._eth_call(self.contractEtherDelta.address, data))
+            except Exception as e:
+                calls.append(e)
+        return calls
+
+    @staticmethod
+    def _eth_call(to, data):
+        return ('eth_call', [{'to': to, 'data': data}, 'latest'])
+
+    @staticmethod
+    def _to_int(result):
+        return int(result, 16)
+
+    @staticmethod
+    def _from_wei(result):
+        return Web3.fromWei(int(result, 16), 'ether')
+
+    def _batch(self, calls, convert):
+        number, keys, cached = self._cached_reads(calls)
+        fetched = self.rpc.batch([call for call, key, value in zip(calls, keys, cached) if key is not None and value is None])
+        return self._batch_results(calls, self._merge_reads(number, keys, cached, fetched), convert)
+
+    def _cached_reads(self, calls):
+        """
+        Looks up the results of read calls made in the current block
+
+        :return: (block number, cache key of each call or None for exceptions, cached result of each call or None)
+        :rtype: tuple
+        """
+        # without a running chain head nothing tells when a new block
+        # arrives, so nothing is cached
+        head = self.chain_head
+        number = head.number if head is not None and head.running else None
+        keys = [None if isinstance(call, Exception) else (number, json.dumps(call, sort_keys=True)) for call in calls]
+        if number is None:
+            return number, keys, [None] * len(calls)
+        return number, keys, [None if key is None else self.read_cache.peek(key) for key in keys]
+
+    def _merge_reads(self, number, keys, cached, fetched):
+        """
+        Returns the result of every call that is not an exception, in order,
+        taking fetched results for the ones that were not cached and caching them
+        """
+        fetched = iter(fetched)
+        results = []
+        for key, value in zip(keys, cached):
+            if key is None:
+                continue
+            if value is None:
+                value = next(fetched)
+                # keyed by the block number seen before the fetch, so a read
+                # racing a new block is never served for the newer block
+                if number is not None and value is not None and not isinstance(value, Exception):
+                    self.read_cache.put(key, value)
+            results.append(value)
+        return results
+
+    @staticmethod
+    def _batch_results(calls, results, convert):
+        results = iter(results)
+        out = []
+        for call in calls:
+            if isinstance(call, Exception):
+                out.append(call)
+                continue
+            result = next(results)
+            if isinstance(result, Exception):
+                out.append(result)
+                continue
+            try:
+                out.append(convert(result))
+            except Exception as e:
+                out.append(e)
+        return out
+
     def get_ticker(self, symbol=''):
         """
         Returns ticker data for token
@@ -285,20 +984,7 @@ class Client:
         :return: ticker data
         :rtype: object
         """
-        result = {}
-        def done():
-            yield result
-        def callback(msg):
-            nonlocal result
-            self.ws.close()
-            if msg:
-                if msg['returnTicker']:
-                    if msg['returnTicker']['ETH_' + symbol.upper()]:
-                        result = msg['returnTicker']['ETH_' + symbol.upper()]
-            done()
-        emitMessage = '42["getMarket",{"token":"","user":"0x0000000000000000000000000000000000000000"}]'
-        self.listen_once_and_close('getMarket', emitMessage, 'market', callback)
-        return next(done())
+        return self._get_ticker_index().ticker(symbol)
 
     def get_tickers(self):
         """
@@ -307,30 +993,70 @@ class Client:
         :return: ticker data
         :rtype: object
         """
-        result = {}
-        def done():
-            yield result
-        def callback(msg):
-            nonlocal result
-            self.ws.close()
-            print(msg)
-            if msg != None:
-                if msg:
-                    if msg['returnTicker']:
-                        result = msg['returnTicker']
-            done()
-        emitMessage = '42["getMarket",{"token":"","user":"0x0000000000000000000000000000000000000000"}]'
-        self.listen_once_and_close('getMarket', emitMessage, 'market', callback)
-        return next(done())
-
-    def get_block_number(self):
-        """
-        Returns the highest block number
+        return self._get_ticker_index().tickers
+
+    def get_block_number(self, refresh=False):
+        """
+        Returns the highest block number, as last seen by the chain head if
+        it is running, else read from the node now
 
+        :param refresh: ask the node now even if the chain head is running
+        :type refresh: bool
         :return: block number
         :rtype: int
         """
-        return w3.eth.blockNumber
+        head = self.get_chain_head()
+        if refresh or not head.running or head.number is None:
+            return head.refresh()
+        return head.number
+
+    def get_gas_price(self):
+        """
+        Returns the node's gas price estimate, as last seen by the chain head if
+        it is running, else read from the node now, or defaultGasPrice if the
+        node could not be asked
+
+        :return: gas price in wei
+        :rtype: int
+        """
+        head = self.get_chain_head()
+        if not head.running or head.gas_price is None:
+            try:
+                head.refresh()
+            except Exception:
+                pass
+        return head.gas_price or defaultGasPrice
+
+    def ingest_events(self, path, from_block, to_block=None, events=history.EVENTS, chunk_size=2000, workers=4, progress=None):
+        """
+        Downloads the EtherDelta contract's events into a columnar store on disk,
+        resuming from the store's checkpoint if it is further along than from_block
+
+        :param path: store directory
+        :type path: str
+        :param from_block: first block
+        :type from_block: int
+        :param to_block: last block, the latest block if None
+        :type to_block: int
+        :param events: event names, any of 'Trade', 'Order', 'Cancel', 'Deposit' and 'Withdraw'
+        :type events: list
+        :param chunk_size: blocks per eth_getLogs call, halved whenever the node rejects a range
+        :type chunk_size: int
+        :param workers: number of concurrent eth_getLogs calls
+        :type workers: int
+        :param progress: called with (last block written, events written so far) after each chunk
+        :type progress: function
+        :return: number of events written
+        :rtype: int
+        """
+        return self._ingest_events(self.rpc, path, from_block, to_block, events, chunk_size, workers, progress)
+
+    @staticmethod
+    def _ingest_events(rpc, path, from_block, to_block, events, chunk_size, workers, progress):
+        with history.EventStore(path, history.event_schemas(events)) as store:
+            ingester = history.EventIngester(rpc, store, addressEtherDelta, events,
+                                             chunk_size=chunk_size, workers=workers)
+            return ingester.run(from_block, to_block, progress)
 
     def create_order(self, side, expires, price, amount, token_addr, randomseed, user_private_key):
         """
@@ -353,52 +1079,108 @@ class Client:
         :return: signed order
         :rtype: object
         """
-        global addressEtherDelta, w3
-        userAccount = w3.eth.account.privateKeyToAccount(user_private_key).address
-        print("\nCreating '" + side + "' order for %.18f tokens @ %.18f ETH/token" % (amount, price))
+        userAccount = self.w3.eth.account.privateKeyToAccount(user_private_key).address
+        log_event(logging.INFO, 'create_order', side=side, amount=amount, price=price, token=token_addr)
         # Validate the input
         if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
         # Ensure good parameters
-        token = Web3.toChecksumAddress(token_addr)
         userAccount = Web3.toChecksumAddress(userAccount)
         user_private_key = Web3.toBytes(hexstr=user_private_key)
+        if randomseed != None: random.seed(randomseed)    # Seed the random number generator for unit testable results
+        orderNonce = random.randint(0,10000000000)
+        values = self._order_values(side, expires, price, amount, token_addr, orderNonce)
+        return self._order_dict(values, userAccount, sign_order(values, user_private_key))
+
+    def create_orders(self, specs, user_private_key, randomseed=None, workers=None, executor=None):
+        """
+        Returns many signed orders, signed in parallel across processes
+
+        The account is derived once, nonces come from a private random
+        generator (the global `random` state is left alone) and each order is
+        identical to what create_order returns for the same nonce.
+
+        :param specs: (side, price, amount, token_addr, expires) of each order
+        :type specs: list
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param randomseed: seed for the nonces, for reproducible results
+        :type randomseed: int
+        :param workers: number of worker processes, 1 signs in this process
+        :type workers: int
+        :param executor: executor to reuse across calls instead of starting a process pool
+        :type executor: concurrent.futures.Executor
+        :return: signed orders, in input order
+        :rtype: list
+        """
+        if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
+        userAccount = Web3.toChecksumAddress(self.w3.eth.account.privateKeyToAccount(user_private_key).address)
+        user_private_key = Web3.toBytes(hexstr=user_private_key)
+        rng = random.Random(randomseed)
+        values = [self._order_values(side, expires, price, amount, token_addr, rng.randint(0,10000000000))
+                  for side, price, amount, token_addr, expires in specs]
+        if executor is None and (workers == 1 or len(values) < 2):
+            signatures = sign_orders(values, user_private_key)
+        else:
+            signatures = self._sign_parallel(values, user_private_key, workers, executor)
+        return [self._order_dict(v, userAccount, signature) for v, signature in zip(values, signatures)]
+
+    @staticmethod
+    def _sign_parallel(values, user_private_key, workers, executor, sign=sign_orders):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from itertools import repeat
+        if not workers:
+            workers = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+        size = max(1, -(-len(values) // (workers * 4)))
+        chunks = [values[i:i + size] for i in range(0, len(values), size)]
+        if executor is not None:
+            results = executor.map(sign, chunks, repeat(user_private_key))
+            return [signature for chunk in results for signature in chunk]
+        # workers are spawned, not forked, so they inherit none of this
+        # process's threads or the locks those threads hold
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = pool.map(sign, chunks, repeat(user_private_key))
+            return [signature for chunk in results for signature in chunk]
+
+    def _order_values(self, side, expires, price, amount, token_addr, orderNonce):
+        """
+        Returns the parameters of an order in the layout that is hashed and signed
+        (contractAddr, tokenGet, amountGet, tokenGive, amountGive, expires, nonce)
+        """
+        token = Web3.toChecksumAddress(token_addr)
         # Build the order parameters
         amountBigNum = amount
         amountBaseBigNum = float(amount) * float(price)
-        if randomseed != None: random.seed(randomseed)    # Seed the random number generator for unit testable results
-        orderNonce = random.randint(0,10000000000)
         if side == 'sell':
             tokenGive = token
             tokenGet = '0x0000000000000000000000000000000000000000'
-            amountGet = w3.toWei(amountBaseBigNum, 'ether')
-            amountGive = w3.toWei(amountBigNum, 'ether')
+            amountGet = Web3.toWei(amountBaseBigNum, 'ether')
+            amountGive = Web3.toWei(amountBigNum, 'ether')
         elif side == 'buy':
             tokenGive = '0x0000000000000000000000000000000000000000'
             tokenGet = token
-            amountGet = w3.toWei(amountBigNum, 'ether')
-            amountGive = w3.toWei(amountBaseBigNum, 'ether')
+            amountGet = Web3.toWei(amountBigNum, 'ether')
+            amountGive = Web3.toWei(amountBaseBigNum, 'ether')
         else:
-            print('WARNING: invalid order side, no action taken: ' + str(side))
-        # Serialize (according to ABI) and sha256 hash the order's parameters
-        hashhex = self.solidity_sha256(
-            ['address', 'address', 'uint256', 'address', 'uint256', 'uint256', 'uint256'],
-            [addressEtherDelta, tokenGet, amountGet, tokenGive, amountGive, expires, orderNonce]
-        )
-        # Sign the hash of the order's parameters with our private key (this also addes the "Ethereum Signed Message" header)
-        signresult = w3.eth.account.sign(message_hexstr=hashhex, private_key=user_private_key)
-        #print("Result of sign:" + str(signresult))
+            raise ValueError('WARNING: invalid order side, no action taken: ' + str(side))
+        return [addressEtherDelta, tokenGet, amountGet, tokenGive, amountGive, expires, orderNonce]
+
+    @staticmethod
+    def _order_dict(values, userAccount, signature):
+        contractAddr, tokenGet, amountGet, tokenGive, amountGive, expires, orderNonce = values
+        v, r, s = signature
         orderDict = {
             'amountGet' : amountGet,
             'amountGive' : amountGive,
             'tokenGet' : tokenGet,
             'tokenGive' : tokenGive,
-            'contractAddr' : addressEtherDelta,
+            'contractAddr' : contractAddr,
             'expires' : expires,
             'nonce' : orderNonce,
             'user' : userAccount,
-            'v' : signresult['v'],
-            'r' : signresult['r'],
-            's' : signresult['s'],
+            'v' : v,
+            'r' : r,
+            's' : s,
         }
         return orderDict
 
@@ -411,18 +1193,13 @@ class Client:
         :return: response
         :rtype: string
         """
-        result = ''
-        def done():
-            yield result
-        def callback(msg):
-            nonlocal result
-            self.ws.close()
-            result = msg
         emitMessage = '42["message",' + json.JSONEncoder().encode(order) + ']'
-        self.listen_once_and_close("message", emitMessage, "messageResult", callback)
-        return next(done())
+        result = self.get_session().request(emitMessage, 'messageResult')
+        if result is None:
+            return ''
+        return result
 
-    def trade(self, order, eth_amount, user_private_key):
+    def trade(self, order, eth_amount, user_private_key, gas=None, gas_price=None):
         """
         Invokes on-chain trade
 
@@ -432,56 +1209,24 @@ class Client:
         :type eth_amount: float
         :param user_private_key: user private key
         :type user_private_key: string
+        :param gas: gas limit, defaults to defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
         :return: tx
         :rtype: object
         """
-        global web3, addressEtherDelta
-        userAccount = w3.eth.account.privateKeyToAccount(user_private_key).address
-        # Transaction info
-        maxGas = 250000
-        gasPriceWei = 1000000000    # 1 Gwei
-        if order['tokenGive'] == '0x0000000000000000000000000000000000000000':
-            ordertype = 'buy'    # it's a buy order so we are selling tokens for ETH
-            amount = eth_amount / float(order['price'])
-        else:
-            ordertype = 'sell'   # it's a sell order so we are buying tokens for ETH
-            amount = eth_amount
-        amount_in_wei = web3.toWei(amount, 'ether')
-        print("\nTrading " + str(eth_amount) + " ETH of tokens (" + str(amount) + " tokens) against this " + ordertype + " order: %.10f tokens @ %.10f ETH/token" % (float(order['ethAvailableVolume']), float(order['price'])))
-        print("Details about order: " + str(order))
-        # trade function arguments
-        kwargs = {
-            'tokenGet' : Web3.toChecksumAddress(order['tokenGet']),
-            'amountGet' : int(float(order['amountGet'])),
-            'tokenGive' : Web3.toChecksumAddress(order['tokenGive']),
-            'amountGive' : int(float(order['amountGive'])),
-            'expires' : int(order['expires']),
-            'nonce' : int(order['nonce']),
-            'user' : Web3.toChecksumAddress(order['user']),
-            'v' : order['v'],
-            'r' : w3.toBytes(hexstr=order['r']),
-            's' : w3.toBytes(hexstr=order['s']),
-            'amount' : int(amount_in_wei),
-        }
         # Bail if there's no private key
         if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
+        parsed = Order.parse(order)
+        kwargs, ordertype, amount = self._trade_kwargs(parsed, eth_amount)
+        log_event(logging.INFO, 'trade', eth_amount=eth_amount, amount=amount, type=ordertype,
+                  available=parsed.ethAvailableVolume, price=parsed.price, order=parsed.id)
         # Build binary representation of the function call with arguments
         abidata = self.contractEtherDelta.encodeABI('trade', kwargs=kwargs)
-        print("abidata: " + str(abidata))
-        nonce = w3.eth.getTransactionCount(userAccount)
-        # Override to have same as other transaction:
-        #nonce = 53
-        print("nonce: " + str(nonce))
-        transaction = { 'to': addressEtherDelta, 'from': userAccount, 'gas': maxGas, 'gasPrice': gasPriceWei, 'data': abidata, 'nonce': nonce, 'chainId': 1}
-        print(transaction)
-        signed = w3.eth.account.signTransaction(transaction, user_private_key)
-        print("signed: " + str(signed))
-        result = w3.eth.sendRawTransaction(w3.toHex(signed.rawTransaction))
-        print("Transaction returned: " + str(result))
-        print("\nDone! You should see the transaction show up at https://etherscan.io/tx/" + w3.toHex(result))
-        return result
+        return self._send_transaction(abidata, user_private_key, gas, gas_price)
 
-    def cancel_order(self, order, user_private_key):
+    def cancel_order(self, order, user_private_key, gas=None, gas_price=None):
         """
         Cancels an order on-chain
 
@@ -489,116 +1234,216 @@ class Client:
         :type order: object
         :param user_private_key: user private key
         :type user_private_key: string
+        :param gas: gas limit, defaults to defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
         :return: tx
         :rtype: object
         """
-        global w3, addressEtherDelta
-        userAccount = w3.eth.account.privateKeyToAccount(user_private_key).address
-        # Transaction info
-        maxGas = 250000
-        gasPriceWei = 1000000000    # 1 Gwei
-        print("\nCancelling")
-        print("Details about order: " + str(order))
-        # trade function arguments
-        kwargs = {
-            'tokenGet' : Web3.toChecksumAddress(order['tokenGet']),
-            'amountGet' : int(float(order['amountGet'])),
-            'tokenGive' : Web3.toChecksumAddress(order['tokenGive']),
-            'amountGive' : int(float(order['amountGive'])),
-            'expires' : int(order['expires']),
-            'nonce' : int(order['nonce']),
-            'v' : order['v'],
-            'r' : w3.toBytes(hexstr=order['r']),
-            's' : w3.toBytes(hexstr=order['s']),
-        }
         # Bail if there's no private key
         if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
+        parsed = Order.parse(order)
+        log_event(logging.INFO, 'cancel_order', order=parsed.id)
+        kwargs = self._cancel_kwargs(parsed)
         # Build binary representation of the function call with arguments
         abidata = self.contractEtherDelta.encodeABI('cancelOrder', kwargs=kwargs)
-        print("abidata: " + str(abidata))
-        nonce = w3.eth.getTransactionCount(userAccount)
-        # Override to have same as other transaction:
-        #nonce = 53
-        print("nonce: " + str(nonce))
-        transaction = { 'to': addressEtherDelta, 'from': userAccount, 'gas': maxGas, 'gasPrice': gasPriceWei, 'data': abidata, 'nonce': nonce, 'chainId': 1}
-        print(transaction)
-        signed = w3.eth.account.signTransaction(transaction, user_private_key)
-        print("signed: " + str(signed))
-        result = w3.eth.sendRawTransaction(w3.toHex(signed.rawTransaction))
-        print("Transaction returned: " + str(result))
-        print("\nDone! You should see the transaction show up at https://etherscan.io/tx/" + w3.toHex(result))
+        return self._send_transaction(abidata, user_private_key, gas, gas_price)
+
+    def _send_transaction(self, abidata, user_private_key, gas=None, gas_price=None):
+        userAccount = self.w3.eth.account.privateKeyToAccount(user_private_key).address
+        # Transaction info
+        maxGas = gas or defaultGas
+        gasPriceWei = gas_price or self.get_gas_price()
+        nonce = self.nonce_manager.next(userAccount)
+        try:
+            transaction = { 'to': addressEtherDelta, 'from': userAccount, 'gas': maxGas, 'gasPrice': gasPriceWei, 'data': abidata, 'nonce': nonce, 'chainId': 1}
+            log_event(logging.DEBUG, 'transaction', **transaction)
+            signed = self.w3.eth.account.signTransaction(transaction, user_private_key)
+            result = self.w3.eth.sendRawTransaction(self.w3.toHex(signed.rawTransaction))
+        except Exception:
+            # The nonce may not have been used, get it from the node next time
+            self.nonce_manager.resync(userAccount)
+            raise
+        log_event(logging.INFO, 'transaction_sent', tx=self.w3.toHex(result))
         return result
 
-    # This function is very similar to Web3.soliditySha3() but there is no Web3.solidity_sha256() as per November 2017
-    # It serializes values according to the ABI types defined in abi_types and hashes the result with sha256.
+    def cancel_orders(self, orders, user_private_key, gas=None, gas_price=None, workers=None, executor=None):
+        """
+        Cancels many orders on-chain in one go
+
+        Call data is encoded locally, nonces are handed out consecutively,
+        transactions are signed in parallel and submitted as a single JSON-RPC
+        batch of eth_sendRawTransaction.
+
+        :param orders: orders
+        :type orders: list
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param gas: gas limit of each transaction, defaults to defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
+        :param workers: number of worker processes, 1 signs in this process
+        :type workers: int
+        :param executor: executor to reuse across calls instead of starting a process pool
+        :type executor: concurrent.futures.Executor
+        :return: tx hash of each order, in input order, with the exception in place of every failed one
+        :rtype: list
+        """
+        datas = self._transaction_data('cancelOrder', self._cancel_kwargs, orders)
+        return self._send_transactions(datas, user_private_key, gas, gas_price, workers, executor)
+
+    def trade_many(self, fills, user_private_key, gas=None, gas_price=None, workers=None, executor=None):
+        """
+        Invokes many on-chain trades in one go, see cancel_orders
+
+        :param fills: (order, eth_amount) of each trade
+        :type fills: list
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param gas: gas limit of each transaction, defaults to defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
+        :param workers: number of worker processes, 1 signs in this process
+        :type workers: int
+        :param executor: executor to reuse across calls instead of starting a process pool
+        :type executor: concurrent.futures.Executor
+        :return: tx hash of each trade, in input order, with the exception in place of every failed one
+        :rtype: list
+        """
+        datas = self._transaction_data('trade', lambda fill: self._trade_kwargs(*fill)[0], fills)
+        return self._send_transactions(datas, user_private_key, gas, gas_price, workers, executor)
+
+    def trade_plan(self, plan, user_private_key, gas=None, gas_price=None, workers=None, executor=None):
+        """
+        Sends the trades of a fill plan in one go, with the exact amounts of
+        the plan, see trade_many
+
+        :param plan: plan from plan_fill
+        :type plan: FillPlan
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param gas: gas limit of each transaction, defaults to defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
+        :param workers: number of worker processes, 1 signs in this process
+        :type workers: int
+        :param executor: executor to reuse across calls instead of starting a process pool
+        :type executor: concurrent.futures.Executor
+        :return: tx hash of each fill, in plan order, with the exception in place of every failed one
+        :rtype: list
+        """
+        datas = self._transaction_data('trade', lambda fill: fill.trade_kwargs(), plan.fills)
+        return self._send_transactions(datas, user_private_key, gas, gas_price, workers, executor)
+
+    @staticmethod
+    def _transaction_data(fn_name, build_kwargs, items):
+        """
+        Returns the call data of fn_name for each item, or the exception raised building it
+        """
+        datas = []
+        for item in items:
+            try:
+                datas.append(encode_call('etherdelta', fn_name, build_kwargs(item)))
+            except Exception as e:
+                datas.append(e)
+        return datas
+
+    def _raw_transactions(self, datas, userAccount, user_private_key, nonces, gas, gas_price, workers, executor):
+        """
+        Signs a transaction to the EtherDelta contract for each call data that is not an exception
+        """
+        transactions = []
+        for data in datas:
+            if not isinstance(data, Exception):
+                transactions.append({'to': addressEtherDelta, 'from': userAccount, 'gas': gas or defaultGas,
+                                     'gasPrice': gas_price or defaultGasPrice, 'data': data,
+                                     'nonce': next(nonces), 'chainId': 1})
+        if executor is None and (workers == 1 or len(transactions) < 2):
+            return sign_transactions(transactions, user_private_key)
+        return self._sign_parallel(transactions, user_private_key, workers, executor, sign_transactions)
+
+    def _send_transactions(self, datas, user_private_key, gas, gas_price, workers, executor):
+        if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
+        userAccount = self.w3.eth.account.privateKeyToAccount(user_private_key).address
+        gas_price = gas_price or self.get_gas_price()
+        count = sum(1 for data in datas if not isinstance(data, Exception))
+        nonces = iter([self.nonce_manager.next(userAccount) for _ in range(count)])
+        try:
+            raws = self._raw_transactions(datas, userAccount, user_private_key, nonces, gas, gas_price, workers, executor)
+        except Exception:
+            # None of the nonces were used
+            self.nonce_manager.resync(userAccount)
+            raise
+        results = self.rpc.batch([('eth_sendRawTransaction', [raw]) for raw in raws])
+        if any(isinstance(result, Exception) for result in results):
+            # Later nonces are left with a gap, get them from the node next time
+            self.nonce_manager.resync(userAccount)
+        return self._batch_results(datas, results, HexBytes)
+
+    def _get_order_args(self, token_addr, order):
+        if isinstance(order, (dict, Order)):
+            return self._order_args(order)
+        index = self._get_order_index(token_addr)
+        if index is None:
+            return None
+        return index.args(order)
+
+    def _order_args(self, order):
+        """
+        Returns the positional contract arguments identifying an order
+        (tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s)
+        """
+        return Order.parse(order).args()
+
+    def _trade_kwargs(self, order, eth_amount):
+        """
+        Returns the `trade` function arguments for filling eth_amount of an order,
+        along with the order type and token amount
+        """
+        order = Order.parse(order)
+        if order.is_buy:
+            ordertype = 'buy'    # it's a buy order so we are selling tokens for ETH
+            amount = to_decimal(eth_amount) / order.price
+        else:
+            ordertype = 'sell'   # it's a sell order so we are buying tokens for ETH
+            amount = eth_amount
+        amount_in_wei = Web3.toWei(amount, 'ether')
+        return order.trade_kwargs(int(amount_in_wei)), ordertype, amount
+
+    def _cancel_kwargs(self, order):
+        """
+        Returns the `cancelOrder` function arguments for an order
+        """
+        return Order.parse(order).cancel_kwargs()
+
     def solidity_sha256(self, abi_types, values):
-        # TODO
-        #normalized_values = map_abi_data([abi_ens_resolver(Web3)], abi_types, values)
-        normalized_values = map_abi_data([], abi_types, values)
-        #print(normalized_values)
-        hex_string = add_0x_prefix(''.join(
-            remove_0x_prefix(hex_encode_abi_type(abi_type, value))
-            for abi_type, value
-            in zip(abi_types, normalized_values)
-        ))
-        hash_object = hashlib.sha256(Web3.toBytes(hexstr=hex_string))
-        return hash_object.hexdigest()
+        """
+        Serializes values according to the ABI types defined in abi_types and
+        hashes the result with sha256, see etherdelta.signing.solidity_sha256
+        """
+        return solidity_sha256(abi_types, values)
 
     def listen_once_and_close(self, emitTopic, emitMessage, eventTopic, callback):
-        tries = 0
-        max_tries = 3
-        def on_message(ws, message):
-            if message[:2] != '42':
-                pass
-            else:
-                j = json.loads(message[2:])
-                if not j:
-                    pass
-                else:
-                    if j[0] == eventTopic:
-                        if j[1]:
-                            callback(j[1])
-                        else:
-                            make_request()
-                    else:
-                        make_request()
-        def on_open(ws):
-            self.ws.send(emitMessage)
-        def on_close(ws):
-            pass
-        def make_request():
-            nonlocal tries
-            nonlocal max_tries
-            if tries > max_tries:
-                pass
-            self.ws = websocket.WebSocketApp(
-                self.websocket_url,
-                on_message = on_message,
-                  on_ping = self.on_ping,
-                  on_pong = self.on_pong,
-                  on_error = self.on_error,
-                  on_close = on_close)
-            self.ws.on_open = on_open
-            self.ws.run_forever(ping_interval=10)
-            tries = tries + 1
-        make_request()
+        """
+        Sends a message and passes the first reply with the given event topic to callback
+
+        Kept for backwards compatibility: the message now goes over the
+        persistent session, which stays open afterwards.
+        """
+        msg = self.get_session().request(emitMessage, eventTopic)
+        if msg:
+            callback(msg)
 
     def send_message(self, argObject):
         tosend = '42["message",' + json.JSONEncoder().encode(argObject) + ']'
-        print ('Sending message: ' + tosend)
-        self.ws.send(tosend)
-
-    def on_ping(self, ws, ping):
-        pass
-        #print('Ping:' + str(ping))
-    def on_pong(self, ws, pong):
-        pass
-        #print('EtherDelta WebSocket API replied to our ping with a pong:' + str(pong))
-    def on_error(self, ws, err):
-        pass
-        #print(err)
+        log_event(logging.DEBUG, 'send_message', message=tosend)
+        self.get_session().send(tosend)
 
 class ForkDeltaClient(Client):
-    def __init__(self):
-        self.websocket_url = 'wss://api.forkdelta.com/socket.io/?EIO=3&transport=websocket'
-        self.bootstrap()
+    def __init__(self, ticker_ttl=60, market_ttl=5, rpc_url=None, provider=None, hooks=None, websocket_urls=None, hedge_delay=None):
+        super().__init__(ticker_ttl, market_ttl, rpc_url, provider, hooks, websocket_urls, hedge_delay)
+        self.websocket_url = forkdeltaWebsocketURL
@@ -0,0 +1,151 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+_ADDRESS = re.compile(r'0[xX][0-9a-fA-F]{40}$')
+
+
+@lru_cache(maxsize=None)
+def load_abi(name):
+    """
+    Returns a contract ABI bundled in contracts/, parsed once per process
+
+    The returned list is shared and must not be modified.
+
+    :param name: ABI name, 'etherdelta' or 'token'
+    :type name: str
+    :return: ABI
+    :rtype: list
+    """
+    with open(os.path.join(os.path.dirname(__file__), 'contracts', name + '.json'), 'r') as abi_definition:
+        return json.load(abi_definition)
+
+
+@lru_cache(maxsize=1024)
+def get_contract(web3, abi_name, address=None):
+    """
+    Returns a contract object bound to web3, built once per (web3, ABI, address)
+
+    Recently used contracts are kept in an LRU so polling many tokens does
+    not rebuild the contract factory on every call.
+
+    :param web3: Web3 instance
+    :type web3: Web3
+    :param abi_name: ABI name, 'etherdelta' or 'token'
+    :type abi_name: str
+    :param address: checksummed contract address, None for an unbound contract
+    :type address: str
+    :return: contract
+    :rtype: Contract
+    """
+    if address is None:
+        return web3.eth.contract(abi=load_abi(abi_name))
+    return web3.eth.contract(address=address, abi=load_abi(abi_name))
+
+
+@lru_cache(maxsize=None)
+def function_info(abi_name, fn_name):
+    """
+    Returns the 4-byte selector (as hex) and input types of a contract function
+
+    :param abi_name: ABI name, 'etherdelta' or 'token'
+    :type abi_name: str
+    :param fn_name: function name
+    :type fn_name: str
+    :return: (selector, input types)
+    :rtype: tuple
+    """
+    from eth_utils import function_abi_to_4byte_selector
+    item = _function_abi(abi_name, fn_name)
+    selector = '0x' + function_abi_to_4byte_selector(item).hex()
+    return selector, tuple(i['type'] for i in item['inputs'])
+
+
+@lru_cache(maxsize=None)
+def input_names(abi_name, fn_name):
+    """
+    Returns the input names of a contract function, in call order
+
+    :param abi_name: ABI name, 'etherdelta' or 'token'
+    :type abi_name: str
+    :param fn_name: function name
+    :type fn_name: str
+    :return: input names
+    :rtype: tuple
+    """
+    return tuple(i['name'] for i in _function_abi(abi_name, fn_name)['inputs'])
+
+
+@lru_cache(maxsize=None)
+def event_info(abi_name, event_name):
+    """
+    Returns the topic (as hex), input types and input names of a contract event
+
+    :param abi_name: ABI name, 'etherdelta' or 'token'
+    :type abi_name: str
+    :param event_name: event name
+    :type event_name: str
+    :return: (topic, input types, input names)
+    :rtype: tuple
+    """
+    from eth_utils import event_abi_to_log_topic
+    for item in load_abi(abi_name):
+        if item.get('type') == 'event' and item.get('name') == event_name:
+            topic = '0x' + event_abi_to_log_topic(item).hex()
+            return topic, tuple(i['type'] for i in item['inputs']), tuple(i['name'] for i in item['inputs'])
+    raise ValueError('no event ' + event_name + ' in ' + abi_name + ' ABI')
+
+
+def _function_abi(abi_name, fn_name):
+    for item in load_abi(abi_name):
+        if item.get('type') == 'function' and item.get('name') == fn_name:
+            return item
+    raise ValueError('no function ' + fn_name + ' in ' + abi_name + ' ABI')
+
+
+def _encode_word(abi_type, value):
+    # a word that does not fit its type would silently corrupt the call data
+    if abi_type == 'address':
+        if not isinstance(value, str) or not _ADDRESS.match(value):
+            raise ValueError('not an address: ' + repr(value))
+        return value[2:].lower().rjust(64, '0')
+    if abi_type.startswith('uint'):
+        bits = int(abi_type[4:] or 256)
+        if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value < 1 << bits:
+            raise ValueError(repr(value) + ' is not a ' + abi_type)
+        return '%064x' % value
+    if abi_type.startswith('bytes') and abi_type != 'bytes':
+        if isinstance(value, str):
+            value = bytes.fromhex(value[2:] if value[:2] == '0x' else value)
+        if len(value) > int(abi_type[5:]):
+            raise ValueError(value.hex() + ' is longer than ' + abi_type)
+        return value.hex().ljust(64, '0')
+    raise ValueError('cannot encode ' + abi_type)
+
+
+def encode_call(abi_name, fn_name, args):
+    """
+    Returns the call data for a function with only static arguments
+    (address, uintN, bytesN), using the cached selector instead of
+    Contract.encodeABI
+
+    Raises ValueError for an argument that does not fit its type: a uint out
+    of range or negative, an address that is not 0x and 40 hex digits, or
+    bytesN longer than N bytes.
+
+    :param abi_name: ABI name, 'etherdelta' or 'token'
+    :type abi_name: str
+    :param fn_name: function name
+    :type fn_name: str
+    :param args: positional arguments, or keyword arguments by input name
+    :type args: list or dict
+    :return: call data
+    :rtype: str
+    """
+    selector, types = function_info(abi_name, fn_name)
+    if isinstance(args, dict):
+        args = [args[name] for name in input_names(abi_name, fn_name)]
+    if len(args) != len(types):
+        raise ValueError(fn_name + ' takes ' + str(len(types)) + ' arguments')
+    return selector + ''.join(_encode_word(t, v) for t, v in zip(types, args))
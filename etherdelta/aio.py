@@ -0,0 +1,1241 @@
+import asyncio
+import inspect
+import json
+import itertools
+import logging
+import time
+from collections import deque
+
+try:
+    import aiohttp
+    import websockets
+except ImportError:
+    aiohttp = None
+    websockets = None
+
+import etherdelta
+from .lazy import LazyImport
+from .rpc import JSONRPC, ProviderJSONRPC, RPCError, batch_method, batch_payload, batch_results, response_error
+from .abi import encode_call
+from .frames import EVENT_PREFIX, decode_event, frame_topic
+from .session import pick_waiter, reply_key
+from .subscription import EVENTS, _BaseSubscription
+from .validation import check_orders
+from . import history
+from . import Client, SessionError, LocalOrderBook, Order, OrderIndex, Snapshot, TickerIndex, log_event, plan_fills
+
+Web3 = LazyImport('web3', 'Web3')
+HexBytes = LazyImport('hexbytes', 'HexBytes')
+
+
+class _AsyncWaiter(object):
+    __slots__ = ('message', 'future', 'key')
+
+    def __init__(self, message, future, key=None):
+        self.message = message
+        self.future = future
+        self.key = key
+
+
+class AsyncSocketSession(object):
+    """
+    asyncio counterpart of SocketSession
+
+    Keeps one socket.io connection open on the running event loop, matches
+    replies to outstanding requests by event topic and reconnects on its own.
+    """
+
+    def __init__(self, url, connect_timeout=10, reconnect_delay=1, hooks=None):
+        self.url = url
+        self.hooks = hooks
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.ping_interval = 25
+        self.ws = None
+        self._waiters = {}
+        # waiter that has its topic to itself, by topic
+        self._exclusive = {}
+        # futures resolved whenever a waiter is removed
+        self._changed = []
+        self._listeners = {}
+        self._reconnect_listeners = []
+        self._connected = None
+        self._closed = False
+        self._task = None
+        self._has_connected = False
+
+    async def connect(self):
+        """
+        Opens the socket if it is not already open
+        """
+        self._start()
+        await asyncio.wait_for(self._connected.wait(), self.connect_timeout)
+
+    def _start(self):
+        if self._closed:
+            raise SessionError('session is closed')
+        if self._connected is None:
+            self._connected = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """
+        Closes the socket and stops reconnecting
+        """
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+        if self.ws is not None:
+            await self.ws.close()
+        for topic_waiters in self._waiters.values():
+            for waiter in topic_waiters:
+                if not waiter.future.done():
+                    waiter.future.set_result(None)
+        self._waiters = {}
+        self._exclusive = {}
+        self._notify_changed()
+
+    async def send(self, message):
+        """
+        Sends a raw frame, opening the socket first if needed
+
+        :param message: socket.io frame, e.g. '42["getMarket",{...}]'
+        :type message: str
+        """
+        if self._connected is None or not self._connected.is_set():
+            await self.connect()
+        await self.ws.send(message)
+
+    async def request(self, message, topic, timeout=30, max_tries=3, key=None, exclusive=False):
+        """
+        Sends a frame and waits for the next reply with the given event topic
+
+        Empty replies and timeouts are retried up to `max_tries` times, a
+        request with a key that timed out alone, see SocketSession.request.
+
+        :param message: socket.io frame to send
+        :type message: str
+        :param topic: event topic of the reply, e.g. 'market'
+        :type topic: str
+        :param timeout: seconds to wait for each attempt
+        :type timeout: float
+        :param max_tries: number of attempts
+        :type max_tries: int
+        :param key: reply_key of the expected reply, None to take the next reply
+        :type key: str
+        :param exclusive: send the first attempt alone too
+        :type exclusive: bool
+        :return: reply payload, or None if no reply arrived
+        :rtype: object
+        """
+        loop = asyncio.get_event_loop()
+        hooks = self.hooks
+        for attempt in range(max_tries):
+            if self._closed:
+                raise SessionError('session is closed')
+            waiter = _AsyncWaiter(message, loop.create_future(), key)
+            if hooks is not None:
+                sent = time.perf_counter()
+            queued = await self._enqueue(waiter, topic, exclusive, timeout)
+            if self._closed:
+                raise SessionError('session is closed')
+            if queued and self._connected is not None and self._connected.is_set():
+                try:
+                    await self.ws.send(message)
+                except Exception:
+                    # The waiter stays registered; the frame is resent on reconnect
+                    pass
+            elif queued:
+                self._start()
+            payload = None
+            if queued:
+                try:
+                    payload = await asyncio.wait_for(waiter.future, timeout)
+                    answered = True
+                except asyncio.TimeoutError:
+                    answered = False
+                    topic_waiters = self._waiters.get(topic)
+                    if topic_waiters and waiter in topic_waiters:
+                        self._remove(topic, topic_waiters, waiter)
+            if not queued or not answered:
+                exclusive = key is not None
+            if payload:
+                if hooks is not None:
+                    hooks.socket_request(topic, time.perf_counter() - sent)
+                return payload
+            if hooks is not None and attempt + 1 < max_tries:
+                hooks.socket_retry(topic)
+        return None
+
+    def add_listener(self, topic, callback):
+        """
+        Registers a callback for every frame with the given event topic,
+        including frames pushed by the server without a request
+
+        :param topic: event topic, e.g. 'orders'
+        :type topic: str
+        :param callback: called with the frame payload
+        :type callback: function
+        """
+        self._listeners.setdefault(topic, []).append(callback)
+
+    def remove_listener(self, topic, callback):
+        """
+        Unregisters a callback added with add_listener
+        """
+        listeners = self._listeners.get(topic)
+        if listeners and callback in listeners:
+            listeners.remove(callback)
+
+    def add_reconnect_listener(self, callback):
+        """
+        Registers a callback for every time the socket is reopened after it
+        dropped, see SocketSession.add_reconnect_listener
+
+        The callback is called without arguments from the task reading the
+        socket, so it must schedule anything that waits for a reply.
+
+        :param callback: called after each reconnection
+        :type callback: function
+        """
+        self._reconnect_listeners.append(callback)
+
+    def remove_reconnect_listener(self, callback):
+        """
+        Unregisters a callback added with add_reconnect_listener
+        """
+        if callback in self._reconnect_listeners:
+            self._reconnect_listeners.remove(callback)
+
+    async def _enqueue(self, waiter, topic, exclusive, timeout):
+        # returns False if the topic could not be had in time
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while not self._closed and (topic in self._exclusive or (exclusive and self._waiters.get(topic))):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            changed = loop.create_future()
+            self._changed.append(changed)
+            try:
+                await asyncio.wait_for(changed, remaining)
+            except asyncio.TimeoutError:
+                return False
+        if self._closed:
+            return False
+        if exclusive:
+            self._exclusive[topic] = waiter
+        self._waiters.setdefault(topic, deque()).append(waiter)
+        return True
+
+    def _remove(self, topic, topic_waiters, waiter):
+        topic_waiters.remove(waiter)
+        if self._exclusive.get(topic) is waiter:
+            del self._exclusive[topic]
+        self._notify_changed()
+
+    def _notify_changed(self):
+        changed, self._changed = self._changed, []
+        for future in changed:
+            if not future.done():
+                future.set_result(None)
+
+    async def _dispatch(self, topic, payload):
+        for callback in list(self._listeners.get(topic, ())):
+            try:
+                result = callback(payload)
+                # a listener may hand back an awaitable to hold reading until it is done
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                pass
+        topic_waiters = self._waiters.get(topic)
+        while topic_waiters:
+            if len(topic_waiters) == 1 and topic_waiters[0].key is None:
+                waiter = topic_waiters[0]
+            else:
+                waiter = pick_waiter(topic_waiters, reply_key(topic, payload))
+                if waiter is None:
+                    return
+            self._remove(topic, topic_waiters, waiter)
+            if not waiter.future.done():
+                waiter.future.set_result(payload)
+                return
+
+    async def _ping(self, ws):
+        # socket.io expects an engine.io ping ('2') every pingInterval
+        try:
+            while not self._closed:
+                await asyncio.sleep(self.ping_interval)
+                await ws.send('2')
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # the socket is gone, the reader notices and reconnects
+            log_event(logging.DEBUG, 'socket_ping_failed', url=self.url, error=repr(e))
+            if self.hooks is not None:
+                self.hooks.socket_error(self.url, e)
+
+    async def _run(self):
+        while not self._closed:
+            pinger = None
+            connect_started = time.perf_counter()
+            try:
+                async with websockets.connect(self.url, ping_interval=None, max_size=None) as ws:
+                    self.ws = ws
+                    async for message in ws:
+                        if message[:2] == EVENT_PREFIX:
+                            hooks = self.hooks
+                            topic = frame_topic(message)
+                            if topic is not None and not (self._listeners.get(topic) or self._waiters.get(topic)):
+                                # nobody is waiting for or listening to this topic, skip decoding
+                                if hooks is not None:
+                                    hooks.socket_frame_skipped(topic, len(message))
+                                continue
+                            if hooks is None:
+                                event = decode_event(message)
+                            else:
+                                started = time.perf_counter()
+                                event = decode_event(message)
+                                if event:
+                                    hooks.socket_frame(event[0], len(message), time.perf_counter() - started)
+                            if event:
+                                await self._dispatch(*event)
+                        elif message[:1] == '0':
+                            try:
+                                handshake = json.loads(message[1:])
+                                self.ping_interval = handshake.get('pingInterval', 25000) / 1000.0
+                            except ValueError:
+                                pass
+                            reconnect = self._has_connected
+                            pending = [w.message for topic_waiters in self._waiters.values() for w in topic_waiters]
+                            self._connected.set()
+                            if self.hooks is not None:
+                                self.hooks.socket_connected(self.url, time.perf_counter() - connect_started, reconnect)
+                            self._has_connected = True
+                            for pending_message in pending:
+                                await ws.send(pending_message)
+                            pinger = asyncio.ensure_future(self._ping(ws))
+                            if reconnect:
+                                for callback in list(self._reconnect_listeners):
+                                    try:
+                                        callback()
+                                    except Exception:
+                                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.hooks is not None:
+                    self.hooks.socket_error(self.url, e)
+            finally:
+                self._connected.clear()
+                if pinger is not None:
+                    pinger.cancel()
+            if not self._closed:
+                await asyncio.sleep(self.reconnect_delay)
+
+
+class AsyncSubscription(_BaseSubscription):
+    """
+    asyncio counterpart of Subscription, iterated with `async for`
+
+    With the 'block' policy the session stops reading from the socket while
+    the buffer is full.
+    """
+
+    def __init__(self, session, token_addr=None, events=EVENTS, user=None, maxsize=1000, overflow='drop_oldest'):
+        """
+        :param session: session the events arrive on
+        :type session: AsyncSocketSession
+        :param token_addr: token address, None for every token
+        :type token_addr: str
+        :param events: event topics
+        :type events: list
+        :param user: only events of this account, None for every account
+        :type user: str
+        :param maxsize: number of buffered events
+        :type maxsize: int
+        :param overflow: 'drop_oldest' or 'block'
+        :type overflow: str
+        """
+        self._changed = asyncio.Event()
+        super().__init__(session, token_addr, events, user, maxsize, overflow)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    async def get(self, timeout=None):
+        """
+        Returns the next event
+
+        :param timeout: seconds to wait, forever if None
+        :type timeout: float
+        :return: (topic, payload), or None on timeout or once closed and drained
+        :rtype: tuple
+        """
+        try:
+            await asyncio.wait_for(self._wait_for(lambda: self._buffer or self._closed), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if not self._buffer:
+            return None
+        event = self._buffer.popleft()
+        self._notify()
+        return event
+
+    def close(self):
+        """
+        Stops receiving events; buffered events can still be read
+        """
+        self._unsubscribe()
+        self._closed = True
+        self._notify()
+
+    def _notify(self):
+        # wakes every waiter; they re-check their condition on a fresh event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _wait_for(self, predicate):
+        while not predicate():
+            await self._changed.wait()
+
+    def _on_event(self, topic, payload):
+        payload = self._filter(topic, payload)
+        if payload is None:
+            return None
+        if len(self._buffer) >= self.maxsize:
+            if self.overflow == 'block':
+                # the session awaits this before reading the next frame
+                return self._put_when_free(topic, payload)
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append((topic, payload))
+        self._notify()
+        return None
+
+    async def _put_when_free(self, topic, payload):
+        await self._wait_for(lambda: len(self._buffer) < self.maxsize or self._closed)
+        if not self._closed:
+            self._buffer.append((topic, payload))
+            self._notify()
+
+
+class AsyncRPC(object):
+    """
+    Minimal asynchronous Ethereum JSON-RPC client over HTTP
+    """
+
+    def __init__(self, endpoint_uri, timeout=30, chunk_size=100, hooks=None):
+        """
+        :param endpoint_uri: HTTP endpoint
+        :type endpoint_uri: str
+        :param timeout: seconds to wait for each HTTP request
+        :type timeout: float
+        :param chunk_size: maximum number of calls per batch request
+        :type chunk_size: int
+        :param hooks: instrumentation hooks
+        :type hooks: Hooks
+        """
+        self.endpoint_uri = endpoint_uri
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.hooks = hooks
+        self._ids = itertools.count(1)
+        self._session = None
+
+    async def call(self, method, params):
+        """
+        Makes a JSON-RPC call
+
+        :param method: RPC method, e.g. 'eth_call'
+        :type method: str
+        :param params: RPC params
+        :type params: list
+        :return: result
+        :rtype: object
+        """
+        payload = {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params}
+        data = await self._post(payload, method, 1)
+        if data.get('error'):
+            raise RPCError(data['error'])
+        return data['result']
+
+    async def batch(self, calls):
+        """
+        Sends calls as JSON-RPC batches of at most chunk_size calls, all at once
+
+        :param calls: list of (method, params)
+        :type calls: list
+        :return: results in input order, with an RPCError in place of every failed call
+        :rtype: list
+        """
+        if not calls:
+            return []
+        chunks = [calls[start:start + self.chunk_size] for start in range(0, len(calls), self.chunk_size)]
+        results = []
+        for chunk_results in await asyncio.gather(*[self._batch_chunk(chunk) for chunk in chunks]):
+            results.extend(chunk_results)
+        return results
+
+    async def _batch_chunk(self, calls):
+        payload = batch_payload(calls, self._ids)
+        try:
+            data = await self._post(payload, batch_method(calls), len(calls))
+        except Exception as e:
+            return [RPCError(str(e))] * len(calls)
+        return batch_results(payload, data)
+
+    async def _post(self, payload, method, calls):
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        hooks = self.hooks
+        if hooks is not None:
+            started = time.perf_counter()
+        try:
+            async with self._session.post(self.endpoint_uri, json=payload, timeout=self.timeout) as response:
+                data = await response.json(content_type=None)
+        except Exception as e:
+            if hooks is not None:
+                hooks.rpc_call(method, time.perf_counter() - started, calls, e)
+            raise
+        if hooks is not None:
+            hooks.rpc_call(method, time.perf_counter() - started, calls, response_error(data))
+        return data
+
+    async def eth_call(self, to, data):
+        result = await self.call('eth_call', [{'to': to, 'data': data}, 'latest'])
+        return int(result, 16)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncClient(Client):
+    """
+    asyncio version of Client
+
+    Every network method is a coroutine. All requests share one WebSocket
+    session and one HTTP connection pool on the running event loop.
+    """
+    rpc = None
+
+    def __init__(self, ticker_ttl=60, market_ttl=5, rpc_url=None, provider=None, hooks=None):
+        """
+        See Client; rpc_url must be a single HTTP endpoint
+        """
+        if aiohttp is None or websockets is None:
+            raise ImportError('AsyncClient requires the aiohttp and websockets packages')
+        if isinstance(rpc_url, (list, tuple)):
+            raise ValueError('AsyncClient does not pool endpoints, pass a single rpc_url')
+        super().__init__(ticker_ttl, market_ttl, rpc_url, provider, hooks)
+        if provider is not None and self.rpc_url is None:
+            raise ValueError('AsyncClient sends JSON-RPC over HTTP, pass a provider with an HTTP endpoint_uri or an rpc_url')
+        self.rpc = AsyncRPC(self.rpc_url or etherdelta.rpcURL, hooks=hooks)
+
+    def get_session(self):
+        """
+        Returns the persistent WebSocket session, creating it on first use
+
+        :return: session
+        :rtype: AsyncSocketSession
+        """
+        if self.session is None:
+            self.session = AsyncSocketSession(self.websocket_url, hooks=self.hooks)
+        return self.session
+
+    async def close(self):
+        """
+        Closes the WebSocket session and the JSON-RPC connection pool
+        """
+        self.stop_snapshots()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.chain_head is not None:
+            self.chain_head.close()
+            self.chain_head = None
+        await self.rpc.close()
+
+    def _head_rpc(self):
+        # the chain head polls from its own thread
+        return self._blocking_rpc()
+
+    def _blocking_rpc(self):
+        # blocking client for work done on threads, off the event loop
+        if self.provider is not None:
+            return ProviderJSONRPC(self.provider, hooks=self.hooks)
+        return JSONRPC(self.rpc_url or etherdelta.rpcURL, hooks=self.hooks)
+
+    async def ingest_events(self, path, from_block, to_block=None, events=history.EVENTS, chunk_size=2000, workers=4, progress=None):
+        """
+        Downloads the EtherDelta contract's events into a columnar store on disk,
+        see Client.ingest_events
+
+        The download runs on a thread with a blocking JSON-RPC client, off the
+        event loop, and `progress` is called from that thread.
+
+        :return: number of events written
+        :rtype: int
+        """
+        return await asyncio.get_event_loop().run_in_executor(
+            None, self._ingest_events, self._blocking_rpc(), path, from_block, to_block, events, chunk_size, workers, progress)
+
+    async def _get_ticker_index(self):
+        async def fetch():
+            msg = await self._get_market('', '0x0000000000000000000000000000000000000000')
+            if msg and msg['returnTicker']:
+                return TickerIndex(msg['returnTicker'])
+            return None
+        return await self.market_cache.get_async('tickers', fetch) or TickerIndex({})
+
+    async def _get_order_index(self, token_addr):
+        return await self.order_cache.get_async(token_addr.lower(), lambda: self._fetch_order_index(token_addr))
+
+    async def _fetch_order_index(self, token_addr):
+        msg = await self._get_market(token_addr)
+        if msg and msg['orders']:
+            index = OrderIndex(msg['orders'])
+            self.order_cache.put(token_addr.lower(), index)
+            return index
+        return None
+
+    async def _get_order_args(self, token_addr, order):
+        if isinstance(order, (dict, Order)):
+            return self._order_args(order)
+        index = await self._get_order_index(token_addr)
+        if index is None:
+            return None
+        return index.args(order)
+
+    async def _get_market(self, token_addr='', user='', timeout=30, max_tries=3):
+        emitMessage = '42["getMarket",' + json.JSONEncoder().encode({'token': token_addr, 'user': user}) + ']'
+        key = token_addr.lower() if token_addr else None
+        return await self.get_session().request(emitMessage, 'market', timeout, max_tries, key)
+
+    async def get_eth_balance(self, account):
+        """
+        Returns the ETH balance of an account
+
+        :param account: account
+        :type account: str
+        :return: balance
+        :rtype: float
+        """
+        account = Web3.toChecksumAddress(account)
+        balance = int(await self.rpc.call('eth_getBalance', [account, 'latest']), 16)
+        return Web3.fromWei(balance, 'ether')
+
+    async def get_token_balance(self, account, token_addr):
+        """
+        Returns the token balance of an account
+
+        :param account: account
+        :type account: str
+        :param token_addr: token address
+        :type token_addr: str
+        :return: balance
+        :rtype: int
+        """
+        token_addr = Web3.toChecksumAddress(token_addr)
+        account = Web3.toChecksumAddress(account)
+        data = encode_call('token', 'balanceOf', [account])
+        balance = await self.rpc.eth_call(token_addr, data)
+        return Web3.fromWei(balance, 'ether')
+
+    async def get_etherdelta_eth_balance(self, account):
+        """
+        Returns the ETH balance in EtherDelta of an account
+
+        :param account: account
+        :type account: str
+        :return: balance
+        :rtype: int
+        """
+        return await self.get_etherdelta_token_balance(account, '0x0000000000000000000000000000000000000000')
+
+    async def get_etherdelta_token_balance(self, account, token_addr):
+        """
+        Returns the token balance in EtherDelta of an account
+
+        :param account: account
+        :type account: str
+        :param token_addr: token address
+        :type token_addr: str
+        :return: balance
+        :rtype: int
+        """
+        account = Web3.toChecksumAddress(account)
+        balance = 0
+        if token_addr:
+            data = encode_call('etherdelta', 'balanceOf', [Web3.toChecksumAddress(token_addr), account])
+            balance = await self.rpc.eth_call(self.contractEtherDelta.address, data)
+        return Web3.fromWei(balance, 'ether')
+
+    async def get_token_address(self, symbol):
+        """
+        Returns the token address given the token symbol
+
+        :param symbol: token symbol
+        :type account: str
+        :return: token address
+        :rtype: str
+        """
+        return (await self._get_ticker_index()).token_address(symbol)
+
+    async def get_orderbook(self, token_addr):
+        """
+        Returns the orderbook for a token given the symbol
+
+        :param token_addr: token address
+        :type token_addr: str
+        :return: orderbook
+        :rtype: list
+        """
+        index = await self._fetch_order_index(token_addr)
+        if index is None:
+            return {}
+        return index.snapshot
+
+    async def get_order(self, token_addr, order_id):
+        """
+        Returns the the order information for a token given the symbol and order ID
+
+        :param token_addr: token address
+        :type token_addr: str
+        :param order_id: order ID
+        :type order_id: str
+        :return: order
+        :rtype: object
+        """
+        index = await self._get_order_index(token_addr)
+        if index is None:
+            return {}
+        return index.get(order_id) or {}
+
+    async def get_sell_orderbook(self, token_addr):
+        """
+        Returns the sell (asks) orderbook
+
+        :param token_addr: token address
+        :type token_addr: str
+        :return: sell orderbook list
+        :rtype: list
+        """
+        orders = await self.get_orderbook(token_addr)
+        return orders.get('sells') or []
+
+    async def get_buy_orderbook(self, token_addr):
+        """
+        Returns the buy (bids) orderbook
+
+        :param token_addr: token address
+        :type token_addr: str
+        :return: buy orderbook list
+        :rtype: list
+        """
+        orders = await self.get_orderbook(token_addr)
+        return orders.get('buys') or []
+
+    async def get_markets(self, token_addrs, user='', concurrency=16, timeout=10, max_tries=2):
+        """
+        Fetches the markets of many tokens at once, see Client.get_markets
+
+        :return: market of every token, or the exception for tokens that failed
+        :rtype: dict
+        """
+        token_addrs = list(dict.fromkeys(token_addrs))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(token_addr):
+            async with semaphore:
+                try:
+                    msg = await self._get_market(token_addr, user, timeout, max_tries)
+                except Exception as e:
+                    return e
+            if not msg:
+                return SessionError('no market reply for ' + token_addr)
+            return msg
+
+        results = await asyncio.gather(*[fetch(token_addr) for token_addr in token_addrs])
+        return dict(zip(token_addrs, results))
+
+    async def get_orderbooks(self, token_addrs, concurrency=16, timeout=10, max_tries=2):
+        """
+        Returns the orderbooks of many tokens, fetched concurrently, see Client.get_orderbooks
+
+        :return: orderbook of every token, or the exception for tokens that failed
+        :rtype: dict
+        """
+        markets = await self.get_markets(token_addrs, '', concurrency, timeout, max_tries)
+        return dict((token_addr, self._market_orderbook(token_addr, msg)) for token_addr, msg in markets.items())
+
+    async def get_local_orderbook(self, token_addr):
+        """
+        Returns an order book for a token that is kept up to date in memory
+        from pushed updates
+
+        :param token_addr: token address
+        :type token_addr: str
+        :return: orderbook
+        :rtype: LocalOrderBook
+        """
+        book = LocalOrderBook(token_addr)
+        await book.attach_async(self)
+        self.local_books[book.token_addr] = book
+        return book
+
+    async def restore_snapshot(self, path, reconcile=True):
+        """
+        Loads a snapshot into local order books, see Client.restore_snapshot.
+        With `reconcile`, reconcile_books runs as a task on the event loop.
+
+        :param path: snapshot file
+        :type path: str
+        :param reconcile: refresh the books from the API in the background
+        :type reconcile: bool
+        :return: order books by token
+        :rtype: dict
+        """
+        with Snapshot(path) as snapshot:
+            try:
+                block_number = await self.get_block_number()
+            except Exception:
+                block_number = snapshot.block_number
+            books = self._restore_books(snapshot, block_number, self.get_session())
+        await self.get_session().connect()
+        if reconcile and books:
+            asyncio.ensure_future(self.reconcile_books(list(books)))
+        return books
+
+    async def reconcile_books(self, token_addrs=None, concurrency=16, timeout=10, max_tries=2):
+        """
+        Replaces local order books with fresh snapshots, see Client.reconcile_books
+
+        :return: the exception of every token that could not be refreshed
+        :rtype: dict
+        """
+        books = self._reconciling(token_addrs)
+        try:
+            fresh = await self.get_orderbooks(list(books), concurrency, timeout, max_tries)
+        except Exception as e:
+            fresh = dict.fromkeys(books, e)
+        return self._reconciled(books, fresh)
+
+    async def subscribe(self, token_addr=None, events=EVENTS, user=None, maxsize=1000, overflow='drop_oldest'):
+        """
+        Subscribes to the events the WebSocket API pushes for a token
+
+        :param token_addr: token address, None for every token
+        :type token_addr: str
+        :param events: event topics, any of 'orders', 'trades' and 'funds'
+        :type events: list
+        :param user: only events of this account, None for every account
+        :type user: str
+        :param maxsize: number of events buffered for a slow consumer
+        :type maxsize: int
+        :param overflow: when the buffer is full, 'drop_oldest' discards the oldest event
+                         and 'block' stops reading from the socket until there is room
+        :type overflow: str
+        :return: subscription, iterated with `async for`
+        :rtype: AsyncSubscription
+        """
+        session = self.get_session()
+        subscription = AsyncSubscription(session, token_addr, events, user, maxsize, overflow)
+        await session.connect()
+        return subscription
+
+    async def get_amount_filled(self, token_addr, order_id):
+        """
+        Returns amount filled for an order given order ID
+
+        :param token_addr: token address
+        :type token_addr: str
+        :param order_id: order ID, or the order itself to skip the lookup
+        :type order_id: str, dict or Order
+        :return: filled amount
+        :rtype: int
+        """
+        args = await self._get_order_args(token_addr, order_id)
+        if args is None:
+            return None
+        data = encode_call('etherdelta', 'amountFilled', args)
+        return await self.rpc.eth_call(self.contractEtherDelta.address, data)
+
+    async def get_available_volume(self, token_addr, order_id):
+        """
+        Returns available volume for an order give order ID
+
+        :param token_addr: token address
+        :type token_addr: str
+        :param order_id: order ID, or the order itself to skip the lookup
+        :type order_id: str, dict or Order
+        :return: available volume
+        :rtype: int
+        """
+        args = await self._get_order_args(token_addr, order_id)
+        if args is None:
+            return None
+        data = encode_call('etherdelta', 'availableVolume', args)
+        return await self.rpc.eth_call(self.contractEtherDelta.address, data)
+
+    async def get_eth_balances(self, accounts):
+        """
+        Returns the ETH balances of many accounts in one JSON-RPC batch
+
+        :param accounts: accounts
+        :type accounts: list
+        :return: balances in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return await self._batch(self._eth_balance_calls(accounts), self._from_wei)
+
+    async def get_token_balances(self, pairs):
+        """
+        Returns the token balances of many (account, token_addr) pairs in one JSON-RPC batch
+
+        :param pairs: (account, token_addr) pairs
+        :type pairs: list
+        :return: balances in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return await self._batch(self._token_balance_calls(pairs), self._from_wei)
+
+    async def get_etherdelta_token_balances(self, pairs):
+        """
+        Returns the EtherDelta balances of many (account, token_addr) pairs in one JSON-RPC batch
+
+        :param pairs: (account, token_addr) pairs, use the zero address for ETH
+        :type pairs: list
+        :return: balances in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return await self._batch(self._etherdelta_balance_calls(pairs), self._from_wei)
+
+    async def get_amounts_filled(self, orders):
+        """
+        Returns the amounts filled of many orders in one JSON-RPC batch
+
+        :param orders: orders
+        :type orders: list
+        :return: filled amounts in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        return await self._batch(self._order_calls(orders, 'amountFilled'), self._to_int)
+
+    async def get_available_volumes(self, orders, validate=False, block_number=None):
+        """
+        Returns the available volumes of many orders in one JSON-RPC batch,
+        see Client.get_available_volumes
+
+        :return: available volumes in input order, with an exception in place of every failed item
+        :rtype: list
+        """
+        calls = self._order_calls(orders, 'availableVolume')
+        if validate:
+            calls = self._valid_calls(calls, orders, await self.validate_orders(orders, block_number))
+        return await self._batch(calls, self._to_int)
+
+    async def validate_orders(self, orders, block_number=None, workers=None, executor=None):
+        """
+        Checks orders locally, see Client.validate_orders
+
+        The checks run on a thread (and across the given process pool for
+        large books), off the event loop.
+
+        :return: reason each order is invalid, None for valid orders
+        :rtype: list
+        """
+        if block_number is None:
+            block_number = await self._cached_block_number()
+        return await asyncio.get_event_loop().run_in_executor(
+            None, check_orders, orders, block_number, etherdelta.addressEtherDelta, workers, executor)
+
+    async def filter_orders(self, orders, block_number=None, workers=None, executor=None):
+        """
+        Returns the orders that pass validate_orders
+        """
+        reasons = await self.validate_orders(orders, block_number, workers, executor)
+        return [order for order, reason in zip(orders, reasons) if reason is None]
+
+    async def plan_fill(self, token_addr, side, eth_amount, user=None, confirm=True, validate=True, min_fill=0):
+        """
+        Plans filling eth_amount ETH of a token across orders, see Client.plan_fill
+
+        :return: plan
+        :rtype: FillPlan
+        """
+        orders = await self._plan_orders(token_addr, side)
+        block_number = await self.get_block_number()
+        volumes = self._plan_volumes(block_number, validate)
+        lookahead = 0
+        while True:
+            plan = plan_fills(orders, side, eth_amount, volumes, user, block_number, min_fill)
+            pending = [fill.order for fill in plan.fills if not fill.confirmed]
+            if not confirm or not pending:
+                return plan
+            pending += self._lookahead(orders, side, user, block_number, volumes, plan, lookahead)
+            self._confirmed_volumes(volumes, pending, await self.get_available_volumes(pending, validate, block_number))
+            # when orders turn out to have less volume than the book says,
+            # also confirm more of the orders after the plan every round
+            lookahead = max(2 * lookahead, len(pending))
+
+    async def _plan_orders(self, token_addr, side):
+        book = self.local_books.get(token_addr.lower())
+        if book is not None:
+            return book.asks() if side == 'buy' else book.bids()
+        if side == 'buy':
+            return self._best_first(await self.get_sell_orderbook(token_addr), side)
+        return self._best_first(await self.get_buy_orderbook(token_addr), side)
+
+    async def _cached_block_number(self):
+        number = self._recent_block_number()
+        return await self.get_block_number() if number is None else number
+
+    async def _batch(self, calls, convert):
+        number, keys, cached = self._cached_reads(calls)
+        fetched = await self.rpc.batch([call for call, key, value in zip(calls, keys, cached) if key is not None and value is None])
+        return self._batch_results(calls, self._merge_reads(number, keys, cached, fetched), convert)
+
+    async def get_ticker(self, symbol=''):
+        """
+        Returns ticker data for token
+
+        :param symbol: token symbol
+        :type symbol: str
+        :return: ticker data
+        :rtype: object
+        """
+        return (await self._get_ticker_index()).ticker(symbol)
+
+    async def get_tickers(self):
+        """
+        Returns ticker data for all tokens
+
+        :return: ticker data
+        :rtype: object
+        """
+        return (await self._get_ticker_index()).tickers
+
+    async def get_block_number(self, refresh=False):
+        """
+        Returns the highest block number, see Client.get_block_number
+
+        :param refresh: ask the node now even if the chain head is running
+        :type refresh: bool
+        :return: block number
+        :rtype: int
+        """
+        head = self.get_chain_head()
+        if refresh or not head.running or head.number is None:
+            return await asyncio.get_event_loop().run_in_executor(None, head.refresh)
+        return head.number
+
+    async def get_gas_price(self):
+        """
+        Returns the node's gas price estimate, see Client.get_gas_price
+
+        :return: gas price in wei
+        :rtype: int
+        """
+        head = self.get_chain_head()
+        if not head.running or head.gas_price is None:
+            try:
+                await asyncio.get_event_loop().run_in_executor(None, head.refresh)
+            except Exception:
+                pass
+        return head.gas_price or etherdelta.defaultGasPrice
+
+    async def post_order(self, order):
+        """
+        Posts an order to the off-chain order book
+
+        :param order: signed order
+        :type order: object
+        :return: response
+        :rtype: string
+        """
+        emitMessage = '42["message",' + json.JSONEncoder().encode(order) + ']'
+        result = await self.get_session().request(emitMessage, 'messageResult')
+        if result is None:
+            return ''
+        return result
+
+    async def trade(self, order, eth_amount, user_private_key, gas=None, gas_price=None):
+        """
+        Invokes on-chain trade
+
+        :param order: order
+        :type order: object
+        :param eth_amount: ETH amount
+        :type eth_amount: float
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param gas: gas limit, defaults to etherdelta.defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
+        :return: tx
+        :rtype: object
+        """
+        if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
+        parsed = Order.parse(order)
+        kwargs, ordertype, amount = self._trade_kwargs(parsed, eth_amount)
+        log_event(logging.INFO, 'trade', eth_amount=eth_amount, amount=amount, type=ordertype,
+                  available=parsed.ethAvailableVolume, price=parsed.price, order=parsed.id)
+        abidata = self.contractEtherDelta.encodeABI('trade', kwargs=kwargs)
+        return await self._send_transaction(abidata, user_private_key, gas, gas_price)
+
+    async def cancel_order(self, order, user_private_key, gas=None, gas_price=None):
+        """
+        Cancels an order on-chain
+
+        :param order: order
+        :type order: object
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param gas: gas limit, defaults to etherdelta.defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
+        :return: tx
+        :rtype: object
+        """
+        if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
+        parsed = Order.parse(order)
+        log_event(logging.INFO, 'cancel_order', order=parsed.id)
+        abidata = self.contractEtherDelta.encodeABI('cancelOrder', kwargs=self._cancel_kwargs(parsed))
+        return await self._send_transaction(abidata, user_private_key, gas, gas_price)
+
+    async def cancel_orders(self, orders, user_private_key, gas=None, gas_price=None, workers=None, executor=None):
+        """
+        Cancels many orders on-chain in one go, see Client.cancel_orders
+
+        Signing runs in the default executor so the event loop is not blocked.
+
+        :param orders: orders
+        :type orders: list
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param gas: gas limit of each transaction, defaults to etherdelta.defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
+        :param workers: number of worker processes, 1 signs in a single thread
+        :type workers: int
+        :param executor: executor to reuse across calls instead of starting a process pool
+        :type executor: concurrent.futures.Executor
+        :return: tx hash of each order, in input order, with the exception in place of every failed one
+        :rtype: list
+        """
+        datas = self._transaction_data('cancelOrder', self._cancel_kwargs, orders)
+        return await self._send_transactions(datas, user_private_key, gas, gas_price, workers, executor)
+
+    async def trade_many(self, fills, user_private_key, gas=None, gas_price=None, workers=None, executor=None):
+        """
+        Invokes many on-chain trades in one go, see Client.trade_many
+
+        :param fills: (order, eth_amount) of each trade
+        :type fills: list
+        :param user_private_key: user private key
+        :type user_private_key: string
+        :param gas: gas limit of each transaction, defaults to etherdelta.defaultGas
+        :type gas: int
+        :param gas_price: gas price in wei, defaults to the node's estimate (see get_gas_price)
+        :type gas_price: int
+        :param workers: number of worker processes, 1 signs in a single thread
+        :type workers: int
+        :param executor: executor to reuse across calls instead of starting a process pool
+        :type executor: concurrent.futures.Executor
+        :return: tx hash of each trade, in input order, with the exception in place of every failed one
+        :rtype: list
+        """
+        datas = self._transaction_data('trade', lambda fill: self._trade_kwargs(*fill)[0], fills)
+        return await self._send_transactions(datas, user_private_key, gas, gas_price, workers, executor)
+
+    async def trade_plan(self, plan, user_private_key, gas=None, gas_price=None, workers=None, executor=None):
+        """
+        Sends the trades of a fill plan in one go, see Client.trade_plan
+
+        :return: tx hash of each fill, in plan order, with the exception in place of every failed one
+        :rtype: list
+        """
+        datas = self._transaction_data('trade', lambda fill: fill.trade_kwargs(), plan.fills)
+        return await self._send_transactions(datas, user_private_key, gas, gas_price, workers, executor)
+
+    async def _send_transactions(self, datas, user_private_key, gas, gas_price, workers, executor):
+        if len(user_private_key) != 64: raise ValueError('WARNING: user_private_key must be a hexadecimal string of 64 characters long')
+        userAccount = self.w3.eth.account.privateKeyToAccount(user_private_key).address
+        gas_price = gas_price or await self.get_gas_price()
+        count = sum(1 for data in datas if not isinstance(data, Exception))
+        nonces = []
+        for _ in range(count):
+            nonces.append(await self.nonce_manager.next_async(userAccount, self._fetch_nonce_async))
+        try:
+            raws = await asyncio.get_event_loop().run_in_executor(
+                None, self._raw_transactions, datas, userAccount, user_private_key, iter(nonces), gas, gas_price, workers, executor)
+        except Exception:
+            # None of the nonces were used
+            self.nonce_manager.resync(userAccount)
+            raise
+        results = await self.rpc.batch([('eth_sendRawTransaction', [raw]) for raw in raws])
+        if any(isinstance(result, Exception) for result in results):
+            # Later nonces are left with a gap, get them from the node next time
+            self.nonce_manager.resync(userAccount)
+        return self._batch_results(datas, results, HexBytes)
+
+    async def _send_transaction(self, abidata, user_private_key, gas=None, gas_price=None):
+        userAccount = self.w3.eth.account.privateKeyToAccount(user_private_key).address
+        # Transaction info
+        maxGas = gas or etherdelta.defaultGas
+        gasPriceWei = gas_price or await self.get_gas_price()
+        nonce = await self.nonce_manager.next_async(userAccount, self._fetch_nonce_async)
+        try:
+            transaction = { 'to': self.contractEtherDelta.address, 'from': userAccount, 'gas': maxGas, 'gasPrice': gasPriceWei, 'data': abidata, 'nonce': nonce, 'chainId': 1}
+            log_event(logging.DEBUG, 'transaction', **transaction)
+            signed = self.w3.eth.account.signTransaction(transaction, user_private_key)
+            result = await self.rpc.call('eth_sendRawTransaction', [Web3.toHex(signed.rawTransaction)])
+        except Exception:
+            # The nonce may not have been used, get it from the node next time
+            self.nonce_manager.resync(userAccount)
+            raise
+        log_event(logging.INFO, 'transaction_sent', tx=result)
+        return HexBytes(result)
+
+    async def listen_once_and_close(self, emitTopic, emitMessage, eventTopic, callback):
+        """
+        Sends a message and passes the first reply with the given event topic
+        to callback, see Client.listen_once_and_close
+        """
+        msg = await self.get_session().request(emitMessage, eventTopic)
+        if msg:
+            callback(msg)
+
+    async def send_message(self, argObject):
+        tosend = '42["message",' + json.JSONEncoder().encode(argObject) + ']'
+        log_event(logging.DEBUG, 'send_message', message=tosend)
+        await self.get_session().send(tosend)
+
+    async def _fetch_nonce_async(self, account):
+        return int(await self.rpc.call('eth_getTransactionCount', [account, 'pending']), 16)
+
+
+class AsyncForkDeltaClient(AsyncClient):
+    def __init__(self, ticker_ttl=60, market_ttl=5, rpc_url=None, provider=None, hooks=None):
+        super().__init__(ticker_ttl, market_ttl, rpc_url, provider, hooks)
+        self.websocket_url = etherdelta.forkdeltaWebsocketURL
@@ -0,0 +1,269 @@
+# Vectorized order book analytics: books are turned into price/volume arrays
+# once and depth, VWAP, slippage, spread and imbalance are computed with NumPy,
+# for one book or for many books in one call.
+# Prices are in ETH per token and volumes in tokens (`ethAvailableVolume`) or ETH.
+# numpy is optional and only needed by this module.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('etherdelta.analytics requires numpy, install it with: pip install numpy')
+
+
+class BookArrays(object):
+    """
+    One token's order book as arrays, best price first on each side
+
+    bid_prices and ask_prices are in ETH per token, bid_volumes and
+    ask_volumes in tokens and bid_eth and ask_eth in ETH.
+    """
+    __slots__ = ('token_addr', 'bid_prices', 'bid_volumes', 'bid_eth', 'ask_prices', 'ask_volumes', 'ask_eth')
+
+    def __init__(self, bid_prices, bid_volumes, ask_prices, ask_volumes, token_addr=''):
+        _require_numpy()
+        self.token_addr = token_addr
+        self.bid_prices, self.bid_volumes = _sorted_side(bid_prices, bid_volumes, True)
+        self.ask_prices, self.ask_volumes = _sorted_side(ask_prices, ask_volumes, False)
+        self.bid_eth = self.bid_prices * self.bid_volumes
+        self.ask_eth = self.ask_prices * self.ask_volumes
+
+    @classmethod
+    def from_orders(cls, orders, token_addr=''):
+        """
+        Builds the arrays from an order book snapshot
+
+        :param orders: {'buys': [...], 'sells': [...]}, as returned by Client.get_orderbook
+        :type orders: dict
+        :param token_addr: token address
+        :type token_addr: str
+        :return: book
+        :rtype: BookArrays
+        """
+        bid_prices, bid_volumes = _side_arrays(orders.get('buys') or [])
+        ask_prices, ask_volumes = _side_arrays(orders.get('sells') or [])
+        return cls(bid_prices, bid_volumes, ask_prices, ask_volumes, token_addr)
+
+    @classmethod
+    def from_book(cls, book):
+        """
+        Builds the arrays from a LocalOrderBook
+
+        :param book: local order book
+        :type book: LocalOrderBook
+        :return: book
+        :rtype: BookArrays
+        """
+        return cls.from_orders({'buys': book.bids(), 'sells': book.asks()}, book.token_addr)
+
+    def __repr__(self):
+        return '<BookArrays %s: %d bids, %d asks>' % (self.token_addr, len(self.bid_prices), len(self.ask_prices))
+
+
+def _side_arrays(orders):
+    n = len(orders)
+    prices = np.fromiter((float(o['price']) for o in orders), dtype=np.float64, count=n)
+    volumes = np.fromiter((float(o['ethAvailableVolume']) for o in orders), dtype=np.float64, count=n)
+    return prices, volumes
+
+
+def _sorted_side(prices, volumes, descending):
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    volumes = np.ascontiguousarray(volumes, dtype=np.float64)
+    order = np.argsort(-prices if descending else prices, kind='stable')
+    return prices[order], volumes[order]
+
+
+def book_arrays(book, token_addr=''):
+    """
+    Returns book as BookArrays
+
+    :param book: BookArrays, LocalOrderBook or order book snapshot
+    :type book: object
+    :param token_addr: token address, for snapshots
+    :type token_addr: str
+    :return: book
+    :rtype: BookArrays
+    """
+    _require_numpy()
+    if isinstance(book, BookArrays):
+        return book
+    if isinstance(book, dict):
+        return BookArrays.from_orders(book, token_addr)
+    return BookArrays.from_book(book)
+
+
+def depth(book, side='asks'):
+    """
+    Returns the cumulative depth of one side of a book, best price first
+
+    :param book: BookArrays, LocalOrderBook or order book snapshot
+    :type book: object
+    :param side: 'bids' or 'asks'
+    :type side: str
+    :return: (prices, cumulative token volume, cumulative ETH volume)
+    :rtype: tuple
+    """
+    book = book_arrays(book)
+    if side == 'bids':
+        return book.bid_prices, np.cumsum(book.bid_volumes), np.cumsum(book.bid_eth)
+    if side == 'asks':
+        return book.ask_prices, np.cumsum(book.ask_volumes), np.cumsum(book.ask_eth)
+    raise ValueError("side must be 'bids' or 'asks'")
+
+
+def _pad(rows):
+    # stacks 1-d arrays of different lengths into one zero-padded matrix
+    width = max([len(row) for row in rows] + [1])
+    out = np.zeros((len(rows), width), dtype=np.float64)
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = row
+    return out
+
+
+def _vwap(prices, eth, eth_amount):
+    """
+    VWAP of taking eth_amount ETH from each row of padded price/ETH matrices,
+    NaN for rows without enough depth
+    """
+    cum = np.cumsum(eth, axis=1)
+    amount = np.broadcast_to(np.asarray(eth_amount, dtype=np.float64), (len(prices),))
+    # ETH taken at each level: whatever is left of the amount, up to the level's volume
+    taken = np.clip(amount[:, None] - (cum - eth), 0, eth)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tokens = np.where(taken > 0, taken / prices, 0).sum(axis=1)
+        vwap = amount / tokens
+    vwap[cum[:, -1] < amount] = np.nan
+    return vwap
+
+
+def _best(prices):
+    best = np.full(len(prices), np.nan)
+    has = np.array([len(p) > 0 for p in prices], dtype=bool)
+    best[has] = [p[0] for p in prices if len(p)]
+    return best
+
+
+def analyze(books, eth_amount, levels=None):
+    """
+    Computes the analytics of many books in one call
+
+    Each side of every book is stacked into a zero-padded matrix, so the
+    metrics of all books are computed with a handful of array operations.
+
+    :param books: books by token address, or a list of books
+    :type books: dict or list
+    :param eth_amount: size in ETH for VWAP and slippage, one for all books or one per book
+    :type eth_amount: float or list
+    :param levels: number of levels per side counted in imbalance, all if None
+    :type levels: int
+    :return: arrays with one value per book, keyed 'tokens', 'best_bid', 'best_ask', 'mid', 'spread',
+             'bid_depth', 'ask_depth' (ETH), 'vwap_buy', 'vwap_sell', 'slippage_buy', 'slippage_sell'
+             and 'imbalance'. VWAP and slippage are NaN where the book is too thin for the size.
+    :rtype: dict
+    """
+    _require_numpy()
+    if isinstance(books, dict):
+        books = [book_arrays(book, token) for token, book in books.items()]
+    else:
+        books = [book_arrays(book) for book in books]
+    bid_prices = _pad([b.bid_prices for b in books])
+    bid_eth = _pad([b.bid_eth for b in books])
+    ask_prices = _pad([b.ask_prices for b in books])
+    ask_eth = _pad([b.ask_eth for b in books])
+    best_bid = _best([b.bid_prices for b in books])
+    best_ask = _best([b.ask_prices for b in books])
+    mid = (best_bid + best_ask) / 2
+    # buying tokens takes the asks, selling tokens takes the bids
+    vwap_buy = _vwap(ask_prices, ask_eth, eth_amount)
+    vwap_sell = _vwap(bid_prices, bid_eth, eth_amount)
+    bid_depth = bid_eth[:, :levels].sum(axis=1)
+    ask_depth = ask_eth[:, :levels].sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        imbalance = (bid_depth - ask_depth) / (bid_depth + ask_depth)
+        slippage_buy = vwap_buy / mid - 1
+        slippage_sell = 1 - vwap_sell / mid
+    return {
+        'tokens': [b.token_addr for b in books],
+        'best_bid': best_bid,
+        'best_ask': best_ask,
+        'mid': mid,
+        'spread': best_ask - best_bid,
+        'bid_depth': bid_depth,
+        'ask_depth': ask_depth,
+        'vwap_buy': vwap_buy,
+        'vwap_sell': vwap_sell,
+        'slippage_buy': slippage_buy,
+        'slippage_sell': slippage_sell,
+        'imbalance': imbalance,
+    }
+
+
+def vwap(book, eth_amount, side='buy'):
+    """
+    Returns the volume-weighted price of buying or selling eth_amount ETH worth of tokens
+
+    :param book: BookArrays, LocalOrderBook or order book snapshot
+    :type book: object
+    :param eth_amount: size in ETH
+    :type eth_amount: float
+    :param side: 'buy' takes the asks, 'sell' takes the bids
+    :type side: str
+    :return: price in ETH per token, NaN if the book is too thin
+    :rtype: float
+    """
+    return float(analyze([book], eth_amount)[_side_key('vwap', side)][0])
+
+
+def slippage(book, eth_amount, side='buy'):
+    """
+    Returns the relative cost of filling eth_amount ETH versus the mid price
+
+    :param book: BookArrays, LocalOrderBook or order book snapshot
+    :type book: object
+    :param eth_amount: size in ETH
+    :type eth_amount: float
+    :param side: 'buy' takes the asks, 'sell' takes the bids
+    :type side: str
+    :return: slippage, e.g. 0.01 for 1% worse than mid, NaN if the book is too thin
+    :rtype: float
+    """
+    return float(analyze([book], eth_amount)[_side_key('slippage', side)][0])
+
+
+def spread(book):
+    """
+    Returns the difference between the best ask and best bid prices, NaN if a side is empty
+
+    :param book: BookArrays, LocalOrderBook or order book snapshot
+    :type book: object
+    :return: spread in ETH
+    :rtype: float
+    """
+    book = book_arrays(book)
+    if not len(book.bid_prices) or not len(book.ask_prices):
+        return float('nan')
+    return float(book.ask_prices[0] - book.bid_prices[0])
+
+
+def imbalance(book, levels=None):
+    """
+    Returns (bid ETH - ask ETH) / (bid ETH + ask ETH) over the top levels of a book
+
+    :param book: BookArrays, LocalOrderBook or order book snapshot
+    :type book: object
+    :param levels: number of levels per side, all if None
+    :type levels: int
+    :return: imbalance between -1 (all asks) and 1 (all bids), NaN for an empty book
+    :rtype: float
+    """
+    return float(analyze([book], 0, levels)['imbalance'][0])
+
+
+def _side_key(metric, side):
+    if side not in ('buy', 'sell'):
+        raise ValueError("side must be 'buy' or 'sell'")
+    return metric + '_' + side
@@ -0,0 +1,174 @@
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    Keyed cache whose entries expire `ttl` seconds after they are fetched
+
+    Concurrent misses on the same key share a single fetch. Empty values
+    (None, {}, []) are returned but not cached, so the next call retries.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._inflight = {}
+
+    def get(self, key, fetch):
+        """
+        Returns the cached value for key, calling fetch() on a miss
+
+        :param key: cache key
+        :type key: object
+        :param fetch: returns a fresh value
+        :type fetch: function
+        :return: value
+        :rtype: object
+        """
+        value = self.peek(key)
+        if value is not None:
+            return value
+        with self._lock:
+            # [lock, number of callers holding or waiting for it], dropped
+            # by the last caller so locks do not pile up for old keys
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = [threading.Lock(), 0]
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                value = self.peek(key)
+                if value is not None:
+                    return value
+                value = fetch()
+                if value:
+                    self.put(key, value)
+                return value
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    async def get_async(self, key, fetch):
+        """
+        Same as get, for a coroutine function fetch
+
+        :param key: cache key
+        :type key: object
+        :param fetch: coroutine function returning a fresh value
+        :type fetch: function
+        :return: value
+        :rtype: object
+        """
+        import asyncio
+        value = self.peek(key)
+        if value is not None:
+            return value
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+            try:
+                value = await future
+            finally:
+                del self._inflight[key]
+            if value:
+                self.put(key, value)
+            return value
+        return await asyncio.shield(future)
+
+    def peek(self, key):
+        """
+        Returns the cached value for key, or None if it is missing or expired
+
+        :param key: cache key
+        :type key: object
+        :return: value
+        :rtype: object
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def put(self, key, value):
+        """
+        Stores a value for key
+
+        :param key: cache key
+        :type key: object
+        :param value: value
+        :type value: object
+        """
+        self._entries[key] = (time.time() + self.ttl, value)
+
+    def items(self):
+        """
+        Returns the entries that have not expired
+
+        :return: (key, value) pairs
+        :rtype: list
+        """
+        now = time.time()
+        return [(key, entry[1]) for key, entry in list(self._entries.items()) if entry[0] >= now]
+
+    def invalidate(self, key=None):
+        """
+        Drops the entry for key, or every entry if key is None
+
+        :param key: cache key
+        :type key: object
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+class TickerIndex(object):
+    """
+    Case-insensitive symbol lookups over a `returnTicker` map
+
+    The index is built once per market snapshot, so lookups are dictionary
+    reads.
+    """
+    __slots__ = ('tickers', 'by_symbol', 'addresses')
+
+    def __init__(self, tickers):
+        self.tickers = tickers
+        self.by_symbol = {}
+        self.addresses = {}
+        for pair, ticker in tickers.items():
+            symbol = pair.split('_', 1)[-1].upper()
+            self.by_symbol[symbol] = ticker
+            if ticker and ticker.get('tokenAddr'):
+                self.addresses[symbol] = ticker['tokenAddr']
+
+    def __bool__(self):
+        return bool(self.tickers)
+
+    def ticker(self, symbol):
+        """
+        Returns ticker data for a symbol, or {}
+
+        :param symbol: token symbol
+        :type symbol: str
+        :return: ticker data
+        :rtype: object
+        """
+        return self.by_symbol.get(symbol.upper()) or {}
+
+    def token_address(self, symbol):
+        """
+        Returns the token address of a symbol, or ''
+
+        :param symbol: token symbol
+        :type symbol: str
+        :return: token address
+        :rtype: str
+        """
+        return self.addresses.get(symbol.upper(), '')
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+
+from .lazy import LazyImport
+
+websocket = LazyImport('websocket')
+
+
+class ChainHead(object):
+    """
+    Latest block number, timestamp and gas price, kept fresh in the background
+
+    Once started, a daemon thread polls the node every `interval` seconds
+    with one JSON-RPC batch (eth_getBlockByNumber and eth_gasPrice), or,
+    with a `ws_url`, listens to an eth_subscribe newHeads subscription and
+    only asks for the gas price when a block arrives. Readers get the last
+    values from plain attributes, without a round trip. Listeners added with
+    add_listener are called with the block number of every new block, from
+    the background thread.
+    """
+
+    def __init__(self, rpc, interval=2, ws_url=None, reconnect_delay=1):
+        """
+        :param rpc: JSON-RPC client used to poll and to read the gas price
+        :type rpc: JSONRPC
+        :param interval: seconds between polls
+        :type interval: float
+        :param ws_url: WebSocket JSON-RPC endpoint to subscribe to new heads on, None to poll
+        :type ws_url: str
+        :param reconnect_delay: seconds between reconnection attempts of the subscription
+        :type reconnect_delay: float
+        """
+        self.rpc = rpc
+        self.interval = interval
+        self.ws_url = ws_url
+        self.reconnect_delay = reconnect_delay
+        # block number, None until the first refresh
+        self.number = None
+        self.hash = None
+        # block timestamp, in seconds since the epoch
+        self.timestamp = None
+        # gas price estimate of the node, in wei
+        self.gas_price = None
+        # time.monotonic() of the last update
+        self.updated = None
+        self.ws = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._thread = None
+        self._closed = False
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts refreshing in the background, if not already started
+
+        :return: self
+        :rtype: ChainHead
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('chain head is closed')
+            if self._thread is None or not self._thread.is_alive():
+                target = self._subscribe if self.ws_url else self._poll
+                self._thread = threading.Thread(target=target, name='etherdelta-chain-head')
+                self._thread.daemon = True
+                self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Stops refreshing
+        """
+        self._closed = True
+        self._stop.set()
+        ws = self.ws
+        if ws is not None:
+            ws.close()
+
+    def refresh(self):
+        """
+        Fetches the latest block and gas price now
+
+        :return: block number
+        :rtype: int
+        """
+        block, gas_price = self.rpc.batch([('eth_getBlockByNumber', ['latest', False]), ('eth_gasPrice', [])])
+        if isinstance(block, Exception):
+            raise block
+        if not block:
+            raise ValueError('the node returned no latest block')
+        self._update(block, None if isinstance(gas_price, Exception) else gas_price)
+        return self.number
+
+    def add_listener(self, callback):
+        """
+        Registers a callback for every new block
+
+        :param callback: called with the new block number
+        :type callback: function
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """
+        Unregisters a callback added with add_listener
+        """
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _update(self, header, gas_price):
+        number = int(header['number'], 16)
+        with self._lock:
+            if self.number is not None and number < self.number:
+                # a lagging node or endpoint, keep the newer head
+                return
+            new = number != self.number
+            self.number = number
+            self.hash = header.get('hash')
+            self.timestamp = int(header['timestamp'], 16)
+            if gas_price is not None:
+                self.gas_price = int(gas_price, 16)
+            self.updated = time.monotonic()
+            listeners = list(self._listeners) if new else ()
+        for callback in listeners:
+            try:
+                callback(number)
+            except Exception:
+                pass
+
+    def _poll(self):
+        while not self._closed:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
+
+    def _subscribe(self):
+        try:
+            self.refresh()
+        except Exception:
+            pass
+        while not self._closed:
+            ws = websocket.WebSocketApp(self.ws_url, on_open=self._on_open, on_message=self._on_message)
+            self.ws = ws
+            try:
+                ws.run_forever(skip_utf8_validation=True)
+            except Exception:
+                pass
+            if not self._closed:
+                self._stop.wait(self.reconnect_delay)
+
+    def _on_open(self, ws):
+        ws.send(json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'eth_subscribe', 'params': ['newHeads']}))
+
+    def _on_message(self, ws, message):
+        data = json.loads(message)
+        header = (data.get('params') or {}).get('result') if data.get('method') == 'eth_subscription' else None
+        if not header or header.get('number') is None:
+            return
+        try:
+            gas_price = self.rpc.call('eth_gasPrice', [])
+        except Exception:
+            gas_price = None
+        self._update(header, gas_price)
@@ -0,0 +1,54 @@
+import json
+
+# orjson decodes large market frames about twice as fast as the stdlib,
+# it is optional and json is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# both raise a ValueError subclass on invalid JSON
+loads = orjson.loads if orjson is not None else json.loads
+
+# Prefix of socket.io event frames: engine.io message (4) + socket.io event (2)
+EVENT_PREFIX = '42'
+
+
+def frame_topic(message):
+    """
+    Reads the event topic of a socket.io event frame without decoding its payload
+
+    :param message: frame, e.g. '42["market",{...}]'
+    :type message: str
+    :return: topic, or None if the frame is not an event or the topic cannot
+        be read without decoding the frame
+    :rtype: str
+    """
+    if not message.startswith(EVENT_PREFIX):
+        return None
+    start = message.find('"', 2, 64)
+    if start < 0 or message[2:start].strip() != '[':
+        return None
+    end = message.find('"', start + 1, start + 64)
+    if end < 0:
+        return None
+    topic = message[start + 1:end]
+    if '\\' in topic:
+        # escaped characters in the topic, leave it to the decoder
+        return None
+    return topic
+
+
+def decode_event(message):
+    """
+    Decodes a socket.io event frame
+
+    :param message: frame, e.g. '42["market",{...}]'
+    :type message: str
+    :return: (topic, payload), or None if the frame holds no event
+    :rtype: tuple
+    """
+    j = loads(message[2:])
+    if not j:
+        return None
+    return j[0], j[1] if len(j) > 1 else None
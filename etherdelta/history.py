@@ -0,0 +1,428 @@
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import deque
+
+from .abi import event_info
+from .rpc import RPCError
+
+# Events of the EtherDelta contract
+EVENTS = ('Trade', 'Order', 'Cancel', 'Deposit', 'Withdraw')
+
+# Column formats by type. Integers that fit are stored little-endian (columns
+# are read back as native memoryviews, so on a little-endian host), 256-bit
+# integers and hashes as their 32 big-endian bytes and addresses as 20 bytes.
+FORMATS = {
+    'uint64': 'Q',
+    'uint32': 'I',
+    'uint8': 'B',
+    'address': '20s',
+    'uint256': '32s',
+    'bytes32': '32s',
+}
+
+# Columns stored for every event, before the event's own fields
+LOG_COLUMNS = (('block', 'uint64'), ('log_index', 'uint32'), ('tx_hash', 'bytes32'))
+
+
+def event_schemas(events=EVENTS, abi_name='etherdelta'):
+    """
+    Returns the columns of each event, as (name, type) pairs
+
+    :param events: event names
+    :type events: list
+    :param abi_name: ABI name
+    :type abi_name: str
+    :return: columns by event name
+    :rtype: dict
+    """
+    schemas = {}
+    for event in events:
+        topic, types, names = event_info(abi_name, event)
+        schemas[event] = LOG_COLUMNS + tuple(zip(names, types))
+    return schemas
+
+
+class EventTable(object):
+    """
+    Read-only, memory-mapped view of the committed rows of one event
+
+    Each column is a file of fixed-width values, so a column is read
+    straight from the page cache without loading the table into memory.
+    """
+
+    def __init__(self, path, columns, rows):
+        self.path = path
+        self.columns = [name for name, _ in columns]
+        self.types = dict(columns)
+        self.rows = rows
+        self._maps = {}
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name):
+        """
+        Returns a column as a memoryview: integers for uint64/uint32/uint8
+        columns, the concatenated fixed-width values for the others (see width)
+
+        :param name: column name
+        :type name: str
+        :return: column
+        :rtype: memoryview
+        """
+        fmt = FORMATS[self.types[name]]
+        cast = 'B' if fmt.endswith('s') else fmt
+        if not self.rows:
+            return memoryview(b'').cast(cast)
+        buffer = self._maps.get(name)
+        if buffer is None:
+            with open(os.path.join(self.path, name + '.col'), 'rb') as f:
+                buffer = self._maps[name] = mmap.mmap(f.fileno(), self.rows * self.width(name), access=mmap.ACCESS_READ)
+        return memoryview(buffer).cast(cast)
+
+    def width(self, name):
+        """
+        Returns the size in bytes of one value of a column
+
+        :param name: column name
+        :type name: str
+        :return: width
+        :rtype: int
+        """
+        return struct.calcsize('<' + FORMATS[self.types[name]])
+
+    def value(self, name, i):
+        """
+        Returns one decoded value: an int for integer columns and a
+        lowercase 0x-prefixed hex string for addresses and hashes
+
+        :param name: column name
+        :type name: str
+        :param i: row number
+        :type i: int
+        :return: value
+        :rtype: object
+        """
+        if i < 0:
+            i += self.rows
+        if not 0 <= i < self.rows:
+            raise IndexError('row out of range')
+        abi_type = self.types[name]
+        column = self.column(name)
+        if not FORMATS[abi_type].endswith('s'):
+            return column[i]
+        width = self.width(name)
+        value = column[i * width:(i + 1) * width].tobytes()
+        if abi_type == 'uint256':
+            return int.from_bytes(value, 'big')
+        return '0x' + value.hex()
+
+    def row(self, i):
+        """
+        Returns one decoded row
+
+        :param i: row number
+        :type i: int
+        :return: values by column name
+        :rtype: dict
+        """
+        return dict((name, self.value(name, i)) for name in self.columns)
+
+    def __iter__(self):
+        for i in range(self.rows):
+            yield self.row(i)
+
+    def close(self):
+        for buffer in self._maps.values():
+            buffer.close()
+        self._maps = {}
+
+
+class EventStore(object):
+    """
+    Append-only columnar store of decoded events, one directory per event
+
+    meta.json records the committed row count of every table along with the
+    next block to ingest, and is replaced atomically on commit. Rows written
+    after the last commit (e.g. by a crashed run) are truncated away the
+    next time the table is appended to, so the store always matches its
+    checkpoint.
+    """
+
+    def __init__(self, path, schemas=None):
+        """
+        :param path: store directory, created if missing
+        :type path: str
+        :param schemas: columns of each event, see event_schemas
+        :type schemas: dict
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                self._meta = json.load(f)
+        else:
+            self._meta = {'version': 1, 'next_block': None, 'tables': {}}
+        for name, columns in (schemas or {}).items():
+            table = self._meta['tables'].setdefault(name, {'rows': 0, 'columns': [list(c) for c in columns]})
+            if [tuple(c) for c in table['columns']] != [tuple(c) for c in columns]:
+                raise ValueError('columns of ' + name + ' do not match the store')
+        self._files = {}
+        self._pending = {}
+
+    @property
+    def next_block(self):
+        """
+        Next block to ingest, None for an empty store
+        """
+        return self._meta['next_block']
+
+    @property
+    def tables(self):
+        return list(self._meta['tables'])
+
+    def table(self, name):
+        """
+        Returns a read-only view of the committed rows of an event
+
+        :param name: event name
+        :type name: str
+        :return: table
+        :rtype: EventTable
+        """
+        table = self._meta['tables'][name]
+        return EventTable(os.path.join(self.path, name), table['columns'], table['rows'])
+
+    def append(self, name, rows):
+        """
+        Appends rows to an event table; they are visible after commit()
+
+        :param name: event name
+        :type name: str
+        :param rows: rows, each a tuple of values in column order (ints, or bytes for bytes columns)
+        :type rows: list
+        """
+        if not rows:
+            return
+        table = self._meta['tables'][name]
+        files = self._open(name)
+        for i, (column, abi_type) in enumerate(table['columns']):
+            fmt = FORMATS[abi_type]
+            values = [row[i] for row in rows]
+            if fmt.endswith('s'):
+                width = int(fmt[:-1])
+                if any(len(v) != width for v in values):
+                    raise ValueError(column + ' values must be ' + str(width) + ' bytes long')
+                files[column].write(b''.join(values))
+            else:
+                files[column].write(struct.pack('<%d%s' % (len(values), fmt), *values))
+        self._pending[name] = self._pending.get(name, 0) + len(rows)
+
+    def commit(self, next_block=None):
+        """
+        Makes appended rows durable and records the next block to ingest
+
+        :param next_block: next block to ingest
+        :type next_block: int
+        """
+        for files in self._files.values():
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+        for name, count in self._pending.items():
+            self._meta['tables'][name]['rows'] += count
+        self._pending = {}
+        if next_block is not None:
+            self._meta['next_block'] = next_block
+        tmp_path = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, 'meta.json'))
+
+    def close(self):
+        """
+        Closes the column files; rows appended since the last commit are dropped
+        """
+        for files in self._files.values():
+            for f in files.values():
+                f.close()
+        self._files = {}
+        self._pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self, name):
+        files = self._files.get(name)
+        if files is None:
+            table = self._meta['tables'][name]
+            directory = os.path.join(self.path, name)
+            os.makedirs(directory, exist_ok=True)
+            files = {}
+            for column, abi_type in table['columns']:
+                column_path = os.path.join(directory, column + '.col')
+                f = open(column_path, 'ab')
+                # drop anything written after the last commit
+                f.truncate(table['rows'] * struct.calcsize('<' + FORMATS[abi_type]))
+                files[column] = f
+            self._files[name] = files
+        return files
+
+
+# What nodes answer to an eth_getLogs range that is too large, e.g. "query
+# returned more than 10000 results", "block range is too wide" or "Log
+# response size exceeded". Rate limits share codes with these (-32005 on
+# Infura) and timeouts are often transient, so neither is matched: splitting
+# would only multiply the requests
+_RANGE_ERROR = re.compile(r'more than \d+ results|too many (results|logs|blocks)|block range|range (is )?too (large|wide|big)'
+                          r'|response size|limited to a [\d,]+ (block )?range|max(imum)? results')
+
+
+def _is_range_error(error):
+    return _RANGE_ERROR.search(str(error).lower()) is not None
+
+
+class EventIngester(object):
+    """
+    Fetches the logs of a contract over a block range into an EventStore
+
+    The range is split into chunks that are fetched concurrently and
+    written in block order. A chunk the node rejects as too large is split
+    in half until it goes through, and later chunks start at the smaller
+    size, while other errors, such as rate limits, are retried with
+    backoff. The store is committed after every chunk, so an interrupted run
+    resumes from the last committed block.
+    """
+
+    def __init__(self, rpc, store, address, events=EVENTS, abi_name='etherdelta', chunk_size=2000, workers=4,
+                 max_tries=3, retry_delay=1):
+        """
+        :param rpc: JSON-RPC client
+        :type rpc: JSONRPC
+        :param store: store to write to
+        :type store: EventStore
+        :param address: contract address
+        :type address: str
+        :param events: event names
+        :type events: list
+        :param abi_name: ABI name
+        :type abi_name: str
+        :param chunk_size: blocks per eth_getLogs call
+        :type chunk_size: int
+        :param workers: number of concurrent eth_getLogs calls
+        :type workers: int
+        :param max_tries: attempts per call on errors other than a range that is too large
+        :type max_tries: int
+        :param retry_delay: seconds before the first retry, doubled on each retry
+        :type retry_delay: float
+        """
+        self.rpc = rpc
+        self.store = store
+        self.address = address
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_tries = max_tries
+        self.retry_delay = retry_delay
+        self._events = {}
+        for event in events:
+            topic, types, names = event_info(abi_name, event)
+            self._events[topic] = (event, types)
+        self._lock = threading.Lock()
+
+    def run(self, from_block, to_block=None, progress=None):
+        """
+        Ingests events from from_block, or from the store's checkpoint if it
+        is further along, up to to_block
+
+        :param from_block: first block
+        :type from_block: int
+        :param to_block: last block, the latest block if None
+        :type to_block: int
+        :param progress: called with (last block written, events written so far) after each chunk
+        :type progress: function
+        :return: number of events written
+        :rtype: int
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        start = from_block
+        if self.store.next_block is not None and self.store.next_block > start:
+            start = self.store.next_block
+        if to_block is None:
+            to_block = int(self.rpc.call('eth_blockNumber', []), 16)
+        count = 0
+        pending = deque()
+        with ThreadPoolExecutor(self.workers) as pool:
+            try:
+                while pending or start <= to_block:
+                    # keep a window of chunks in flight, written back in order
+                    while start <= to_block and len(pending) < self.workers * 2:
+                        end = min(start + self.chunk_size - 1, to_block)
+                        pending.append((end, pool.submit(self._fetch, start, end)))
+                        start = end + 1
+                    end, future = pending.popleft()
+                    count += self._write(future.result())
+                    self.store.commit(end + 1)
+                    if progress is not None:
+                        progress(end, count)
+            except BaseException:
+                for _, future in pending:
+                    future.cancel()
+                raise
+        return count
+
+    def _fetch(self, start, end):
+        params = [{'fromBlock': hex(start), 'toBlock': hex(end), 'address': self.address,
+                   'topics': [list(self._events)]}]
+        error = None
+        for attempt in range(self.max_tries):
+            try:
+                return self.rpc.call('eth_getLogs', params)
+            except RPCError as e:
+                if end > start and _is_range_error(e):
+                    with self._lock:
+                        self.chunk_size = max(1, min(self.chunk_size, (end - start + 1) // 2))
+                    middle = (start + end) // 2
+                    return self._fetch(start, middle) + self._fetch(middle + 1, end)
+                error = e
+            except Exception as e:
+                error = e
+            if attempt + 1 < self.max_tries:
+                time.sleep(self.retry_delay * 2 ** attempt)
+        raise error
+
+    def _write(self, logs):
+        rows = {}
+        for log in logs:
+            if log.get('removed'):
+                continue
+            topics = log.get('topics') or []
+            event = self._events.get(topics[0].lower()) if topics else None
+            if event is None:
+                continue
+            name, types = event
+            data = bytes.fromhex(log['data'][2:])
+            row = [int(log['blockNumber'], 16), int(log['logIndex'], 16), bytes.fromhex(log['transactionHash'][2:])]
+            for i, abi_type in enumerate(types):
+                word = data[32 * i:32 * i + 32]
+                if abi_type == 'address':
+                    row.append(word[12:])
+                elif abi_type == 'uint8':
+                    row.append(word[31])
+                else:
+                    row.append(word)
+            rows.setdefault(name, []).append(tuple(row))
+        for name, table_rows in rows.items():
+            table_rows.sort(key=lambda row: (row[0], row[1]))
+            self.store.append(name, table_rows)
+        return sum(len(table_rows) for table_rows in rows.values())
@@ -0,0 +1,34 @@
+import importlib
+
+
+class LazyImport(object):
+    """
+    Stands in for a module, or an attribute of a module, that is imported on
+    first use
+
+    Keeps `import etherdelta` fast: web3, websocket and the eth_utils
+    helpers are only imported once something actually needs them.
+    """
+
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr = attr
+        self._target = None
+
+    def _load(self):
+        target = self._target
+        if target is None:
+            target = importlib.import_module(self._module)
+            if self._attr is not None:
+                target = getattr(target, self._attr)
+            self._target = target
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        return '<lazy ' + self._module + ('.' + self._attr if self._attr else '') + '>'
@@ -0,0 +1,281 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds of the latency histograms, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Upper bounds of the frame size histograms, in bytes
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Hooks(object):
+    """
+    Instrumentation hooks called from the socket and RPC hot paths
+
+    Every method is a no-op; subclass and override the ones you need, then
+    pass an instance as `hooks` to a Client. Clients created without hooks
+    skip the timing calls entirely. Hooks run on the thread (or event loop)
+    that observed the event and must not block.
+    """
+
+    def socket_connected(self, url, seconds, reconnect):
+        """
+        A socket finished its socket.io handshake
+
+        :param url: WebSocket URL
+        :type url: str
+        :param seconds: time from opening the connection to the socket.io open packet
+        :type seconds: float
+        :param reconnect: whether the session had been connected before
+        :type reconnect: bool
+        """
+
+    def socket_error(self, url, error):
+        """
+        The socket reported an error
+
+        :param url: WebSocket URL
+        :type url: str
+        :param error: error
+        :type error: Exception
+        """
+
+    def socket_request(self, topic, seconds):
+        """
+        A request got its reply
+
+        :param topic: event topic of the reply
+        :type topic: str
+        :param seconds: time from sending the request to receiving the reply
+        :type seconds: float
+        """
+
+    def socket_retry(self, topic):
+        """
+        A request timed out or got an empty reply and is sent again
+
+        :param topic: event topic of the reply
+        :type topic: str
+        """
+
+    def socket_frame(self, topic, size, decode_seconds):
+        """
+        An event frame was received and decoded
+
+        :param topic: event topic
+        :type topic: str
+        :param size: frame size in characters
+        :type size: int
+        :param decode_seconds: time spent decoding the JSON
+        :type decode_seconds: float
+        """
+
+    def socket_frame_skipped(self, topic, size):
+        """
+        An event frame was received for a topic nobody waits for or listens
+        to, and dropped without decoding
+
+        :param topic: event topic
+        :type topic: str
+        :param size: frame size in characters
+        :type size: int
+        """
+
+    def rpc_call(self, method, seconds, calls, error):
+        """
+        A JSON-RPC HTTP request completed
+
+        :param method: RPC method, or 'batch' for a batch of different methods
+        :type method: str
+        :param seconds: time for the HTTP round trip
+        :type seconds: float
+        :param calls: number of calls in the request
+        :type calls: int
+        :param error: the error if the request failed, else None
+        :type error: Exception
+        """
+
+
+class Histogram(object):
+    """
+    Cumulative histogram over fixed bucket upper bounds
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        # one count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Returns an estimate of the q-quantile, interpolated within its bucket
+
+        :param q: quantile, between 0 and 1
+        :type q: float
+        :return: value, None if nothing was observed
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class MetricsCollector(Hooks):
+    """
+    Hooks that aggregate measurements into in-process histograms and counters
+
+    Read them with histogram() and counter(), or expose everything in the
+    Prometheus text format with prometheus_text().
+    """
+
+    # name: (type, help)
+    METRICS = {
+        'etherdelta_socket_connect_seconds': ('histogram', 'Time from opening a socket to the socket.io open packet'),
+        'etherdelta_socket_reconnects_total': ('counter', 'Socket reconnections'),
+        'etherdelta_socket_errors_total': ('counter', 'Socket errors'),
+        'etherdelta_socket_request_seconds': ('histogram', 'Time from sending a request to its reply, by reply topic'),
+        'etherdelta_socket_retries_total': ('counter', 'Requests sent again after a timeout or empty reply, by reply topic'),
+        'etherdelta_socket_frame_bytes': ('histogram', 'Size of received event frames, by topic'),
+        'etherdelta_socket_decode_seconds': ('histogram', 'Time spent decoding received event frames, by topic'),
+        'etherdelta_socket_frames_skipped_total': ('counter', 'Event frames dropped without decoding, by topic'),
+        'etherdelta_rpc_seconds': ('histogram', 'JSON-RPC round trip time, by method'),
+        'etherdelta_rpc_calls_total': ('counter', 'JSON-RPC calls made, by method'),
+        'etherdelta_rpc_errors_total': ('counter', 'Failed JSON-RPC requests, by method'),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def socket_connected(self, url, seconds, reconnect):
+        self._observe('etherdelta_socket_connect_seconds', (), seconds, LATENCY_BUCKETS)
+        if reconnect:
+            self._increment('etherdelta_socket_reconnects_total', ())
+
+    def socket_error(self, url, error):
+        self._increment('etherdelta_socket_errors_total', ())
+
+    def socket_request(self, topic, seconds):
+        self._observe('etherdelta_socket_request_seconds', (('topic', topic),), seconds, LATENCY_BUCKETS)
+
+    def socket_retry(self, topic):
+        self._increment('etherdelta_socket_retries_total', (('topic', topic),))
+
+    def socket_frame(self, topic, size, decode_seconds):
+        labels = (('topic', topic),)
+        self._observe('etherdelta_socket_frame_bytes', labels, size, SIZE_BUCKETS)
+        self._observe('etherdelta_socket_decode_seconds', labels, decode_seconds, LATENCY_BUCKETS)
+
+    def socket_frame_skipped(self, topic, size):
+        self._increment('etherdelta_socket_frames_skipped_total', (('topic', topic),))
+
+    def rpc_call(self, method, seconds, calls, error):
+        labels = (('method', method),)
+        self._observe('etherdelta_rpc_seconds', labels, seconds, LATENCY_BUCKETS)
+        self._increment('etherdelta_rpc_calls_total', labels, calls)
+        if error is not None:
+            self._increment('etherdelta_rpc_errors_total', labels)
+
+    def histogram(self, name, **labels):
+        """
+        Returns the histogram of a metric and labels, or None
+
+        :param name: metric name, e.g. 'etherdelta_rpc_seconds'
+        :type name: str
+        :return: histogram
+        :rtype: Histogram
+        """
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def counter(self, name, **labels):
+        """
+        Returns the value of a counter and labels
+
+        :param name: metric name, e.g. 'etherdelta_socket_retries_total'
+        :type name: str
+        :return: value
+        :rtype: int
+        """
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        """
+        Forgets every measurement
+        """
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def prometheus_text(self):
+        """
+        Returns every metric in the Prometheus text exposition format
+
+        :return: metrics
+        :rtype: str
+        """
+        with self._lock:
+            histograms = [(key, h.buckets, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()]
+            counters = list(self._counters.items())
+        series = {}
+        for (name, labels), buckets, counts, total, count in histograms:
+            lines = series.setdefault(name, [])
+            cumulative = 0
+            for bound, n in zip(buckets + ('+Inf',), counts):
+                cumulative += n
+                lines.append(name + '_bucket' + _labels(labels + (('le', _number(bound)),)) + ' ' + str(cumulative))
+            lines.append(name + '_sum' + _labels(labels) + ' ' + _number(total))
+            lines.append(name + '_count' + _labels(labels) + ' ' + str(count))
+        for (name, labels), value in counters:
+            series.setdefault(name, []).append(name + _labels(labels) + ' ' + _number(value))
+        out = []
+        for name in sorted(series):
+            kind, help_text = self.METRICS.get(name, ('untyped', ''))
+            out.append('# HELP ' + name + ' ' + help_text)
+            out.append('# TYPE ' + name + ' ' + kind)
+            out.extend(series[name])
+        return '\n'.join(out) + '\n' if out else ''
+
+    def _observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def _increment(self, name, labels, n=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                          for k, v in labels) + '}'
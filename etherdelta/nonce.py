@@ -0,0 +1,84 @@
+import threading
+
+
+class NonceManager(object):
+    """
+    Hands out transaction nonces locally, per account
+
+    The on-chain nonce of an account is fetched once, then every call to
+    next() returns the following nonce without a round trip to the node.
+    Safe to share between threads and asyncio tasks. Call resync() when a
+    transaction is rejected so the next nonce is fetched from the node again.
+    """
+
+    def __init__(self, fetch):
+        """
+        :param fetch: returns the next on-chain nonce of an account
+        :type fetch: function
+        """
+        self._fetch = fetch
+        self._nonces = {}
+        self._lock = threading.Lock()
+        self._account_locks = {}
+
+    def next(self, account):
+        """
+        Returns the nonce to use for the next transaction of account
+
+        :param account: checksummed account
+        :type account: str
+        :return: nonce
+        :rtype: int
+        """
+        with self._lock:
+            if account in self._nonces:
+                return self._take(account)
+            account_lock = self._account_locks.setdefault(account, threading.Lock())
+        # fetch outside the global lock so other accounts are not held up
+        with account_lock:
+            with self._lock:
+                if account in self._nonces:
+                    return self._take(account)
+            nonce = self._fetch(account)
+            with self._lock:
+                self._nonces.setdefault(account, nonce)
+                return self._take(account)
+
+    async def next_async(self, account, fetch):
+        """
+        Same as next, for asyncio callers
+
+        :param account: checksummed account
+        :type account: str
+        :param fetch: coroutine function returning the next on-chain nonce of account
+        :type fetch: function
+        :return: nonce
+        :rtype: int
+        """
+        with self._lock:
+            if account in self._nonces:
+                return self._take(account)
+        nonce = await fetch(account)
+        with self._lock:
+            # another task may have fetched it in the meantime
+            self._nonces.setdefault(account, nonce)
+            return self._take(account)
+
+    def resync(self, account=None):
+        """
+        Forgets the local nonce of account, or of every account if None,
+        so it is fetched from the node on next use
+
+        :param account: checksummed account
+        :type account: str
+        """
+        with self._lock:
+            if account is None:
+                self._nonces.clear()
+            else:
+                self._nonces.pop(account, None)
+
+    def _take(self, account):
+        nonce = self._nonces[account]
+        self._nonces[account] = nonce + 1
+        return nonce
@@ -0,0 +1,201 @@
+from decimal import Decimal
+from functools import lru_cache
+from .lazy import LazyImport
+
+Web3 = LazyImport('web3', 'Web3')
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+
+@lru_cache(maxsize=4096)
+def checksum_address(address):
+    """
+    Returns the checksummed form of an address
+
+    Books repeat the same token and user addresses many times, so results
+    are kept in an LRU instead of hashing the address again on every order.
+
+    :param address: address
+    :type address: str
+    :return: checksummed address
+    :rtype: str
+    """
+    return Web3.toChecksumAddress(address)
+
+
+def to_int(value):
+    """
+    Parses an integer amount exactly, including the exponent notation the
+    API uses for large amounts ('6.755671999999999213568e+21')
+
+    :param value: amount
+    :type value: str or int
+    :return: amount
+    :rtype: int
+    """
+    if isinstance(value, int):
+        return value
+    return int(Decimal(value).to_integral_value())
+
+
+def to_decimal(value):
+    """
+    Parses a decimal value exactly, None stays None
+
+    :param value: value
+    :type value: str or float
+    :return: value
+    :rtype: Decimal
+    """
+    if value is None or isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def to_bytes32(value):
+    """
+    Returns the bytes of a 0x-prefixed hex string such as a signature's r or s
+
+    :param value: hex string
+    :type value: str or bytes
+    :return: bytes
+    :rtype: bytes
+    """
+    if isinstance(value, bytes):
+        return value
+    return bytes.fromhex(value[2:] if value[:2] in ('0x', '0X') else value)
+
+
+class Order(object):
+    """
+    A signed off-chain order, parsed once into contract-ready values
+
+    Amounts are exact integers, prices are Decimals, addresses are
+    checksummed and r and s are bytes, so the contract arguments of an order
+    can be built over and over without parsing the JSON strings again.
+    """
+    __slots__ = ('id', 'tokenGet', 'amountGet', 'tokenGive', 'amountGive', 'expires', 'nonce',
+                 'user', 'v', 'r', 's', 'price', 'availableVolume', 'ethAvailableVolume')
+
+    def __init__(self, tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s,
+                 id=None, price=None, availableVolume=None, ethAvailableVolume=None):
+        self.id = id
+        self.tokenGet = tokenGet
+        self.amountGet = amountGet
+        self.tokenGive = tokenGive
+        self.amountGive = amountGive
+        self.expires = expires
+        self.nonce = nonce
+        self.user = user
+        self.v = v
+        self.r = r
+        self.s = s
+        self.price = price
+        self.availableVolume = availableVolume
+        self.ethAvailableVolume = ethAvailableVolume
+
+    @classmethod
+    def from_dict(cls, order):
+        """
+        Parses an order as returned by the API
+
+        :param order: order
+        :type order: dict
+        :return: order
+        :rtype: Order
+        """
+        availableVolume = order.get('availableVolume')
+        return cls(
+            checksum_address(order['tokenGet']),
+            to_int(order['amountGet']),
+            checksum_address(order['tokenGive']),
+            to_int(order['amountGive']),
+            int(order['expires']),
+            int(order['nonce']),
+            checksum_address(order['user']),
+            int(order['v']),
+            to_bytes32(order['r']),
+            to_bytes32(order['s']),
+            order.get('id'),
+            to_decimal(order.get('price')),
+            None if availableVolume is None else to_int(availableVolume),
+            to_decimal(order.get('ethAvailableVolume')),
+        )
+
+    @classmethod
+    def parse(cls, order):
+        """
+        Returns order itself if it is already an Order, else parses it
+
+        :param order: order
+        :type order: Order or dict
+        :return: order
+        :rtype: Order
+        """
+        if isinstance(order, cls):
+            return order
+        return cls.from_dict(order)
+
+    @property
+    def is_buy(self):
+        """
+        True for a buy order, which gives ETH for tokens
+        """
+        return self.tokenGive == ZERO_ADDRESS
+
+    def args(self):
+        """
+        Returns the positional contract arguments identifying the order, as
+        taken by availableVolume and amountFilled
+        (tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s)
+
+        :return: contract arguments
+        :rtype: list
+        """
+        return [self.tokenGet, self.amountGet, self.tokenGive, self.amountGive, self.expires,
+                self.nonce, self.user, self.v, self.r, self.s]
+
+    def trade_kwargs(self, amount):
+        """
+        Returns the `trade` function arguments for filling amount of the order
+
+        :param amount: amount, in wei of tokenGet
+        :type amount: int
+        :return: trade function arguments
+        :rtype: dict
+        """
+        return {
+            'tokenGet' : self.tokenGet,
+            'amountGet' : self.amountGet,
+            'tokenGive' : self.tokenGive,
+            'amountGive' : self.amountGive,
+            'expires' : self.expires,
+            'nonce' : self.nonce,
+            'user' : self.user,
+            'v' : self.v,
+            'r' : self.r,
+            's' : self.s,
+            'amount' : amount,
+        }
+
+    def cancel_kwargs(self):
+        """
+        Returns the `cancelOrder` function arguments for the order
+
+        :return: cancelOrder function arguments
+        :rtype: dict
+        """
+        return {
+            'tokenGet' : self.tokenGet,
+            'amountGet' : self.amountGet,
+            'tokenGive' : self.tokenGive,
+            'amountGive' : self.amountGive,
+            'expires' : self.expires,
+            'nonce' : self.nonce,
+            'v' : self.v,
+            'r' : self.r,
+            's' : self.s,
+        }
+
+    def __repr__(self):
+        return '<Order %s>' % (self.id or '0x' + self.r.hex())
@@ -0,0 +1,439 @@
+import asyncio
+import inspect
+import logging
+import threading
+from collections import deque
+from itertools import islice
+
+from sortedcontainers import SortedDict
+
+from .order import Order
+
+
+class LocalOrderBook(object):
+    """
+    In-memory order book for one token, kept up to date from socket pushes
+
+    The book is seeded from one `getMarket` snapshot and then updated
+    incrementally from the `orders` and `trades` events the API pushes on the
+    same socket. Bids and asks are kept in sorted maps, so updates cost
+    O(log n) and the best price and top-N depth are read from memory. Pushes
+    are lost while the socket is down, so an attached book is reconciled in
+    the background each time the session reconnects.
+
+    Orders are the dicts returned by the API (see Client.get_orderbook).
+    """
+
+    def __init__(self, token_addr, max_trades=100):
+        self.token_addr = token_addr.lower()
+        self.trades = deque(maxlen=max_trades)
+        # bids are keyed by (-price, id) and asks by (price, id), so the best
+        # order of each side is always the first item
+        self._bids = SortedDict()
+        self._asks = SortedDict()
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._session = None
+        self._client = None
+        self._pending = None
+        self._replay = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, order_id):
+        return order_id in self._keys
+
+    def load_snapshot(self, orders):
+        """
+        Replaces the book with a full snapshot
+
+        :param orders: orders, as returned by Client.get_orderbook
+        :type orders: dict
+        """
+        with self._lock:
+            self._load_snapshot_locked(orders)
+
+    def snapshot(self):
+        """
+        Returns the orders in the book, in the shape load_snapshot takes
+
+        :return: orders, {'buys': [...], 'sells': [...]}
+        :rtype: dict
+        """
+        with self._lock:
+            return {'buys': list(self._bids.values()), 'sells': list(self._asks.values())}
+
+    def apply_orders(self, orders):
+        """
+        Applies an `orders` push: new orders are inserted, partially filled
+        orders are updated and filled, cancelled or deleted orders are removed.
+        Updates older than the order already in the book are ignored.
+
+        :param orders: pushed orders, {'buys': [...], 'sells': [...]}
+        :type orders: dict
+        """
+        with self._lock:
+            self._apply_orders_locked(orders)
+
+    def apply_trades(self, trades):
+        """
+        Records a `trades` push in the recent trades list
+
+        :param trades: pushed trades
+        :type trades: list
+        """
+        with self._lock:
+            for trade in trades or []:
+                if (trade.get('tokenAddr') or '').lower() == self.token_addr:
+                    self.trades.appendleft(trade)
+
+    def get(self, order_id):
+        """
+        Returns the order with the given ID, or None
+
+        :param order_id: order ID
+        :type order_id: str
+        :return: order
+        :rtype: dict
+        """
+        with self._lock:
+            key = self._keys.get(order_id)
+            if key is None:
+                return None
+            return self._side(order_id)[key]
+
+    def best_bid(self):
+        """
+        Returns the highest buy order, or None
+
+        :return: order
+        :rtype: dict
+        """
+        with self._lock:
+            if not self._bids:
+                return None
+            return self._bids.peekitem(0)[1]
+
+    def best_ask(self):
+        """
+        Returns the lowest sell order, or None
+
+        :return: order
+        :rtype: dict
+        """
+        with self._lock:
+            if not self._asks:
+                return None
+            return self._asks.peekitem(0)[1]
+
+    def bids(self, n=None):
+        """
+        Returns buy orders from the highest price down
+
+        :param n: number of orders, all if None
+        :type n: int
+        :return: orders
+        :rtype: list
+        """
+        with self._lock:
+            return list(islice(self._bids.values(), n))
+
+    def asks(self, n=None):
+        """
+        Returns sell orders from the lowest price up
+
+        :param n: number of orders, all if None
+        :type n: int
+        :return: orders
+        :rtype: list
+        """
+        with self._lock:
+            return list(islice(self._asks.values(), n))
+
+    def spread(self):
+        """
+        Returns the difference between the best ask and best bid prices, or None
+
+        :return: spread in ETH
+        :rtype: float
+        """
+        with self._lock:
+            if not self._bids or not self._asks:
+                return None
+            return self._asks.peekitem(0)[0][0] + self._bids.peekitem(0)[0][0]
+
+    def attach(self, client):
+        """
+        Seeds the book from a snapshot and keeps it updated from the client's
+        persistent session
+
+        :param client: client
+        :type client: Client
+        """
+        self._subscribe(client.get_session(), client)
+        self._seed(client.get_orderbook(self.token_addr))
+
+    async def attach_async(self, client):
+        """
+        Same as attach, for an AsyncClient
+
+        :param client: client
+        :type client: AsyncClient
+        """
+        self._subscribe(client.get_session(), client)
+        self._seed(await client.get_orderbook(self.token_addr))
+
+    def reconcile(self, client):
+        """
+        Replaces the book with a fresh snapshot while it keeps applying
+        pushed updates, e.g. after seeding it from a saved snapshot
+
+        :param client: client
+        :type client: Client
+        """
+        if inspect.iscoroutinefunction(client.get_orderbook):
+            raise TypeError('use reconcile_async with an AsyncClient')
+        self._begin_reconcile()
+        try:
+            orders = client.get_orderbook(self.token_addr)
+        except Exception:
+            self._finish_reconcile(None)
+            raise
+        self._finish_reconcile(orders)
+
+    async def reconcile_async(self, client):
+        """
+        reconcile for an AsyncClient
+
+        :param client: client
+        :type client: AsyncClient
+        """
+        self._begin_reconcile()
+        try:
+            orders = await client.get_orderbook(self.token_addr)
+        except BaseException:
+            # including cancellation, which would leave the book reconciling
+            self._finish_reconcile(None)
+            raise
+        self._finish_reconcile(orders)
+
+    def detach(self):
+        """
+        Stops applying pushed updates
+        """
+        if self._session is not None:
+            self._session.remove_listener('orders', self._on_orders)
+            self._session.remove_listener('trades', self._on_trades)
+            if self._client is not None:
+                self._session.remove_reconnect_listener(self._on_reconnect)
+            self._session = None
+            self._client = None
+
+    def _subscribe(self, session, client=None):
+        self.detach()
+        # pushes that arrive before the snapshot are replayed on top of it
+        self._pending = []
+        self._session = session
+        self._client = client
+        session.add_listener('orders', self._on_orders)
+        session.add_listener('trades', self._on_trades)
+        if client is not None:
+            session.add_reconnect_listener(self._on_reconnect)
+
+    def _on_reconnect(self):
+        # called from the session's own thread or task, which has to read
+        # the reply, so the snapshot is fetched in the background
+        client = self._client
+        if client is None:
+            return
+        if inspect.iscoroutinefunction(client.get_orderbook):
+            asyncio.ensure_future(self._reconcile_logged_async(client))
+        else:
+            thread = threading.Thread(target=self._reconcile_logged, args=(client,), name='etherdelta-reconcile')
+            thread.daemon = True
+            thread.start()
+
+    def _reconcile_logged(self, client):
+        try:
+            self.reconcile(client)
+        except Exception as e:
+            _log_reconcile_failed(self.token_addr, e)
+
+    async def _reconcile_logged_async(self, client):
+        try:
+            await self.reconcile_async(client)
+        except Exception as e:
+            _log_reconcile_failed(self.token_addr, e)
+
+    def _seed(self, orders):
+        # the snapshot and the pushes buffered before it are applied in one
+        # critical section, so no push lands in between
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._load_snapshot_locked(orders or {})
+            for pushed in pending or []:
+                self._apply_orders_locked(pushed)
+
+    def _begin_reconcile(self):
+        # pushes keep being applied and are also replayed on top of the
+        # fresh snapshot, in case it was taken before them
+        with self._lock:
+            self._replay = []
+
+    def _finish_reconcile(self, orders):
+        # see _seed: a push applied between the snapshot and the replay
+        # would be wiped by the snapshot and missing from the replay
+        with self._lock:
+            replay, self._replay = self._replay, None
+            if orders is None:
+                return
+            self._load_snapshot_locked(orders)
+            for pushed in replay or []:
+                self._apply_orders_locked(pushed)
+
+    def _on_orders(self, orders):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(orders)
+                return
+            if self._replay is not None:
+                self._replay.append(orders)
+            self._apply_orders_locked(orders)
+
+    def _load_snapshot_locked(self, orders):
+        self._bids.clear()
+        self._asks.clear()
+        self._keys.clear()
+        for order in orders.get('buys') or []:
+            self._insert(order)
+        for order in orders.get('sells') or []:
+            self._insert(order)
+
+    def _apply_orders_locked(self, orders):
+        for order in (orders.get('buys') or []) + (orders.get('sells') or []):
+            if self._belongs(order):
+                self._update(order)
+
+    def _on_trades(self, trades):
+        self.apply_trades(trades)
+
+    def _belongs(self, order):
+        return self.token_addr in ((order.get('tokenGet') or '').lower(), (order.get('tokenGive') or '').lower())
+
+    def _side(self, order_id):
+        return self._bids if order_id.endswith('_buy') else self._asks
+
+    def _insert(self, order):
+        if self._is_dead(order):
+            return
+        price = float(order['price'])
+        if order['id'].endswith('_buy'):
+            key = (-price, order['id'])
+            self._bids[key] = order
+        else:
+            key = (price, order['id'])
+            self._asks[key] = order
+        self._keys[order['id']] = key
+
+    def _update(self, order):
+        order_id = order['id']
+        key = self._keys.get(order_id)
+        if key is not None:
+            side = self._side(order_id)
+            current = side[key]
+            if (order.get('updated') or '') < (current.get('updated') or ''):
+                return
+            del side[key]
+            del self._keys[order_id]
+        self._insert(order)
+
+    @staticmethod
+    def _is_dead(order):
+        if order.get('deleted'):
+            return True
+        available = order.get('availableVolume')
+        return available is not None and float(available) <= 0
+
+
+def _log_reconcile_failed(token_addr, error):
+    # imported here, the package imports this module before defining it
+    from . import log_event
+    log_event(logging.WARNING, 'reconcile_failed', token=token_addr, error=repr(error))
+
+
+class OrderIndex(object):
+    """
+    Order lookups by ID over one `getMarket` snapshot
+
+    The ID map is built on first lookup and each order is parsed into an
+    Order once and reused for as long as the snapshot is.
+    """
+
+    def __init__(self, orders):
+        """
+        :param orders: orders, as returned by Client.get_orderbook
+        :type orders: dict
+        """
+        self.snapshot = orders
+        self._orders = None
+        self._parsed = {}
+
+    def __len__(self):
+        return len(self._index())
+
+    def __contains__(self, order_id):
+        return order_id in self._index()
+
+    def get(self, order_id):
+        """
+        Returns the order with the given ID, or None
+
+        :param order_id: order ID
+        :type order_id: str
+        :return: order
+        :rtype: dict
+        """
+        return self._index().get(order_id)
+
+    def order(self, order_id):
+        """
+        Returns the parsed order with the given ID, or None
+
+        :param order_id: order ID
+        :type order_id: str
+        :return: order
+        :rtype: Order
+        """
+        order = self._parsed.get(order_id)
+        if order is None:
+            raw = self.get(order_id)
+            if raw is None:
+                return None
+            order = self._parsed[order_id] = Order.from_dict(raw)
+        return order
+
+    def args(self, order_id):
+        """
+        Returns the contract arguments of an order, or None
+        (tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s)
+
+        :param order_id: order ID
+        :type order_id: str
+        :return: contract arguments
+        :rtype: list
+        """
+        order = self.order(order_id)
+        if order is None:
+            return None
+        return order.args()
+
+    def _index(self):
+        if self._orders is None:
+            orders = {}
+            for o in self.snapshot.get('buys') or []:
+                orders[o['id']] = o
+            for o in self.snapshot.get('sells') or []:
+                orders[o['id']] = o
+            self._orders = orders
+        return self._orders
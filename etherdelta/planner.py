@@ -0,0 +1,265 @@
+from decimal import Decimal
+
+from .order import ZERO_ADDRESS, Order, to_decimal, to_int
+
+WEI = 10 ** 18
+
+
+def order_id(order):
+    """
+    Returns the API id of an order dict or Order
+    """
+    return order.id if isinstance(order, Order) else order.get('id')
+
+
+class Fill(object):
+    """
+    One trade of a fill plan
+
+    `amount` is what the trade function takes, in wei of the order's
+    tokenGet: ETH when taking a sell order, tokens when taking a buy order.
+    """
+    __slots__ = ('order', 'amount', 'eth', 'tokens', 'confirmed')
+
+    def __init__(self, order, amount, eth, tokens, confirmed):
+        self.order = order
+        self.amount = amount
+        # ETH and tokens exchanged, in wei
+        self.eth = eth
+        self.tokens = tokens
+        # whether the order's volume was read from the contract
+        self.confirmed = confirmed
+
+    @property
+    def eth_amount(self):
+        """
+        ETH exchanged, as taken by Client.trade
+        """
+        return Decimal(self.eth) / WEI
+
+    @property
+    def price(self):
+        """
+        Price of the fill in ETH per token
+        """
+        return Decimal(self.eth) / Decimal(self.tokens) if self.tokens else None
+
+    def trade_kwargs(self):
+        """
+        Returns the `trade` function arguments of the fill
+
+        :return: trade function arguments
+        :rtype: dict
+        """
+        return Order.parse(self.order).trade_kwargs(self.amount)
+
+    def __repr__(self):
+        return '<Fill %s %s ETH at %s>' % (order_id(self.order), self.eth_amount, self.price)
+
+
+class FillPlan(object):
+    """
+    Fills across several orders, best price first
+    """
+    __slots__ = ('side', 'target', 'fills')
+
+    def __init__(self, side, target, fills):
+        self.side = side
+        # requested size, in wei of ETH
+        self.target = target
+        self.fills = fills
+
+    def __len__(self):
+        return len(self.fills)
+
+    def __iter__(self):
+        return iter(self.fills)
+
+    @property
+    def eth(self):
+        """
+        ETH exchanged by the whole plan, in wei
+        """
+        return sum(fill.eth for fill in self.fills)
+
+    @property
+    def tokens(self):
+        """
+        Tokens exchanged by the whole plan, in wei
+        """
+        return sum(fill.tokens for fill in self.fills)
+
+    @property
+    def eth_amount(self):
+        """
+        ETH exchanged by the whole plan
+        """
+        return Decimal(self.eth) / WEI
+
+    @property
+    def shortfall(self):
+        """
+        ETH of the requested size that the book cannot fill
+        """
+        return Decimal(self.target - self.eth) / WEI
+
+    @property
+    def complete(self):
+        return self.eth >= self.target
+
+    @property
+    def average_price(self):
+        """
+        Volume-weighted price of the plan in ETH per token, None if it is empty
+        """
+        tokens = self.tokens
+        return Decimal(self.eth) / Decimal(tokens) if tokens else None
+
+    def trades(self):
+        """
+        Returns the plan as (order, eth_amount) pairs, as taken by Client.trade_many
+
+        :return: trades
+        :rtype: list
+        """
+        return [(fill.order, fill.eth_amount) for fill in self.fills]
+
+    def __repr__(self):
+        return '<FillPlan %s %s/%s ETH over %d orders, average %s>' % (
+            self.side, self.eth_amount, Decimal(self.target) / WEI, len(self.fills), self.average_price)
+
+
+def _fields(order):
+    """
+    Returns (tokenGet, user, amountGet, amountGive, expires, available) of an
+    order, with the volume the API reports converted to wei of tokenGet, or
+    None if there is none
+    """
+    if isinstance(order, Order):
+        tokenGet, user, amountGet, amountGive, expires = (
+            order.tokenGet, order.user, order.amountGet, order.amountGive, order.expires)
+        volume, base = order.availableVolume, None
+    else:
+        get = order.get
+        tokenGet, user, amountGet, amountGive, expires = (
+            get('tokenGet'), get('user'), to_int(get('amountGet')), to_int(get('amountGive')), to_int(get('expires')))
+        volume, base = get('availableVolume'), get('availableVolumeBase')
+        volume = None if volume is None else to_int(volume)
+        base = None if base is None else to_int(base)
+    # the API reports availableVolume in tokens and availableVolumeBase in ETH
+    if tokenGet.lower() != ZERO_ADDRESS:
+        available = volume
+    elif base is not None:
+        available = base
+    elif volume is not None and amountGive > 0:
+        available = volume * amountGet // amountGive
+    else:
+        available = None
+    return tokenGet, user, amountGet, amountGive, expires, available
+
+
+def plan_fills(orders, side, eth_amount, volumes=None, user=None, block_number=None, min_fill=0):
+    """
+    Plans filling eth_amount ETH across orders of one side of a book
+
+    Fills are divisible, so taking the best prices first gives the lowest
+    average price when buying and the highest when selling. The available
+    volume of an order is read from `volumes` when it is there, else from
+    the volume the API reports, else its full amount. Orders without an id
+    (which `volumes` could not tell apart), own orders, orders expired at
+    `block_number`, orders without volume and orders smaller than `min_fill`
+    are skipped. Amounts are exact integers, rounded
+    down in the taker's favour.
+
+    :param orders: orders best price first, the asks to buy or the bids to sell
+    :type orders: list
+    :param side: 'buy' takes sell orders, 'sell' takes buy orders
+    :type side: str
+    :param eth_amount: size in ETH
+    :type eth_amount: float or Decimal
+    :param volumes: available volume read from the contract, in wei of tokenGet, by order id
+    :type volumes: dict
+    :param user: account whose orders are skipped
+    :type user: str
+    :param block_number: skip orders that expire at or before this block, None to keep them all
+    :type block_number: int
+    :param min_fill: smallest fill worth a transaction, in ETH
+    :type min_fill: float or Decimal
+    :return: plan
+    :rtype: FillPlan
+    """
+    if side not in ('buy', 'sell'):
+        raise ValueError("side must be 'buy' or 'sell'")
+    target = int(to_decimal(eth_amount) * WEI)
+    smallest = max(1, int(to_decimal(min_fill) * WEI))
+    volumes = volumes or {}
+    remaining = target
+    fills = []
+    for order, amountGet, amountGive, available in _eligible(orders, side, user, block_number):
+        if remaining <= 0:
+            break
+        oid = order_id(order)
+        confirmed = oid in volumes
+        if confirmed:
+            available = volumes[oid]
+        elif available is None:
+            available = amountGet
+        if side == 'buy':
+            # tokenGet is ETH, the trade amount is the ETH paid
+            eth = min(available, remaining)
+            amount = eth
+            tokens = amount * amountGive // amountGet
+        else:
+            # tokenGet is the token, the trade amount is the tokens sold
+            eth = min(available * amountGive // amountGet, remaining)
+            amount = eth * amountGet // amountGive
+            eth = amount * amountGive // amountGet
+            tokens = amount
+        if eth < smallest or tokens <= 0:
+            continue
+        fills.append(Fill(order, amount, eth, tokens, confirmed))
+        remaining -= eth
+    return FillPlan(side, target, fills)
+
+
+def eligible_orders(orders, side, user=None, block_number=None):
+    """
+    Yields the orders plan_fills may take, skipping orders of the other
+    side, orders without an id, own orders, expired orders and orders that
+    cannot be parsed
+
+    :param orders: orders
+    :type orders: list
+    :param side: 'buy' takes sell orders, 'sell' takes buy orders
+    :type side: str
+    :param user: account whose orders are skipped
+    :type user: str
+    :param block_number: skip orders that expire at or before this block, None to keep them all
+    :type block_number: int
+    :return: orders
+    :rtype: generator
+    """
+    for order, _, _, _ in _eligible(orders, side, user, block_number):
+        yield order
+
+
+def _eligible(orders, side, user, block_number):
+    user = user.lower() if user else None
+    for order in orders:
+        if not order_id(order):
+            # volumes are keyed by id, so they could not be told apart
+            continue
+        try:
+            tokenGet, maker, amountGet, amountGive, expires, available = _fields(order)
+            sell = tokenGet.lower() == ZERO_ADDRESS
+        except (AttributeError, KeyError, TypeError, ValueError, ArithmeticError):
+            continue
+        if sell != (side == 'buy'):
+            continue
+        if user and maker and maker.lower() == user:
+            continue
+        if block_number is not None and expires <= block_number:
+            continue
+        if amountGet <= 0 or amountGive <= 0:
+            continue
+        yield order, amountGet, amountGive, available
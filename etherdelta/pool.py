@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+
+
+class EndpointStats(object):
+    """
+    Moving averages of one endpoint's latency and error rate
+    """
+    __slots__ = ('endpoint', 'latency', 'error_rate', 'calls', 'errors', 'failed_at')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        # seconds, None until the first call completes
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.failed_at = None
+
+    def __repr__(self):
+        latency = '-' if self.latency is None else '%.1fms' % (self.latency * 1e3)
+        # sessions are shown by their URL
+        endpoint = getattr(self.endpoint, 'url', self.endpoint)
+        return '<EndpointStats %s latency=%s error_rate=%.2f calls=%d>' % (endpoint, latency, self.error_rate, self.calls)
+
+
+class EndpointPool(object):
+    """
+    Routes calls to the healthiest of several interchangeable endpoints
+
+    Every call updates the endpoint's moving average latency and error rate.
+    Calls go to the endpoint with the lowest latency weighted by error rate.
+    Endpoints that have not been measured yet come first, and endpoints that
+    failed within the last `cooldown` seconds come last. A failed call is
+    retried on the next endpoint.
+
+    With a `hedge_delay`, a call that has not completed after that many
+    seconds is also sent to the next endpoint. The first successful result
+    wins and slower calls finish in the background. Only hedge calls that
+    are safe to repeat. Each attempt of a hedged call runs on a thread of its
+    own, so however many calls are in flight, none waits for a free worker
+    and the delay counts from when the attempt really starts.
+    """
+
+    def __init__(self, endpoints, hedge_delay=None, cooldown=5, alpha=0.2):
+        """
+        :param endpoints: endpoints, e.g. URLs or sessions, in order of preference
+        :type endpoints: list
+        :param hedge_delay: seconds before a slow call is also sent to the next endpoint, None to never hedge
+        :type hedge_delay: float
+        :param cooldown: seconds a failed endpoint is ranked behind the others
+        :type cooldown: float
+        :param alpha: weight of the latest call in the moving averages
+        :type alpha: float
+        """
+        if not endpoints:
+            raise ValueError('at least one endpoint is required')
+        self.endpoints = list(endpoints)
+        self.hedge_delay = hedge_delay
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.stats = [EndpointStats(endpoint) for endpoint in self.endpoints]
+        self._lock = threading.Lock()
+
+    def ranked(self):
+        """
+        Returns the endpoints, healthiest first
+
+        :return: endpoints
+        :rtype: list
+        """
+        now = time.monotonic()
+        with self._lock:
+            order = sorted(range(len(self.stats)), key=lambda i: self._rank(self.stats[i], now, i))
+        return [self.endpoints[i] for i in order]
+
+    def best(self):
+        """
+        Returns the healthiest endpoint
+        """
+        return self.ranked()[0]
+
+    def _rank(self, stats, now, position):
+        cooling = stats.failed_at is not None and now - stats.failed_at < self.cooldown
+        if stats.latency is None:
+            return (cooling, 0.0, position)
+        return (cooling, stats.latency * (1 + 10 * stats.error_rate), position)
+
+    def record(self, endpoint, seconds, error=None):
+        """
+        Updates an endpoint's statistics with a completed call
+
+        :param endpoint: endpoint
+        :type endpoint: object
+        :param seconds: duration of the call
+        :type seconds: float
+        :param error: the error if the call failed, else None
+        :type error: Exception
+        """
+        alpha = self.alpha
+        with self._lock:
+            stats = self.stats[self.endpoints.index(endpoint)]
+            stats.calls += 1
+            stats.latency = seconds if stats.latency is None else (1 - alpha) * stats.latency + alpha * seconds
+            stats.error_rate = (1 - alpha) * stats.error_rate + (alpha if error is not None else 0.0)
+            if error is not None:
+                stats.errors += 1
+                stats.failed_at = time.monotonic()
+
+    def call(self, fn, hedge=True):
+        """
+        Calls fn with the healthiest endpoint, failing over to the others
+
+        :param fn: called with an endpoint, raises on failure
+        :type fn: function
+        :param hedge: whether the call may be sent to a second endpoint after hedge_delay
+        :type hedge: bool
+        :return: result of the first successful call
+        :rtype: object
+        """
+        endpoints = self.ranked()
+        if not hedge or self.hedge_delay is None or len(endpoints) < 2:
+            error = None
+            for endpoint in endpoints:
+                try:
+                    return self._timed(fn, endpoint)
+                except Exception as e:
+                    error = e
+            raise error
+        return self._hedged(fn, endpoints)
+
+    def _timed(self, fn, endpoint):
+        started = time.perf_counter()
+        try:
+            result = fn(endpoint)
+        except Exception as e:
+            self.record(endpoint, time.perf_counter() - started, e)
+            raise
+        self.record(endpoint, time.perf_counter() - started)
+        return result
+
+    def _hedged(self, fn, endpoints):
+        results = queue.Queue()
+
+        def attempt(endpoint):
+            try:
+                results.put((True, self._timed(fn, endpoint)))
+            except Exception as e:
+                results.put((False, e))
+
+        def start(endpoint):
+            thread = threading.Thread(target=attempt, args=(endpoint,), name='etherdelta-pool')
+            thread.daemon = True
+            thread.start()
+
+        remaining = iter(endpoints)
+        start(next(remaining))
+        pending = 1
+        error = None
+        exhausted = False
+        while pending:
+            try:
+                ok, value = results.get(timeout=None if exhausted else self.hedge_delay)
+            except queue.Empty:
+                ok = None
+            else:
+                pending -= 1
+                if ok:
+                    return value
+                error = value
+            # hedge when the calls in flight are slow, fail over when they all failed
+            if not exhausted and (ok is None or not pending):
+                endpoint = next(remaining, None)
+                if endpoint is None:
+                    exhausted = True
+                else:
+                    start(endpoint)
+                    pending += 1
+        raise error
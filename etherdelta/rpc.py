@@ -0,0 +1,306 @@
+import itertools
+import json
+import threading
+import time
+
+
+class RPCError(Exception):
+    """
+    Error returned by a JSON-RPC node for a single call
+    """
+
+    def __init__(self, error):
+        if isinstance(error, dict):
+            self.code = error.get('code')
+            message = error.get('message', '')
+        else:
+            self.code = None
+            message = str(error)
+        super().__init__(message)
+        self.error = error
+
+
+def batch_payload(calls, ids):
+    """
+    Returns a JSON-RPC batch for a list of (method, params) calls
+
+    :param calls: calls
+    :type calls: list
+    :param ids: request id generator
+    :type ids: iterator
+    :return: batch
+    :rtype: list
+    """
+    return [{'jsonrpc': '2.0', 'id': next(ids), 'method': method, 'params': params} for method, params in calls]
+
+
+def batch_results(payload, response):
+    """
+    Matches a batch response back to its requests
+
+    Nodes may answer batch items in any order; results are returned in
+    request order, with an RPCError in place of every failed call.
+
+    :param payload: batch sent
+    :type payload: list
+    :param response: decoded batch response
+    :type response: list or dict
+    :return: results
+    :rtype: list
+    """
+    if isinstance(response, dict):
+        # the whole batch was rejected
+        error = RPCError(response.get('error') or response)
+        return [error] * len(payload)
+    by_id = {}
+    for item in response:
+        by_id[item.get('id')] = item
+    results = []
+    for request in payload:
+        item = by_id.get(request['id'])
+        if item is None:
+            results.append(RPCError('no response for ' + request['method']))
+        elif item.get('error'):
+            results.append(RPCError(item['error']))
+        else:
+            results.append(item.get('result'))
+    return results
+
+
+def batch_method(calls):
+    """
+    Returns the method shared by every call of a batch, or 'batch'
+    """
+    methods = set(method for method, _ in calls)
+    return methods.pop() if len(methods) == 1 else 'batch'
+
+
+def response_error(response):
+    """
+    Returns an RPCError for a single call response holding an error, else None
+    """
+    if isinstance(response, dict) and response.get('error'):
+        return RPCError(response['error'])
+    return None
+
+
+def post_json(endpoint_uri, payload, timeout):
+    """
+    POSTs a JSON-RPC payload and returns the decoded response
+    """
+    import urllib.request
+    data = json.dumps(payload).encode('utf-8')
+    request = urllib.request.Request(endpoint_uri, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+class JSONRPC(object):
+    """
+    Minimal Ethereum JSON-RPC client over HTTP with batch support
+    """
+
+    def __init__(self, endpoint_uri, timeout=30, chunk_size=100, hooks=None):
+        """
+        :param endpoint_uri: HTTP endpoint
+        :type endpoint_uri: str
+        :param timeout: seconds to wait for each HTTP request
+        :type timeout: float
+        :param chunk_size: maximum number of calls per batch request
+        :type chunk_size: int
+        :param hooks: instrumentation hooks
+        :type hooks: Hooks
+        """
+        self.endpoint_uri = endpoint_uri
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.hooks = hooks
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _post(self, payload):
+        return post_json(self.endpoint_uri, payload, self.timeout)
+
+    def _timed_post(self, payload, method, calls):
+        hooks = self.hooks
+        if hooks is None:
+            return self._post(payload)
+        started = time.perf_counter()
+        try:
+            data = self._post(payload)
+        except Exception as e:
+            hooks.rpc_call(method, time.perf_counter() - started, calls, e)
+            raise
+        hooks.rpc_call(method, time.perf_counter() - started, calls, response_error(data))
+        return data
+
+    def _next_ids(self, n):
+        with self._lock:
+            return iter([next(self._ids) for _ in range(n)])
+
+    def call(self, method, params):
+        """
+        Makes a JSON-RPC call
+
+        :param method: RPC method, e.g. 'eth_call'
+        :type method: str
+        :param params: RPC params
+        :type params: list
+        :return: result
+        :rtype: object
+        """
+        data = self.request(method, params)
+        if data.get('error'):
+            raise RPCError(data['error'])
+        return data['result']
+
+    def request(self, method, params):
+        """
+        Makes a JSON-RPC call and returns the whole response
+
+        :param method: RPC method, e.g. 'eth_call'
+        :type method: str
+        :param params: RPC params
+        :type params: list
+        :return: response, with either 'result' or 'error'
+        :rtype: dict
+        """
+        payload = batch_payload([(method, params)], self._next_ids(1))[0]
+        return self._timed_post(payload, method, 1)
+
+    def batch(self, calls):
+        """
+        Sends calls as JSON-RPC batches of at most chunk_size calls
+
+        :param calls: list of (method, params)
+        :type calls: list
+        :return: results in input order, with an RPCError in place of every failed call
+        :rtype: list
+        """
+        results = []
+        for start in range(0, len(calls), self.chunk_size):
+            chunk = calls[start:start + self.chunk_size]
+            payload = batch_payload(chunk, self._next_ids(len(chunk)))
+            try:
+                response = self._timed_post(payload, batch_method(chunk), len(chunk))
+            except Exception as e:
+                results.extend([RPCError(str(e))] * len(chunk))
+                continue
+            results.extend(batch_results(payload, response))
+        return results
+
+
+def http_endpoint(provider):
+    """
+    Returns the HTTP endpoint of a web3 provider, or None if it has none
+    (e.g. an IPC or WebSocket provider)
+    """
+    endpoint_uri = getattr(provider, 'endpoint_uri', None)
+    if isinstance(endpoint_uri, str) and endpoint_uri.lower().startswith(('http://', 'https://')):
+        return endpoint_uri
+    return None
+
+
+class ProviderJSONRPC(JSONRPC):
+    """
+    JSON-RPC client that sends requests through a web3 provider
+
+    Single calls go through the provider's make_request. Batches are POSTed
+    as one request when the provider has an HTTP endpoint, else sent one
+    call at a time through the provider.
+    """
+
+    def __init__(self, provider, timeout=30, chunk_size=100, hooks=None):
+        """
+        :param provider: web3 provider
+        :type provider: BaseProvider
+        """
+        self.provider = provider
+        super().__init__(http_endpoint(provider), timeout, chunk_size, hooks)
+
+    def _post(self, payload):
+        if not isinstance(payload, list):
+            return self.provider.make_request(payload['method'], payload['params'])
+        if self.endpoint_uri is not None:
+            return post_json(self.endpoint_uri, payload, self.timeout)
+        responses = []
+        for call in payload:
+            try:
+                response = dict(self.provider.make_request(call['method'], call['params']))
+            except Exception as e:
+                response = {'error': {'message': str(e)}}
+            # the provider numbers requests on its own
+            response['id'] = call['id']
+            responses.append(response)
+        return responses
+
+
+# Calls that must not be sent twice by hedging
+WRITE_METHODS = frozenset(['eth_sendRawTransaction', 'eth_sendTransaction'])
+
+
+class PooledJSONRPC(JSONRPC):
+    """
+    JSON-RPC client over several interchangeable endpoints
+
+    Requests go to the healthiest endpoint of an EndpointPool and fail over
+    to the next one when the HTTP request fails. With a `hedge_delay`, a read
+    that is still waiting after that many seconds is also sent to the next
+    endpoint and the first response wins. Requests holding a transaction are
+    never hedged.
+    """
+
+    def __init__(self, endpoint_uris, timeout=30, chunk_size=100, hooks=None, hedge_delay=None):
+        """
+        :param endpoint_uris: HTTP endpoints, in order of preference
+        :type endpoint_uris: list
+        :param hedge_delay: seconds before a pending read is also sent to the next endpoint, None to never hedge
+        :type hedge_delay: float
+        """
+        from .pool import EndpointPool
+        self.endpoint_uris = list(endpoint_uris)
+        self.pool = EndpointPool(self.endpoint_uris, hedge_delay)
+        super().__init__(self.endpoint_uris[0], timeout, chunk_size, hooks)
+
+    def _post(self, payload):
+        calls = payload if isinstance(payload, list) else [payload]
+        hedge = not any(call['method'] in WRITE_METHODS for call in calls)
+        return self.pool.call(lambda endpoint_uri: post_json(endpoint_uri, payload, self.timeout), hedge)
+
+
+_provider_class = None
+
+
+def rpc_provider(rpc):
+    """
+    Returns a web3 provider that sends requests through a JSONRPC client,
+    e.g. a PooledJSONRPC
+
+    :param rpc: JSON-RPC client
+    :type rpc: JSONRPC
+    :return: provider
+    :rtype: BaseProvider
+    """
+    global _provider_class
+    if _provider_class is None:
+        # web3 is only imported once a provider is needed
+        from web3.providers.base import BaseProvider
+
+        class RPCProvider(BaseProvider):
+
+            def __init__(self, rpc):
+                super().__init__()
+                self.rpc = rpc
+
+            def make_request(self, method, params):
+                return self.rpc.request(method, params)
+
+            def isConnected(self):
+                try:
+                    self.rpc.call('net_version', [])
+                except Exception:
+                    return False
+                return True
+
+        _provider_class = RPCProvider
+    return _provider_class(rpc)
@@ -0,0 +1,555 @@
+import json
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from .frames import EVENT_PREFIX, decode_event, frame_topic
+from .lazy import LazyImport
+
+websocket = LazyImport('websocket')
+
+
+class SessionError(Exception):
+    pass
+
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+
+def reply_key(topic, payload):
+    """
+    Returns what identifies the request a reply answers, or None if the
+    reply does not tell
+
+    `market` replies are identified by the lowercase address of the token
+    their orders or trades are for.
+
+    :param topic: event topic
+    :type topic: str
+    :param payload: reply payload
+    :type payload: object
+    :return: key
+    :rtype: str
+    """
+    if topic != 'market' or not isinstance(payload, dict):
+        return None
+    orders = payload.get('orders') or {}
+    for side in ('buys', 'sells'):
+        for order in orders.get(side) or ():
+            token = order.get('tokenGet') if order.get('tokenGive') == ZERO_ADDRESS else order.get('tokenGive')
+            if token:
+                return token.lower()
+    for trade in payload.get('trades') or ():
+        if trade.get('tokenAddr'):
+            return trade['tokenAddr'].lower()
+    return None
+
+
+def pick_waiter(topic_waiters, key):
+    """
+    Returns the waiter a reply with the given key goes to, or None if it
+    cannot tell
+
+    A reply with a key goes to the oldest waiter expecting that key, else to
+    the oldest one expecting any reply, never to one expecting another key.
+    A reply without a key (e.g. an empty market) could answer any request,
+    so it only goes to the oldest waiter expecting any reply, or to the only
+    waiter of the topic.
+    """
+    fallback = None
+    for waiter in topic_waiters:
+        if key is not None and waiter.key == key:
+            return waiter
+        if fallback is None and waiter.key is None:
+            fallback = waiter
+    if fallback is None and key is None and len(topic_waiters) == 1:
+        return topic_waiters[0]
+    return fallback
+
+
+class _Waiter(object):
+    __slots__ = ('message', 'topic', 'key', 'event', 'payload')
+
+    def __init__(self, message, topic, key=None):
+        self.message = message
+        self.topic = topic
+        self.key = key
+        self.event = threading.Event()
+        self.payload = None
+
+
+class SocketSession(object):
+    """
+    Long-lived socket.io (EIO=3) connection to the EtherDelta WebSocket API
+
+    A single socket is opened on first use and kept alive with socket.io
+    pings. Requests are matched to replies by event topic, in the order they
+    were sent, or by a key identifying the reply (see reply_key), so any
+    number of requests can be in flight on the same connection. If the
+    socket drops, it is reopened and every outstanding request is sent again;
+    frames pushed while it was down are lost, which reconnect listeners are
+    told about.
+    """
+
+    def __init__(self, url, connect_timeout=10, reconnect_delay=1, hooks=None):
+        """
+        :param url: WebSocket URL
+        :type url: str
+        :param connect_timeout: seconds to wait for the socket to open
+        :type connect_timeout: float
+        :param reconnect_delay: seconds between reconnection attempts
+        :type reconnect_delay: float
+        :param hooks: instrumentation hooks
+        :type hooks: Hooks
+        """
+        self.url = url
+        self.hooks = hooks
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.ping_interval = 25
+        self.ws = None
+        self._lock = threading.Lock()
+        # notified whenever a waiter is removed
+        self._idle = threading.Condition(self._lock)
+        self._waiters = {}
+        # waiter that has its topic to itself, by topic
+        self._exclusive = {}
+        self._listeners = {}
+        self._reconnect_listeners = []
+        self._connected = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._connect_started = None
+        self._has_connected = False
+
+    def connect(self):
+        """
+        Opens the socket if it is not already open
+
+        :return: whether the socket is connected
+        :rtype: bool
+        """
+        self._start()
+        return self._connected.wait(self.connect_timeout)
+
+    def _start(self):
+        with self._lock:
+            if self._closed:
+                raise SessionError('session is closed')
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='etherdelta-session')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def close(self):
+        """
+        Closes the socket and stops reconnecting
+        """
+        with self._lock:
+            self._closed = True
+            ws = self.ws
+            waiters = [w for topic_waiters in self._waiters.values() for w in topic_waiters]
+            self._waiters = {}
+            self._exclusive = {}
+            self._idle.notify_all()
+        if ws is not None:
+            ws.close()
+        for waiter in waiters:
+            waiter.event.set()
+
+    @property
+    def connected(self):
+        return self._connected.is_set()
+
+    def send(self, message):
+        """
+        Sends a raw frame, opening the socket first if needed
+
+        :param message: socket.io frame, e.g. '42["getMarket",{...}]'
+        :type message: str
+        """
+        if not self._connected.is_set():
+            if not self.connect():
+                raise SessionError('could not connect to ' + self.url)
+        self.ws.send(message)
+
+    def request(self, message, topic, timeout=30, max_tries=3, key=None, exclusive=False):
+        """
+        Sends a frame and waits for the next reply with the given event topic
+
+        Empty replies and timeouts are retried up to `max_tries` times. A reply
+        without a key is not handed to a request expecting a key while other
+        requests of the topic are pending (see pick_waiter), so a request with
+        a key that timed out is retried alone: it waits until no other request
+        of the topic is pending and holds new ones back until it is answered.
+
+        :param message: socket.io frame to send
+        :type message: str
+        :param topic: event topic of the reply, e.g. 'market'
+        :type topic: str
+        :param timeout: seconds to wait for each attempt
+        :type timeout: float
+        :param max_tries: number of attempts
+        :type max_tries: int
+        :param key: reply_key of the expected reply, so replies arriving out of order
+                    still reach their request, None to take the next reply
+        :type key: str
+        :param exclusive: send the first attempt alone too
+        :type exclusive: bool
+        :return: reply payload, or None if no reply arrived
+        :rtype: object
+        """
+        hooks = self.hooks
+        for attempt in range(max_tries):
+            waiter = _Waiter(message, topic, key)
+            if hooks is not None:
+                sent = time.perf_counter()
+            with self._lock:
+                queued = self._enqueue(waiter, exclusive, timeout)
+                if self._closed:
+                    raise SessionError('session is closed')
+                connected = self._connected.is_set()
+            if queued and connected:
+                try:
+                    self.ws.send(message)
+                except Exception:
+                    # The waiter stays registered; the frame is resent on reconnect
+                    pass
+            elif queued:
+                self._start()
+            if not queued or not waiter.event.wait(timeout):
+                self._discard(waiter)
+                exclusive = key is not None
+            elif waiter.payload:
+                if hooks is not None:
+                    hooks.socket_request(topic, time.perf_counter() - sent)
+                return waiter.payload
+            if hooks is not None and attempt + 1 < max_tries:
+                hooks.socket_retry(topic)
+        return None
+
+    def add_listener(self, topic, callback):
+        """
+        Registers a callback for every frame with the given event topic,
+        including frames pushed by the server without a request
+
+        :param topic: event topic, e.g. 'orders'
+        :type topic: str
+        :param callback: called with the frame payload
+        :type callback: function
+        """
+        with self._lock:
+            self._listeners.setdefault(topic, []).append(callback)
+
+    def remove_listener(self, topic, callback):
+        """
+        Unregisters a callback added with add_listener
+        """
+        with self._lock:
+            listeners = self._listeners.get(topic)
+            if listeners and callback in listeners:
+                listeners.remove(callback)
+
+    def add_reconnect_listener(self, callback):
+        """
+        Registers a callback for every time the socket is reopened after it
+        dropped, e.g. to refresh state kept up to date from pushed frames
+
+        The callback is called without arguments from the session's thread,
+        so it must not wait for a reply itself.
+
+        :param callback: called after each reconnection
+        :type callback: function
+        """
+        with self._lock:
+            self._reconnect_listeners.append(callback)
+
+    def remove_reconnect_listener(self, callback):
+        """
+        Unregisters a callback added with add_reconnect_listener
+        """
+        with self._lock:
+            if callback in self._reconnect_listeners:
+                self._reconnect_listeners.remove(callback)
+
+    def _wants(self, topic):
+        return bool(self._listeners.get(topic) or self._waiters.get(topic))
+
+    def _enqueue(self, waiter, exclusive, timeout):
+        # called with the lock held; returns False if the topic could not be
+        # had in time
+        topic = waiter.topic
+        deadline = time.monotonic() + timeout
+        while not self._closed and (topic in self._exclusive or (exclusive and self._waiters.get(topic))):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._idle.wait(remaining)
+        if self._closed:
+            return False
+        if exclusive:
+            self._exclusive[topic] = waiter
+        self._waiters.setdefault(topic, deque()).append(waiter)
+        return True
+
+    def _remove(self, topic_waiters, waiter):
+        # called with the lock held
+        topic_waiters.remove(waiter)
+        if self._exclusive.get(waiter.topic) is waiter:
+            del self._exclusive[waiter.topic]
+        self._idle.notify_all()
+
+    def _discard(self, waiter):
+        with self._lock:
+            topic_waiters = self._waiters.get(waiter.topic)
+            if topic_waiters and waiter in topic_waiters:
+                self._remove(topic_waiters, waiter)
+
+    def _dispatch(self, topic, payload):
+        with self._lock:
+            listeners = list(self._listeners.get(topic, ()))
+            topic_waiters = self._waiters.get(topic)
+            waiter = None
+            if topic_waiters:
+                if len(topic_waiters) == 1 and topic_waiters[0].key is None:
+                    waiter = topic_waiters[0]
+                else:
+                    waiter = pick_waiter(topic_waiters, reply_key(topic, payload))
+                if waiter is not None:
+                    self._remove(topic_waiters, waiter)
+        for callback in listeners:
+            try:
+                callback(payload)
+            except Exception:
+                pass
+        if waiter is not None:
+            waiter.payload = payload
+            waiter.event.set()
+
+    def _run(self):
+        while not self._closed:
+            ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close)
+            self.ws = ws
+            self._connect_started = time.perf_counter()
+            try:
+                # websocket-client validates UTF-8 in pure Python, which costs
+                # ~20ms per 100kB market frame; text frames are still decoded
+                # (and so validated) with bytes.decode
+                ws.run_forever(skip_utf8_validation=True)
+            except Exception:
+                pass
+            self._connected.clear()
+            if not self._closed:
+                time.sleep(self.reconnect_delay)
+
+    def _ping(self, ws):
+        # socket.io expects an engine.io ping ('2') every pingInterval,
+        # WebSocket-level pings do not keep the session alive
+        while not self._closed and self.ws is ws:
+            time.sleep(self.ping_interval)
+            if self.ws is not ws or not self._connected.is_set():
+                break
+            try:
+                ws.send('2')
+            except Exception:
+                break
+
+    def _on_open(self, ws):
+        pass
+
+    def _on_message(self, ws, message):
+        if message[:2] == EVENT_PREFIX:
+            hooks = self.hooks
+            topic = frame_topic(message)
+            if topic is not None and not self._wants(topic):
+                # nobody is waiting for or listening to this topic, skip decoding
+                if hooks is not None:
+                    hooks.socket_frame_skipped(topic, len(message))
+                return
+            if hooks is None:
+                event = decode_event(message)
+            else:
+                started = time.perf_counter()
+                event = decode_event(message)
+                if event:
+                    hooks.socket_frame(event[0], len(message), time.perf_counter() - started)
+            if event:
+                self._dispatch(*event)
+        elif message[:1] == '0':
+            # engine.io open packet: {"sid": ..., "pingInterval": ..., "pingTimeout": ...}
+            try:
+                handshake = json.loads(message[1:])
+                self.ping_interval = handshake.get('pingInterval', 25000) / 1000.0
+            except ValueError:
+                pass
+            reconnect = self._has_connected
+            with self._lock:
+                self._connected.set()
+                pending = [w.message for topic_waiters in self._waiters.values() for w in topic_waiters]
+                reconnect_listeners = list(self._reconnect_listeners) if reconnect else []
+            if self.hooks is not None:
+                self.hooks.socket_connected(self.url, time.perf_counter() - self._connect_started, reconnect)
+            self._has_connected = True
+            for pending_message in pending:
+                ws.send(pending_message)
+            pinger = threading.Thread(target=self._ping, args=(ws,), name='etherdelta-session-ping')
+            pinger.daemon = True
+            pinger.start()
+            for callback in reconnect_listeners:
+                try:
+                    callback()
+                except Exception:
+                    pass
+
+    def _on_error(self, ws, err):
+        if self.hooks is not None:
+            self.hooks.socket_error(self.url, err)
+
+    def _on_close(self, ws, *args):
+        self._connected.clear()
+
+
+class _NoReply(SessionError):
+    pass
+
+
+class PooledSession(object):
+    """
+    Sessions to several interchangeable WebSocket endpoints behind the
+    SocketSession interface
+
+    Requests go to the healthiest endpoint of an EndpointPool and fail over
+    to the next one when no reply arrives. With a `hedge_delay`, a request
+    that is still waiting after that many seconds is also sent to the next
+    endpoint and the first reply wins. Frames sent with send() go to a single
+    endpoint and are never hedged. Listeners are registered on the
+    healthiest endpoint at the time, so pushed events come from one feed.
+    """
+
+    def __init__(self, urls, hedge_delay=None, connect_timeout=10, reconnect_delay=1, hooks=None):
+        """
+        :param urls: WebSocket URLs, in order of preference
+        :type urls: list
+        :param hedge_delay: seconds before a pending request is also sent to the next endpoint, None to never hedge
+        :type hedge_delay: float
+        :param connect_timeout: seconds to wait for a socket to open
+        :type connect_timeout: float
+        :param reconnect_delay: seconds between reconnection attempts
+        :type reconnect_delay: float
+        :param hooks: instrumentation hooks
+        :type hooks: Hooks
+        """
+        from .pool import EndpointPool
+        self.urls = list(urls)
+        self.sessions = [SocketSession(url, connect_timeout, reconnect_delay, hooks) for url in self.urls]
+        self.pool = EndpointPool(self.sessions, hedge_delay)
+        self._lock = threading.Lock()
+        self._listeners = {}
+        self._reconnect_listeners = {}
+
+    @property
+    def url(self):
+        return self.pool.best().url
+
+    @property
+    def connected(self):
+        return any(session.connected for session in self.sessions)
+
+    def connect(self):
+        """
+        Opens every socket that is not already open
+
+        :return: whether at least one socket is connected
+        :rtype: bool
+        """
+        for session in self.sessions:
+            session._start()
+        return any([session.connect() for session in self.sessions])
+
+    def close(self):
+        """
+        Closes every socket and stops reconnecting
+        """
+        for session in self.sessions:
+            session.close()
+
+    def send(self, message):
+        """
+        Sends a raw frame to the healthiest endpoint that is reachable
+
+        :param message: socket.io frame
+        :type message: str
+        """
+        self.pool.call(lambda session: session.send(message), hedge=False)
+
+    def request(self, message, topic, timeout=30, max_tries=3, key=None):
+        """
+        Sends a frame and waits for the next reply with the given event topic,
+        see SocketSession.request
+
+        Each attempt goes to the healthiest endpoint and fails over to the
+        others, hedging if enabled.
+
+        :return: reply payload, or None if no reply arrived
+        :rtype: object
+        """
+        def attempt(session, exclusive=False):
+            if not session.connected and not session.connect():
+                raise SessionError('could not connect to ' + session.url)
+            payload = session.request(message, topic, timeout, 1, key, exclusive)
+            if not payload:
+                raise _NoReply('no reply from ' + session.url)
+            return payload
+
+        for tries in range(max_tries):
+            # see SocketSession.request, a retry with a key is sent alone
+            call = partial(attempt, exclusive=tries > 0 and key is not None)
+            try:
+                return self.pool.call(call)
+            except _NoReply:
+                pass
+        return None
+
+    def add_listener(self, topic, callback):
+        """
+        Registers a callback for every frame with the given event topic on the
+        healthiest endpoint, see SocketSession.add_listener
+        """
+        session = self.pool.best()
+        with self._lock:
+            self._listeners[(topic, callback)] = session
+        session.add_listener(topic, callback)
+
+    def remove_listener(self, topic, callback):
+        """
+        Unregisters a callback added with add_listener
+        """
+        with self._lock:
+            session = self._listeners.pop((topic, callback), None)
+        if session is not None:
+            session.remove_listener(topic, callback)
+
+    def add_reconnect_listener(self, callback):
+        """
+        Registers a callback for every reconnection of the healthiest
+        endpoint, see add_listener and SocketSession.add_reconnect_listener
+        """
+        session = self.pool.best()
+        with self._lock:
+            self._reconnect_listeners[callback] = session
+        session.add_reconnect_listener(callback)
+
+    def remove_reconnect_listener(self, callback):
+        """
+        Unregisters a callback added with add_reconnect_listener
+        """
+        with self._lock:
+            session = self._reconnect_listeners.pop(callback, None)
+        if session is not None:
+            session.remove_reconnect_listener(callback)
@@ -0,0 +1,164 @@
+import hashlib
+
+# Layout of the parameters hashed and signed for an off-chain order:
+# contractAddr, tokenGet, amountGet, tokenGive, amountGive, expires, nonce
+ORDER_TYPES = ['address', 'address', 'uint256', 'address', 'uint256', 'uint256', 'uint256']
+
+
+# This function is very similar to Web3.soliditySha3() but there is no Web3.solidity_sha256() as per November 2017
+# It serializes values according to the ABI types defined in abi_types and hashes the result with sha256.
+def solidity_sha256(abi_types, values):
+    from web3 import Web3
+    from web3.utils.abi import map_abi_data
+    from web3.utils.encoding import hex_encode_abi_type
+    from eth_utils import add_0x_prefix, remove_0x_prefix
+    # TODO
+    #normalized_values = map_abi_data([abi_ens_resolver(Web3)], abi_types, values)
+    normalized_values = map_abi_data([], abi_types, values)
+    #print(normalized_values)
+    hex_string = add_0x_prefix(''.join(
+        remove_0x_prefix(hex_encode_abi_type(abi_type, value))
+        for abi_type, value
+        in zip(abi_types, normalized_values)
+    ))
+    hash_object = hashlib.sha256(Web3.toBytes(hexstr=hex_string))
+    return hash_object.hexdigest()
+
+
+def _address_bytes(value):
+    # what the hex round trip of solidity_sha256 makes of an address: the 0x
+    # prefix is optional and short or odd-length hex is padded with zeros
+    digits = value[2:] if value[:2] in ('0x', '0X') else value
+    if len(digits) > 40:
+        raise ValueError('addresses must be 20 bytes long')
+    return bytes.fromhex(digits.rjust(40, '0'))
+
+
+def _pack(contractAddr, tokenGet, amountGet, tokenGive, amountGive, expires, nonce):
+    return b''.join((
+        _address_bytes(contractAddr),
+        _address_bytes(tokenGet),
+        int(amountGet).to_bytes(32, 'big'),
+        _address_bytes(tokenGive),
+        int(amountGive).to_bytes(32, 'big'),
+        int(expires).to_bytes(32, 'big'),
+        int(nonce).to_bytes(32, 'big'),
+    ))
+
+
+def order_hash(contractAddr, tokenGet, amountGet, tokenGive, amountGive, expires, nonce):
+    """
+    Returns the sha256 hash of an order's parameters, as hex
+
+    Same result as solidity_sha256(ORDER_TYPES, [...]), but packs the fixed
+    layout straight into bytes instead of going through hex strings.
+    Addresses that are not 0x and 40 hex digits are normalised the way the
+    hex round trip does.
+
+    :return: hash
+    :rtype: str
+    """
+    try:
+        packed = b''.join((
+            bytes.fromhex(contractAddr[2:]),
+            bytes.fromhex(tokenGet[2:]),
+            int(amountGet).to_bytes(32, 'big'),
+            bytes.fromhex(tokenGive[2:]),
+            int(amountGive).to_bytes(32, 'big'),
+            int(expires).to_bytes(32, 'big'),
+            int(nonce).to_bytes(32, 'big'),
+        ))
+    except ValueError:
+        packed = None
+    if packed is None or len(packed) != 188:
+        packed = _pack(contractAddr, tokenGet, amountGet, tokenGive, amountGive, expires, nonce)
+    return hashlib.sha256(packed).hexdigest()
+
+
+def order_hashes(values):
+    """
+    Returns the order_hash of many orders
+
+    There is no batch primitive for sha256, so this is a loop doing what
+    order_hash does, with the helpers looked up once rather than per order.
+
+    :param values: order parameters of each order, in ORDER_TYPES layout
+    :type values: list
+    :return: hashes
+    :rtype: list
+    """
+    sha256 = hashlib.sha256
+    fromhex = bytes.fromhex
+    hashes = []
+    append = hashes.append
+    for order in values:
+        contractAddr, tokenGet, amountGet, tokenGive, amountGive, expires, nonce = order
+        try:
+            packed = (fromhex(contractAddr[2:]) + fromhex(tokenGet[2:]) + int(amountGet).to_bytes(32, 'big') +
+                      fromhex(tokenGive[2:]) + int(amountGive).to_bytes(32, 'big') +
+                      int(expires).to_bytes(32, 'big') + int(nonce).to_bytes(32, 'big'))
+        except ValueError:
+            packed = None
+        if packed is None or len(packed) != 188:
+            packed = _pack(*order)
+        append(sha256(packed).hexdigest())
+    return hashes
+
+
+def sign_order(values, private_key):
+    """
+    Hashes and signs the parameters of an order
+
+    Module-level so it can run in a worker process.
+
+    :param values: order parameters, in ORDER_TYPES layout
+    :type values: list
+    :param private_key: private key
+    :type private_key: bytes
+    :return: (v, r, s)
+    :rtype: tuple
+    """
+    from . import get_default_web3
+    hashhex = order_hash(*values)
+    # Sign the hash of the order's parameters with our private key (this also addes the "Ethereum Signed Message" header)
+    signresult = get_default_web3().eth.account.sign(message_hexstr=hashhex, private_key=private_key)
+    return signresult['v'], signresult['r'], signresult['s']
+
+
+def sign_orders(values, private_key):
+    """
+    Signs a chunk of orders, see sign_order
+
+    :param values: order parameters of each order
+    :type values: list
+    :param private_key: private key
+    :type private_key: bytes
+    :return: (v, r, s) of each order
+    :rtype: list
+    """
+    from . import get_default_web3
+    sign = get_default_web3().eth.account.sign
+    signatures = []
+    for hashhex in order_hashes(values):
+        signresult = sign(message_hexstr=hashhex, private_key=private_key)
+        signatures.append((signresult['v'], signresult['r'], signresult['s']))
+    return signatures
+
+
+def sign_transactions(transactions, private_key):
+    """
+    Signs a chunk of transactions
+
+    Module-level so it can run in a worker process.
+
+    :param transactions: transaction dicts, with nonce, gas and gasPrice set
+    :type transactions: list
+    :param private_key: private key
+    :type private_key: string
+    :return: raw signed transaction of each, as hex
+    :rtype: list
+    """
+    from . import get_default_web3
+    w3 = get_default_web3()
+    sign = w3.eth.account.signTransaction
+    return [w3.toHex(sign(transaction, private_key).rawTransaction) for transaction in transactions]
@@ -0,0 +1,220 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from .frames import loads
+from .order import to_int
+
+# File layout, every integer little-endian:
+#   header   HEADER
+#   books    one BOOK per token
+#   index    one ENTRY per order, the buys then the sells of each book
+#   data     each side of each book as a JSON array of orders
+#   tickers  the returnTicker map, as JSON
+# Books are decoded with one JSON parse per side, and the index answers
+# questions about orders (e.g. which ones expired) without any parsing.
+MAGIC = b'EDSNAP\x00\x01'
+VERSION = 1
+HEADER = struct.Struct('<8sHHqdIIQQQQQQ')
+# token, then (first entry, count, data offset, data length) of the buys and the sells
+BOOK = struct.Struct('<20sIIQQIIQQ')
+# expires block of the order, -1 if unknown
+ENTRY = struct.Struct('<q')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _token(value):
+    raw = bytes.fromhex(value[2:] if value[:2] in ('0x', '0X') else value)
+    if len(raw) != 20:
+        raise ValueError('token addresses must be 20 bytes long')
+    return raw
+
+
+def _expires(order):
+    try:
+        return min(to_int(order['expires']), 2 ** 63 - 1)
+    except Exception:
+        return -1
+
+
+def write_snapshot(path, books, tickers=None, block_number=None):
+    """
+    Writes order books, tickers and a block number to a snapshot file
+
+    The file is written to a temporary file of its own next to `path` and
+    moved over it, so readers never see a partial snapshot and concurrent
+    writers never write the same file. Books of tokens that are not valid
+    addresses are left out.
+
+    :param path: snapshot file
+    :type path: str
+    :param books: orders of each token, {token_addr: {'buys': [...], 'sells': [...]}}
+    :type books: dict
+    :param tickers: returnTicker map
+    :type tickers: dict
+    :param block_number: last block seen, None if unknown
+    :type block_number: int
+    :return: number of orders written
+    :rtype: int
+    """
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    table = []
+    index = []
+    data = []
+    size = 0
+    for token_addr, orders in books.items():
+        try:
+            token = _token(token_addr)
+        except (TypeError, ValueError):
+            continue
+        runs = []
+        for side in ('buys', 'sells'):
+            side_orders = list((orders or {}).get(side) or ())
+            raw = encode(side_orders).encode('utf-8')
+            runs.extend((len(index), len(side_orders), size, len(raw)))
+            index.extend(ENTRY.pack(_expires(order)) for order in side_orders)
+            data.append(raw)
+            size += len(raw)
+        table.append(BOOK.pack(token, *runs))
+    ticker_data = encode(tickers or {}).encode('utf-8')
+
+    books_offset = HEADER.size
+    index_offset = books_offset + BOOK.size * len(table)
+    data_offset = index_offset + ENTRY.size * len(index)
+    tickers_offset = data_offset + size
+    header = HEADER.pack(MAGIC, VERSION, 0, -1 if block_number is None else block_number, time.time(),
+                         len(table), len(index), books_offset, index_offset, data_offset, size,
+                         tickers_offset, len(ticker_data))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(b''.join(table))
+            f.write(b''.join(index))
+            f.write(b''.join(data))
+            f.write(ticker_data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return len(index)
+
+
+class Snapshot(object):
+    """
+    Memory-mapped, read-only view of a snapshot file
+
+    Opening a snapshot only reads its header and book table. The orders of
+    a book are decoded when the book is asked for, straight from the page
+    cache, with orjson when it is installed.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: snapshot file
+        :type path: str
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(path + ' is empty')
+        try:
+            self._read_header()
+        except Exception:
+            self._map.close()
+            raise
+
+    def _read_header(self):
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(self.path + ' is not a snapshot')
+        (magic, version, _, block_number, self.created, book_count, self.order_count, books_offset,
+         self._index_offset, self._data_offset, _, tickers_offset, tickers_length) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(self.path + ' is not a version ' + str(VERSION) + ' snapshot')
+        if tickers_offset + tickers_length > len(self._map):
+            raise SnapshotError(self.path + ' is truncated')
+        # last block seen when the snapshot was written, None if unknown
+        self.block_number = None if block_number < 0 else block_number
+        self._tickers = (tickers_offset, tickers_length)
+        self._books = {}
+        for entry in BOOK.iter_unpack(self._map[books_offset:books_offset + BOOK.size * book_count]):
+            self._books['0x' + entry[0].hex()] = entry[1:]
+
+    def __len__(self):
+        return self.order_count
+
+    def __contains__(self, token_addr):
+        return token_addr.lower() in self._books
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    @property
+    def tokens(self):
+        """
+        Lowercase addresses of the tokens with a book in the snapshot
+        """
+        return list(self._books)
+
+    @property
+    def tickers(self):
+        """
+        The returnTicker map
+        """
+        offset, length = self._tickers
+        return loads(self._map[offset:offset + length])
+
+    def book(self, token_addr, block_number=None):
+        """
+        Returns the orders of a token
+
+        :param token_addr: token address
+        :type token_addr: str
+        :param block_number: drop the orders that expire at or before this block, None to keep them all
+        :type block_number: int
+        :return: orders, {'buys': [...], 'sells': [...]}, or None if the token has no book
+        :rtype: dict
+        """
+        runs = self._books.get(token_addr.lower())
+        if runs is None:
+            return None
+        return {'buys': self._orders(runs[0:4], block_number), 'sells': self._orders(runs[4:8], block_number)}
+
+    def books(self, block_number=None):
+        """
+        Returns the orders of every token, see book
+
+        :return: orders by token address
+        :rtype: dict
+        """
+        return dict((token_addr, self.book(token_addr, block_number)) for token_addr in self._books)
+
+    def _orders(self, run, block_number):
+        start, count, offset, length = run
+        offset += self._data_offset
+        orders = loads(self._map[offset:offset + length])
+        if block_number is None or not orders:
+            return orders
+        start = self._index_offset + start * ENTRY.size
+        entries = ENTRY.iter_unpack(self._map[start:start + count * ENTRY.size])
+        return [order for order, (expires,) in zip(orders, entries) if expires < 0 or expires > block_number]
@@ -0,0 +1,178 @@
+import threading
+from collections import deque
+from functools import partial
+
+# Events pushed by the EtherDelta WebSocket API
+EVENTS = ('orders', 'trades', 'funds')
+OVERFLOW_POLICIES = ('drop_oldest', 'block')
+
+
+def _matches(item, token_addr, user, token_keys, user_keys):
+    if token_addr is not None and token_addr not in [(item.get(k) or '').lower() for k in token_keys]:
+        return False
+    if user is not None and user not in [(item.get(k) or '').lower() for k in user_keys]:
+        return False
+    return True
+
+
+def filter_event(topic, payload, token_addr=None, user=None):
+    """
+    Returns the part of a pushed event that concerns a token and user,
+    or None if nothing does
+
+    :param topic: event topic, e.g. 'orders'
+    :type topic: str
+    :param payload: event payload
+    :type payload: object
+    :param token_addr: lowercase token address, None for every token
+    :type token_addr: str
+    :param user: lowercase account, None for every account
+    :type user: str
+    :return: filtered payload
+    :rtype: object
+    """
+    if token_addr is None and user is None:
+        return payload
+    if topic == 'orders':
+        payload = payload or {}
+        buys = [o for o in payload.get('buys') or [] if _matches(o, token_addr, user, ('tokenGet', 'tokenGive'), ('user',))]
+        sells = [o for o in payload.get('sells') or [] if _matches(o, token_addr, user, ('tokenGet', 'tokenGive'), ('user',))]
+        if not buys and not sells:
+            return None
+        return {'buys': buys, 'sells': sells}
+    if topic == 'trades':
+        trades = [t for t in payload or [] if _matches(t, token_addr, user, ('tokenAddr',), ('buyer', 'seller'))]
+        return trades or None
+    if topic == 'funds':
+        funds = [f for f in payload or [] if _matches(f, token_addr, user, ('tokenAddr',), ('user',))]
+        return funds or None
+    return payload
+
+
+class _BaseSubscription(object):
+
+    def __init__(self, session, token_addr=None, events=EVENTS, user=None, maxsize=1000, overflow='drop_oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of ' + ', '.join(OVERFLOW_POLICIES))
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.session = session
+        self.token_addr = token_addr.lower() if token_addr else None
+        self.user = user.lower() if user else None
+        self.events = tuple(events)
+        self.maxsize = maxsize
+        self.overflow = overflow
+        # number of events dropped by the drop_oldest policy
+        self.dropped = 0
+        self._buffer = deque()
+        self._closed = False
+        self._callbacks = {}
+        for topic in self.events:
+            callback = partial(self._on_event, topic)
+            self._callbacks[topic] = callback
+            session.add_listener(topic, callback)
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _unsubscribe(self):
+        for topic, callback in self._callbacks.items():
+            self.session.remove_listener(topic, callback)
+        self._callbacks = {}
+
+    def _filter(self, topic, payload):
+        return filter_event(topic, payload, self.token_addr, self.user)
+
+
+class Subscription(_BaseSubscription):
+    """
+    Iterator over the events the WebSocket API pushes on a session
+
+    Each event is a (topic, payload) tuple, where payload only holds the
+    orders, trades or funds of the subscribed token and user. Events are
+    buffered up to `maxsize`; when the buffer is full, the 'drop_oldest'
+    policy discards the oldest event (counted in `dropped`) and the 'block'
+    policy holds the session's receive thread until the consumer catches up,
+    which also delays replies to requests on the same session.
+
+    Iteration ends once the subscription is closed and the buffer drained.
+    """
+
+    def __init__(self, session, token_addr=None, events=EVENTS, user=None, maxsize=1000, overflow='drop_oldest'):
+        """
+        :param session: session the events arrive on
+        :type session: SocketSession
+        :param token_addr: token address, None for every token
+        :type token_addr: str
+        :param events: event topics
+        :type events: list
+        :param user: only events of this account, None for every account
+        :type user: str
+        :param maxsize: number of buffered events
+        :type maxsize: int
+        :param overflow: 'drop_oldest' or 'block'
+        :type overflow: str
+        """
+        self._cond = threading.Condition()
+        super().__init__(session, token_addr, events, user, maxsize, overflow)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        event = self.get()
+        if event is None:
+            raise StopIteration
+        return event
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, timeout=None):
+        """
+        Returns the next event
+
+        :param timeout: seconds to wait, forever if None
+        :type timeout: float
+        :return: (topic, payload), or None on timeout or once closed and drained
+        :rtype: tuple
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._buffer or self._closed, timeout):
+                return None
+            if not self._buffer:
+                return None
+            event = self._buffer.popleft()
+            self._cond.notify_all()
+            return event
+
+    def close(self):
+        """
+        Stops receiving events; buffered events can still be read
+        """
+        self._unsubscribe()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _on_event(self, topic, payload):
+        payload = self._filter(topic, payload)
+        if payload is None:
+            return
+        with self._cond:
+            if self.overflow == 'block':
+                self._cond.wait_for(lambda: len(self._buffer) < self.maxsize or self._closed)
+            elif len(self._buffer) >= self.maxsize:
+                self._buffer.popleft()
+                self.dropped += 1
+            if self._closed:
+                return
+            self._buffer.append((topic, payload))
+            self._cond.notify_all()
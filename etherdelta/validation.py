@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import string
+from itertools import repeat
+
+from .lazy import LazyImport
+from .order import Order, to_bytes32, to_int
+from .signing import order_hash
+
+# eth_keys (a web3 dependency) recovers signers, it is only imported when
+# the first signature is checked
+keys = LazyImport('eth_keys', 'keys')
+keccak = LazyImport('eth_utils', 'keccak')
+
+# Why an order is rejected
+EXPIRED = 'expired'
+BAD_HASH = 'hash'
+BAD_SIGNATURE = 'signature'
+MALFORMED = 'malformed'
+
+# Books smaller than this are checked in the calling process even when
+# processes are asked for
+PARALLEL_THRESHOLD = 500
+
+_HEX_DIGITS = frozenset(string.hexdigits)
+
+_SIGNED_MESSAGE_PREFIX = b'\x19Ethereum Signed Message:\n32'
+
+
+class InvalidOrder(ValueError):
+    """
+    An order failed local validation
+    """
+
+    def __init__(self, reason, order_id=None):
+        super().__init__('order ' + str(order_id) + ' is invalid: ' + reason)
+        self.reason = reason
+        self.order_id = order_id
+
+
+def recover_signer(hashhex, v, r, s):
+    """
+    Returns the account that signed an order hash the way sign_order does,
+    i.e. with the "Ethereum Signed Message" header
+
+    :param hashhex: order hash, as hex
+    :type hashhex: str
+    :param v: recovery id, 27 or 28
+    :type v: int
+    :param r: signature r
+    :type r: bytes
+    :param s: signature s
+    :type s: bytes
+    :return: lowercase account
+    :rtype: str
+    """
+    message = keccak(_SIGNED_MESSAGE_PREFIX + bytes.fromhex(hashhex))
+    signature = keys.Signature(vrs=(v - 27 if v >= 27 else v, int.from_bytes(r, 'big'), int.from_bytes(s, 'big')))
+    return signature.recover_public_key_from_msg_hash(message).to_address().lower()
+
+
+def order_row(order):
+    """
+    Returns the fields of an order that validation reads, as a tuple that
+    is cheap to send to a worker process
+
+    :param order: order from the API or an Order
+    :type order: dict or Order
+    :return: (id, tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s)
+    :rtype: tuple
+    """
+    if isinstance(order, Order):
+        return (order.id, order.tokenGet, order.amountGet, order.tokenGive, order.amountGive,
+                order.expires, order.nonce, order.user, order.v, order.r, order.s)
+    get = order.get
+    return (get('id'), get('tokenGet'), get('amountGet'), get('tokenGive'), get('amountGive'),
+            get('expires'), get('nonce'), get('user'), get('v'), get('r'), get('s'))
+
+
+def check_row(row, block_number, contract):
+    """
+    Validates one order_row, see check_orders
+
+    :return: reason the order is invalid, or None
+    :rtype: str
+    """
+    order_id, tokenGet, amountGet, tokenGive, amountGive, expires, nonce, user, v, r, s = row
+    try:
+        expires = to_int(expires)
+        if block_number is not None and expires <= block_number:
+            return EXPIRED
+        hashhex = order_hash(contract, tokenGet, to_int(amountGet), tokenGive, to_int(amountGive), expires, to_int(nonce))
+    # ArithmeticError covers decimal.InvalidOperation and the OverflowError of
+    # amounts that do not fit in a uint256
+    except (TypeError, ValueError, ArithmeticError):
+        return MALFORMED
+    # API order ids are the order hash followed by the side
+    if order_id:
+        prefix = str(order_id).split('_', 1)[0].lower()
+        if prefix[:2] == '0x':
+            prefix = prefix[2:]
+        if prefix and _HEX_DIGITS.issuperset(prefix) and prefix != hashhex:
+            return BAD_HASH
+    if v is None or r is None or s is None:
+        # orders placed on chain are not signed
+        return None
+    try:
+        signer = recover_signer(hashhex, int(v), to_bytes32(r), to_bytes32(s))
+    except ImportError:
+        raise
+    except Exception:
+        return BAD_SIGNATURE
+    if not user or signer != user.lower():
+        return BAD_SIGNATURE
+    return None
+
+
+def check_rows(rows, block_number, contract):
+    """
+    Validates a chunk of order rows
+
+    Module-level so it can run in a worker process.
+
+    :return: reason of each order, None for valid orders
+    :rtype: list
+    """
+    return [check_row(row, block_number, contract) for row in rows]
+
+
+def check_orders(orders, block_number, contract, workers=None, executor=None):
+    """
+    Validates orders locally, without any RPC
+
+    An order is rejected when it cannot be filled in the block after
+    `block_number` (EXPIRED), when its id does not match the hash of its
+    parameters (BAD_HASH), when its v/r/s signature was not made by its
+    `user` (BAD_SIGNATURE), or when its fields cannot be parsed (MALFORMED).
+    Orders without a signature may have been placed on chain and are not
+    rejected for it. Orders are checked in the calling process unless an
+    executor or several workers are given, and then only for books of
+    PARALLEL_THRESHOLD orders or more. Processes started for `workers` are
+    spawned rather than forked, which is not safe in a threaded program;
+    pass an executor to reuse them across calls.
+
+    :param orders: orders from the API or Order objects
+    :type orders: list
+    :param block_number: current block number, None to skip the expiry check
+    :type block_number: int
+    :param contract: EtherDelta contract address the orders were signed for
+    :type contract: str
+    :param workers: number of processes to start, defaults to the executor's size
+    :type workers: int
+    :param executor: process pool to use instead of starting one
+    :type executor: Executor
+    :return: reason of each order in input order, None for valid orders
+    :rtype: list
+    """
+    rows = [order_row(order) for order in orders]
+    if (executor is None and (workers or 1) <= 1) or len(rows) < PARALLEL_THRESHOLD:
+        return check_rows(rows, block_number, contract)
+    from concurrent.futures import ProcessPoolExecutor
+    if not workers:
+        workers = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+    size = max(1, -(-len(rows) // (workers * 4)))
+    chunks = [rows[i:i + size] for i in range(0, len(rows), size)]
+    if executor is not None:
+        results = executor.map(check_rows, chunks, repeat(block_number), repeat(contract))
+        return [reason for chunk in results for reason in chunk]
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        results = pool.map(check_rows, chunks, repeat(block_number), repeat(contract))
+        return [reason for chunk in results for reason in chunk]
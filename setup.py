@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from distutils.core import setup
+from setuptools import setup
 from codecs import open  # To use a consistent encoding
 from os import path
 
@@ -38,6 +38,11 @@ setup(
         'socketIO-client-2==0.7.5',
         'ethereum_utils==0.6.2',
         'eth_utils==1.0.0b1',
-        'websocket_client==0.46.0'
-    ]
+        'websocket_client==0.46.0',
+        'sortedcontainers==2.4.0'
+    ],
+    extras_require={
+        # AsyncClient and AsyncForkDeltaClient
+        'async': ['aiohttp', 'websockets']
+    }
 )
@@ -0,0 +1,57 @@
+import unittest
+
+import etherdelta
+from etherdelta.abi import encode_call
+
+TOKEN = '0x' + 'a' * 40
+ETH = '0x0000000000000000000000000000000000000000'
+
+
+def trade_kwargs(**fields):
+    kwargs = {'tokenGet': ETH, 'amountGet': 10, 'tokenGive': TOKEN, 'amountGive': 20, 'expires': 1000, 'nonce': 1,
+              'user': '0x' + 'B' * 40, 'v': 27, 'r': '0x' + '11' * 32, 's': '0x' + '22' * 32, 'amount': 5}
+    kwargs.update(fields)
+    return kwargs
+
+
+class EncodeCallTest(unittest.TestCase):
+
+    def test_static_arguments(self):
+        data = encode_call('etherdelta', 'trade', trade_kwargs())
+        self.assertEqual(data[:10], '0x0a19b14a')
+        words = [data[10 + i:10 + i + 64] for i in range(0, len(data) - 10, 64)]
+        self.assertEqual(len(words), 11)
+        self.assertEqual(words[1], '%064x' % 10)
+        self.assertEqual(words[2], ('a' * 40).rjust(64, '0'))
+        self.assertEqual(words[6], ('b' * 40).rjust(64, '0'))
+        self.assertEqual(words[8], '11' * 32)
+        self.assertEqual(words[10], '%064x' % 5)
+
+    def test_largest_uint(self):
+        data = encode_call('etherdelta', 'trade', trade_kwargs(amount=2 ** 256 - 1))
+        self.assertEqual(data[-64:], 'f' * 64)
+
+    def test_out_of_range_uints_are_rejected(self):
+        for fields in ({'amount': 2 ** 256}, {'amountGet': -1}, {'v': 256}, {'nonce': '1'}):
+            with self.assertRaises(ValueError):
+                encode_call('etherdelta', 'trade', trade_kwargs(**fields))
+
+    def test_malformed_addresses_are_rejected(self):
+        for address in ('0x' + 'a' * 39, '0x' + 'a' * 41, 'a' * 42, '0x' + 'g' * 40, None):
+            with self.assertRaises(ValueError):
+                encode_call('etherdelta', 'trade', trade_kwargs(user=address))
+
+    def test_long_bytes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            encode_call('etherdelta', 'trade', trade_kwargs(r='0x' + '11' * 33))
+
+    def test_bulk_errors_are_per_item(self):
+        datas = etherdelta.Client._transaction_data('trade', lambda kwargs: kwargs,
+                                                    [trade_kwargs(), trade_kwargs(amount=-5), trade_kwargs()])
+        self.assertIsInstance(datas[0], str)
+        self.assertIsInstance(datas[1], ValueError)
+        self.assertEqual(datas[2], datas[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
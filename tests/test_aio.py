@@ -0,0 +1,168 @@
+import asyncio
+import json
+import unittest
+
+from etherdelta import aio
+from etherdelta.aio import AsyncRPC, AsyncSocketSession
+from etherdelta.rpc import RPCError
+
+TOKEN = '0x' + 'a' * 40
+ETH = '0x0000000000000000000000000000000000000000'
+
+
+def sell(order_id, price, updated='2018-01-01T00:00:00.000Z', **fields):
+    order = {'id': order_id + '_sell', 'price': str(price), 'tokenGet': ETH, 'tokenGive': TOKEN, 'amountGet': '1',
+             'amountGive': '1', 'updated': updated}
+    order.update(fields)
+    return order
+
+
+class FakeAsyncRPC(AsyncRPC):
+    """
+    AsyncRPC answering every call with its id, and failing posts of 'eth_fail'
+    """
+
+    def __init__(self, chunk_size=100):
+        super().__init__('http://localhost:8545', chunk_size=chunk_size)
+        self.posts = []
+
+    async def _post(self, payload, method, calls):
+        self.posts.append(payload)
+        await asyncio.sleep(0)
+        if method == 'eth_fail':
+            raise IOError('connection reset')
+        if isinstance(payload, dict):
+            return {'jsonrpc': '2.0', 'id': payload['id'], 'result': hex(payload['id'])}
+        return [{'jsonrpc': '2.0', 'id': p['id'], 'result': hex(p['id'])} for p in reversed(payload)]
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncRPCTest(unittest.TestCase):
+
+    def test_call(self):
+        rpc = FakeAsyncRPC()
+        self.assertEqual(run(rpc.call('eth_blockNumber', [])), '0x1')
+
+    def test_batch_is_sent_in_chunks(self):
+        rpc = FakeAsyncRPC(chunk_size=100)
+        results = run(rpc.batch([('eth_blockNumber', [])] * 250))
+        self.assertEqual([len(payload) for payload in rpc.posts], [100, 100, 50])
+        ids = [p['id'] for payload in rpc.posts for p in payload]
+        self.assertEqual(results, [hex(i) for i in ids])
+
+    def test_failed_chunk_fails_only_its_calls(self):
+        rpc = FakeAsyncRPC(chunk_size=2)
+        results = run(rpc.batch([('eth_blockNumber', [])] * 2 + [('eth_fail', [])] * 2 + [('eth_gasPrice', [])]))
+        self.assertEqual(len(results), 5)
+        self.assertNotIsInstance(results[0], RPCError)
+        self.assertIsInstance(results[2], RPCError)
+        self.assertIsInstance(results[3], RPCError)
+        self.assertNotIsInstance(results[4], RPCError)
+
+    def test_empty_batch(self):
+        rpc = FakeAsyncRPC()
+        self.assertEqual(run(rpc.batch([])), [])
+        self.assertEqual(rpc.posts, [])
+
+
+class FakeAsyncSocket(object):
+    """
+    Socket answering every getMarket frame with the market in `markets`
+    """
+
+    def __init__(self, session, markets):
+        self.session = session
+        self.markets = markets
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+        token = json.loads(message[2:])[1]['token']
+        asyncio.ensure_future(self.session._dispatch('market', self.markets[token]))
+
+
+def connected_session(markets):
+    session = AsyncSocketSession('ws://localhost:0')
+    session._connected = asyncio.Event()
+    session._connected.set()
+    session.ws = FakeAsyncSocket(session, markets)
+    return session
+
+
+def market_frame(token_addr):
+    return '42["getMarket",' + json.dumps({'token': token_addr, 'user': ''}) + ']'
+
+
+class AsyncSocketSessionTest(unittest.TestCase):
+
+    def test_replies_reach_their_request(self):
+        token_b = '0x' + 'b' * 40
+        market_b = {'orders': {'buys': [], 'sells': [dict(sell('s1', 1), tokenGive=token_b)]}}
+        markets = {TOKEN: {'orders': {'buys': [], 'sells': [sell('s1', 1)]}}, token_b: market_b}
+
+        async def main():
+            session = connected_session(markets)
+            return await asyncio.gather(session.request(market_frame(TOKEN), 'market', 1, 1, TOKEN),
+                                        session.request(market_frame(token_b), 'market', 1, 1, token_b))
+
+        self.assertEqual(run(main()), [markets[TOKEN], market_b])
+
+    def test_listeners_get_pushed_frames(self):
+        pushed = []
+
+        async def main():
+            session = AsyncSocketSession('ws://localhost:0')
+            session.add_listener('orders', pushed.append)
+            await session._dispatch('orders', {'sells': []})
+            session.remove_listener('orders', pushed.append)
+            await session._dispatch('orders', {'sells': []})
+
+        run(main())
+        self.assertEqual(pushed, [{'sells': []}])
+
+
+@unittest.skipIf(aio.aiohttp is None, 'aiohttp and websockets are not installed')
+class AsyncClientTest(unittest.TestCase):
+
+    markets = {TOKEN: {'orders': {'buys': [], 'sells': [sell('s1', 0.003), sell('s2', 0.004)]}}}
+
+    def client(self):
+        client = aio.AsyncClient(rpc_url='http://localhost:8545')
+        client.session = connected_session(self.markets)
+        return client
+
+    def test_rpc_is_async(self):
+        self.assertIsInstance(aio.AsyncClient(rpc_url='http://localhost:8545').rpc, AsyncRPC)
+        with self.assertRaises(ValueError):
+            aio.AsyncClient(rpc_url=['http://localhost:8545', 'http://localhost:8546'])
+
+    def test_get_orderbook(self):
+        async def main():
+            client = self.client()
+            return await client.get_orderbook(TOKEN), client.session.ws.sent
+
+        orderbook, sent = run(main())
+        self.assertEqual(orderbook, self.markets[TOKEN]['orders'])
+        self.assertEqual(sent, [market_frame(TOKEN)])
+
+    def test_local_orderbook(self):
+        async def main():
+            client = self.client()
+            book = await client.get_local_orderbook(TOKEN)
+            await client.session._dispatch('orders', {'buys': [], 'sells': [sell('s1', 0.003, deleted=True,
+                                                                                 updated='2018-01-02T00:00:00.000Z')]})
+            return book
+
+        book = run(main())
+        self.assertEqual([o['id'] for o in book.asks()], ['s2_sell'])
+
+
+if __name__ == '__main__':
+    unittest.main()
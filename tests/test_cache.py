@@ -0,0 +1,47 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from etherdelta.cache import TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_concurrent_misses_share_one_fetch(self):
+        cache = TTLCache(60)
+        calls = []
+        lock = threading.Lock()
+
+        def fetch():
+            with lock:
+                calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda _: cache.get('key', fetch), range(8)))
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache._key_locks, {})
+
+    def test_key_locks_do_not_grow(self):
+        cache = TTLCache(0)
+        for i in range(1000):
+            cache.get(i, lambda: 'value')
+        self.assertEqual(cache._key_locks, {})
+
+    def test_failed_fetch_releases_key_lock(self):
+        cache = TTLCache(60)
+
+        def fetch():
+            raise IOError('down')
+
+        with self.assertRaises(IOError):
+            cache.get('key', fetch)
+        self.assertEqual(cache._key_locks, {})
+        self.assertEqual(cache.get('key', lambda: 'value'), 'value')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from etherdelta import addressEtherDelta
+from etherdelta.history import EventIngester, _is_range_error
+from etherdelta.rpc import RPCError
+
+
+class FakeRPC(object):
+    """
+    Node failing eth_getLogs with `errors` in turn, then answering with one
+    log per call
+    """
+
+    def __init__(self, errors=(), max_blocks=None):
+        self.errors = list(errors)
+        self.max_blocks = max_blocks
+        self.ranges = []
+
+    def call(self, method, params):
+        start, end = int(params[0]['fromBlock'], 16), int(params[0]['toBlock'], 16)
+        self.ranges.append((start, end))
+        if self.max_blocks is not None and end - start + 1 > self.max_blocks:
+            raise RPCError({'code': -32005, 'message': 'query returned more than 10000 results'})
+        if self.errors:
+            raise self.errors.pop(0)
+        return [(start, end)]
+
+
+def ingester(rpc, chunk_size=100):
+    return EventIngester(rpc, None, addressEtherDelta, chunk_size=chunk_size, max_tries=3, retry_delay=0)
+
+
+class RangeErrorTest(unittest.TestCase):
+
+    def test_range_errors(self):
+        for message in ('query returned more than 10000 results', 'block range is too wide',
+                        'exceed maximum block range: 5000', 'Log response size exceeded.',
+                        'eth_getLogs is limited to a 10,000 range', 'query exceeds max results 20000'):
+            self.assertTrue(_is_range_error(RPCError({'code': -32000, 'message': message})), message)
+
+    def test_other_errors(self):
+        for code, message in ((-32005, 'daily request count exceeded, request rate limited'),
+                              (-32005, 'project ID request rate exceeded'), (429, 'Too Many Requests'),
+                              (-32000, 'request timed out'), (-32603, 'internal error')):
+            self.assertFalse(_is_range_error(RPCError({'code': code, 'message': message})), message)
+
+
+class FetchTest(unittest.TestCase):
+
+    def test_large_range_is_split(self):
+        rpc = FakeRPC(max_blocks=25)
+        events = ingester(rpc)
+        self.assertEqual(events._fetch(0, 99), [(0, 24), (25, 49), (50, 74), (75, 99)])
+        self.assertEqual(events.chunk_size, 25)
+
+    def test_rate_limit_is_retried_without_splitting(self):
+        rpc = FakeRPC([RPCError({'code': -32005, 'message': 'request rate limited'}), IOError('reset')])
+        events = ingester(rpc)
+        self.assertEqual(events._fetch(0, 99), [(0, 99)])
+        self.assertEqual(rpc.ranges, [(0, 99)] * 3)
+        self.assertEqual(events.chunk_size, 100)
+
+    def test_persistent_error_is_raised(self):
+        rpc = FakeRPC([RPCError({'code': -32005, 'message': 'request rate limited'})] * 3)
+        with self.assertRaises(RPCError):
+            ingester(rpc)._fetch(0, 99)
+        self.assertEqual(len(rpc.ranges), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
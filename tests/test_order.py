@@ -0,0 +1,87 @@
+import unittest
+from decimal import Decimal
+
+from etherdelta.abi import input_names
+from etherdelta.order import Order, to_decimal, to_int
+
+try:
+    import web3
+except ImportError:
+    web3 = None
+
+# an order as the API returns it, with amounts in exponent notation
+ORDER = {
+    'id': 'b66abf9a645756ef32aff132d6dde19ad7d7b2c5c026475c60140da266186a01_sell',
+    'tokenGet': '0x0000000000000000000000000000000000000000',
+    'amountGet': '1030810041614844700',
+    'tokenGive': '0x0d8775f648430679a709e98d2b0cb6250d2887ef',
+    'amountGive': '2.157237477167669064104e+21',
+    'expires': '5018717',
+    'nonce': '26698014251852476',
+    'user': '0x955051f2cf3ba245ae8ee9057458836eae3b1fec',
+    'v': 28,
+    'r': '0xe3129e0ec2110063d16d84ac4770f402555614d077b6cfd1ba9d701839f0691d',
+    's': '0x38a06acd697cb5cf91f9c8d19389904331b1014a0713a11f775f632d7e7e4dc3',
+    'price': '0.000477838',
+    'availableVolume': '2.15723747716766907792023752118211285330018e+21',
+    'ethAvailableVolume': '2157.237477167669',
+}
+
+
+class ToIntTest(unittest.TestCase):
+
+    def test_large_amounts_are_exact(self):
+        self.assertEqual(to_int('1030810041614844700'), 1030810041614844700)
+        self.assertEqual(to_int(str(2 ** 256 - 1)), 2 ** 256 - 1)
+        # a float would round this to 6755671999999999000000
+        self.assertEqual(to_int('6.755671999999999213568e+21'), 6755671999999999213568)
+
+    def test_exponent_notation(self):
+        self.assertEqual(to_int('2.157237477167669064104e+21'), 2157237477167669064104)
+        self.assertEqual(to_int('1E+2'), 100)
+        self.assertEqual(to_int('1.5e3'), 1500)
+        self.assertEqual(to_int(12), 12)
+
+    def test_to_decimal_is_exact(self):
+        self.assertEqual(to_decimal('0.000477838'), Decimal('0.000477838'))
+        self.assertEqual(to_decimal(0.1), Decimal('0.1'))
+        self.assertIsNone(to_decimal(None))
+
+
+class ArgsTest(unittest.TestCase):
+
+    def test_args_follow_the_contract_signature(self):
+        names = input_names('etherdelta', 'availableVolume')
+        self.assertEqual(names, ('tokenGet', 'amountGet', 'tokenGive', 'amountGive', 'expires', 'nonce', 'user',
+                                 'v', 'r', 's'))
+        self.assertEqual(names, input_names('etherdelta', 'amountFilled'))
+        order = Order(**dict((name, name) for name in names))
+        self.assertEqual(order.args(), list(names))
+        self.assertEqual(list(order.trade_kwargs('amount')), list(input_names('etherdelta', 'trade')))
+        self.assertEqual(set(order.cancel_kwargs()), set(input_names('etherdelta', 'cancelOrder')))
+
+
+@unittest.skipIf(web3 is None, 'web3 is not installed')
+class FromDictTest(unittest.TestCase):
+
+    def test_amounts_are_exact(self):
+        order = Order.from_dict(ORDER)
+        self.assertEqual(order.amountGet, 1030810041614844700)
+        self.assertEqual(order.amountGive, 2157237477167669064104)
+        self.assertEqual(order.availableVolume, 2157237477167669077920)
+        self.assertEqual(order.price, Decimal('0.000477838'))
+        self.assertEqual(order.ethAvailableVolume, Decimal('2157.237477167669'))
+
+    def test_args(self):
+        order = Order.from_dict(ORDER)
+        self.assertEqual(order.args(), [
+            '0x0000000000000000000000000000000000000000', 1030810041614844700,
+            '0x0D8775F648430679A709E98d2b0Cb6250d2887EF', 2157237477167669064104, 5018717, 26698014251852476,
+            '0x955051F2cF3bA245ae8Ee9057458836eAe3b1FeC', 28, bytes.fromhex(ORDER['r'][2:]),
+            bytes.fromhex(ORDER['s'][2:])])
+        self.assertFalse(order.is_buy)
+        self.assertIs(Order.parse(order), order)
+
+
+if __name__ == '__main__':
+    unittest.main()
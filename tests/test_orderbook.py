@@ -0,0 +1,160 @@
+import threading
+import time
+import unittest
+
+from etherdelta.orderbook import LocalOrderBook
+from etherdelta.session import SocketSession
+
+TOKEN = '0x' + 'a' * 40
+ETH = '0x0000000000000000000000000000000000000000'
+
+
+def order(order_id, price, side='sell', updated='2018-01-01T00:00:00.000Z', **fields):
+    token_get, token_give = (TOKEN, ETH) if side == 'buy' else (ETH, TOKEN)
+    result = {'id': order_id + '_' + side, 'price': str(price), 'tokenGet': token_get, 'tokenGive': token_give,
+              'updated': updated}
+    result.update(fields)
+    return result
+
+
+class FakeClient(object):
+    """
+    Client whose snapshot is taken before the pushes sent while it is fetched
+    """
+
+    def __init__(self, session, orders, pushes=()):
+        self.session = session
+        self.orders = orders
+        self.pushes = pushes
+
+    def get_session(self):
+        return self.session
+
+    def get_orderbook(self, token_addr):
+        for pushed in self.pushes:
+            self.session._dispatch('orders', pushed)
+        return self.orders
+
+
+class BookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.book = LocalOrderBook(TOKEN)
+        self.book.load_snapshot({'buys': [order('b1', 0.001, side='buy'), order('b2', 0.002, side='buy')],
+                                 'sells': [order('s1', 0.004), order('s2', 0.003)]})
+
+    def test_sides_are_sorted(self):
+        self.assertEqual([o['id'] for o in self.book.bids()], ['b2_buy', 'b1_buy'])
+        self.assertEqual([o['id'] for o in self.book.asks()], ['s2_sell', 's1_sell'])
+        self.assertEqual(self.book.best_bid()['id'], 'b2_buy')
+        self.assertEqual(self.book.best_ask()['id'], 's2_sell')
+
+    def test_spread(self):
+        self.assertAlmostEqual(self.book.spread(), 0.001)
+        self.book.apply_orders({'buys': [order('b3', 0.0035, side='buy')], 'sells': []})
+        self.assertAlmostEqual(self.book.spread(), -0.0005)
+        self.assertIsNone(LocalOrderBook(TOKEN).spread())
+
+    def test_older_updates_are_ignored(self):
+        newer = order('s2', 0.003, updated='2018-01-03T00:00:00.000Z', availableVolume='5')
+        self.book.apply_orders({'buys': [], 'sells': [newer]})
+        self.book.apply_orders({'buys': [], 'sells': [order('s2', 0.003, updated='2018-01-02T00:00:00.000Z',
+                                                           deleted=True)]})
+        self.assertIs(self.book.get('s2_sell'), newer)
+        self.book.apply_orders({'buys': [], 'sells': [order('s2', 0.003, updated='2018-01-04T00:00:00.000Z',
+                                                           availableVolume='0')]})
+        self.assertIsNone(self.book.get('s2_sell'))
+
+    def test_orders_of_other_tokens_are_ignored(self):
+        other = order('x1', 0.001)
+        other['tokenGive'] = '0x' + 'b' * 40
+        self.book.apply_orders({'buys': [], 'sells': [other]})
+        self.assertNotIn('x1_sell', self.book)
+
+
+class SeedTest(unittest.TestCase):
+
+    def test_pushes_before_the_snapshot_are_replayed(self):
+        session = SocketSession('ws://localhost:0')
+        pushes = [{'buys': [], 'sells': [order('s2', 0.004)]},
+                  {'buys': [], 'sells': [order('s1', 0.003, updated='2018-01-02T00:00:00.000Z', deleted=True)]}]
+        book = LocalOrderBook(TOKEN)
+        book.attach(FakeClient(session, {'buys': [], 'sells': [order('s1', 0.003)]}, pushes))
+        self.assertIsNone(book._pending)
+        self.assertEqual([o['id'] for o in book.asks()], ['s2_sell'])
+
+
+class ReconcileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.session = SocketSession('ws://localhost:0')
+        self.book = LocalOrderBook(TOKEN)
+        self.book.attach(FakeClient(self.session, {'buys': [], 'sells': [order('s1', 0.003)]}))
+
+    def test_pushes_during_fetch_are_replayed(self):
+        fresh = {'buys': [order('b1', 0.001, side='buy')], 'sells': [order('s1', 0.003)]}
+        pushes = [{'buys': [], 'sells': [order('s2', 0.004)]},
+                  {'buys': [], 'sells': [order('s1', 0.003, updated='2018-01-02T00:00:00.000Z', deleted=True)]}]
+        self.book.reconcile(FakeClient(self.session, fresh, pushes))
+        self.assertEqual([o['id'] for o in self.book.asks()], ['s2_sell'])
+        self.assertEqual([o['id'] for o in self.book.bids()], ['b1_buy'])
+        # pushes after the reconcile are applied once, not buffered
+        self.assertIsNone(self.book._replay)
+        self.session._dispatch('orders', {'buys': [order('b1', 0.001, side='buy', deleted=True)], 'sells': []})
+        self.assertEqual(self.book.bids(), [])
+
+    def test_failed_fetch_keeps_the_book(self):
+        pushes = [{'buys': [], 'sells': [order('s2', 0.004)]}]
+
+        class FailingClient(FakeClient):
+            def get_orderbook(self, token_addr):
+                FakeClient.get_orderbook(self, token_addr)
+                raise IOError('no reply')
+
+        with self.assertRaises(IOError):
+            self.book.reconcile(FailingClient(self.session, None, pushes))
+        self.assertIsNone(self.book._replay)
+        self.assertEqual([o['id'] for o in self.book.asks()], ['s1_sell', 's2_sell'])
+
+
+class ReconnectTest(unittest.TestCase):
+
+    def test_attached_book_is_reconciled_on_reconnect(self):
+        session = SocketSession('ws://localhost:0')
+        book = LocalOrderBook(TOKEN)
+        fetched = threading.Event()
+
+        class Client(FakeClient):
+            def get_orderbook(self, token_addr):
+                fetched.set()
+                return FakeClient.get_orderbook(self, token_addr)
+
+        client = Client(session, {'buys': [], 'sells': [order('s1', 0.003)]})
+        book.attach(client)
+        fetched.clear()
+        client.orders = {'buys': [], 'sells': [order('s2', 0.004)]}
+        ws = FakeSocket()
+        # the first connection does not reconcile, the next ones do
+        session._on_message(ws, '0{"pingInterval": 25000}')
+        self.assertFalse(fetched.wait(0.1))
+        session._on_message(ws, '0{"pingInterval": 25000}')
+        self.assertTrue(fetched.wait(2))
+        deadline = time.monotonic() + 2
+        while book._replay is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([o['id'] for o in book.asks()], ['s2_sell'])
+        book.detach()
+        self.assertEqual(session._reconnect_listeners, [])
+
+
+class FakeSocket(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+if __name__ == '__main__':
+    unittest.main()
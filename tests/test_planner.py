@@ -0,0 +1,87 @@
+import unittest
+from decimal import Decimal
+
+from etherdelta.planner import WEI, eligible_orders, plan_fills
+
+TOKEN = '0x' + '1' * 40
+ETH = '0x0000000000000000000000000000000000000000'
+MAKER = '0x' + '2' * 40
+
+
+def sell(order_id, eth, price, expires=1000, user=MAKER, **fields):
+    """
+    Sell order of `eth` ETH worth of tokens at `price` ETH per token
+    """
+    order = {'id': order_id, 'tokenGet': ETH, 'amountGet': str(int(Decimal(eth) * WEI)), 'tokenGive': TOKEN,
+             'amountGive': str(int(Decimal(eth) / Decimal(price) * WEI)), 'expires': str(expires), 'user': user}
+    order.update(fields)
+    return order
+
+
+def buy(order_id, tokens, price, expires=1000, user=MAKER):
+    """
+    Buy order of `tokens` tokens at `price` ETH per token
+    """
+    return {'id': order_id, 'tokenGet': TOKEN, 'amountGet': str(int(Decimal(tokens) * WEI)), 'tokenGive': ETH,
+            'amountGive': str(int(Decimal(tokens) * Decimal(price) * WEI)), 'expires': str(expires), 'user': user}
+
+
+class PlanFillsTest(unittest.TestCase):
+
+    def test_best_prices_first_with_partial_fill(self):
+        asks = [sell('a', 1, '0.001'), sell('b', 2, '0.002'), sell('c', 5, '0.003')]
+        plan = plan_fills(asks, 'buy', 2.5)
+        self.assertEqual([fill.order['id'] for fill in plan], ['a', 'b'])
+        self.assertEqual([fill.eth_amount for fill in plan], [1, Decimal('1.5')])
+        self.assertEqual(plan.fills[1].amount, int(1.5 * WEI))
+        self.assertEqual(plan.fills[1].tokens, 750 * WEI)
+        self.assertTrue(plan.complete)
+        self.assertEqual(plan.shortfall, 0)
+
+    def test_selling_into_bids(self):
+        bids = [buy('a', 100, '0.002'), buy('b', 1000, '0.001')]
+        plan = plan_fills(bids, 'sell', '0.3')
+        self.assertEqual([fill.order['id'] for fill in plan], ['a', 'b'])
+        # the trade amount is the tokens sold
+        self.assertEqual([fill.amount for fill in plan], [100 * WEI, 100 * WEI])
+        self.assertEqual(plan.eth, int(Decimal('0.3') * WEI))
+        self.assertEqual(plan.average_price, Decimal('0.0015'))
+
+    def test_target_larger_than_book(self):
+        plan = plan_fills([sell('a', 1, '0.001'), sell('b', 2, '0.002')], 'buy', 5)
+        self.assertEqual(len(plan), 2)
+        self.assertFalse(plan.complete)
+        self.assertEqual(plan.shortfall, 2)
+
+    def test_skipped_orders(self):
+        asks = [
+            sell('expired', 1, '0.001', expires=100),
+            sell('own', 1, '0.001', user='0x' + '3' * 40),
+            sell('empty', 1, '0.001', availableVolumeBase='0'),
+            sell('malformed', 1, '0.001', amountGet='lots'),
+            sell(None, 1, '0.001'),
+            buy('bid', 1, '0.001'),
+            sell('ok', 1, '0.002'),
+        ]
+        plan = plan_fills(asks, 'buy', 1, user='0x' + '3' * 40, block_number=100)
+        self.assertEqual([fill.order['id'] for fill in plan], ['ok'])
+        self.assertEqual([o['id'] for o in eligible_orders(asks, 'buy', '0x' + '3' * 40, 100)], ['empty', 'ok'])
+
+    def test_confirmed_volumes_override_the_book(self):
+        asks = [sell('a', 1, '0.001', availableVolumeBase=str(WEI)), sell('b', 1, '0.001')]
+        plan = plan_fills(asks, 'buy', 1, volumes={'a': WEI // 4})
+        self.assertEqual([(fill.order['id'], fill.eth, fill.confirmed) for fill in plan],
+                         [('a', WEI // 4, True), ('b', 3 * WEI // 4, False)])
+
+    def test_min_fill(self):
+        asks = [sell('a', '0.001', '0.001'), sell('b', 1, '0.002')]
+        plan = plan_fills(asks, 'buy', 1, min_fill='0.01')
+        self.assertEqual([fill.order['id'] for fill in plan], ['b'])
+
+    def test_side_is_checked(self):
+        with self.assertRaises(ValueError):
+            plan_fills([], 'hold', 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
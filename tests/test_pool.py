@@ -0,0 +1,51 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from etherdelta.pool import EndpointPool
+
+
+class HedgeTest(unittest.TestCase):
+
+    def test_many_concurrent_calls_are_not_hedged_early(self):
+        pool = EndpointPool(['primary', 'secondary'], hedge_delay=0.2)
+        pool.stats[1].failed_at = time.monotonic()
+        called = []
+        lock = threading.Lock()
+
+        def fn(endpoint):
+            with lock:
+                called.append(endpoint)
+            time.sleep(0.05)
+            return endpoint
+
+        with ThreadPoolExecutor(40) as callers:
+            results = list(callers.map(lambda _: pool.call(fn), range(40)))
+        self.assertEqual(results, ['primary'] * 40)
+        self.assertNotIn('secondary', called)
+
+    def test_slow_call_is_hedged(self):
+        pool = EndpointPool(['slow', 'fast'], hedge_delay=0.05)
+        pool.stats[1].failed_at = time.monotonic()
+
+        def fn(endpoint):
+            time.sleep(1 if endpoint == 'slow' else 0)
+            return endpoint
+
+        self.assertEqual(pool.call(fn), 'fast')
+
+    def test_failure_fails_over(self):
+        pool = EndpointPool(['broken', 'working'], hedge_delay=10)
+        pool.stats[1].failed_at = time.monotonic()
+
+        def fn(endpoint):
+            if endpoint == 'broken':
+                raise IOError('down')
+            return endpoint
+
+        self.assertEqual(pool.call(fn), 'working')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import shutil
+import tempfile
+import unittest
+
+import etherdelta
+from etherdelta.rpc import ProviderJSONRPC, RPCError
+
+
+class FakeProvider(object):
+    """
+    Provider without an HTTP endpoint, e.g. IPC
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    def make_request(self, method, params):
+        self.requests.append((method, params))
+        if method == 'eth_fail':
+            return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32000, 'message': 'failed'}}
+        if method == 'eth_getLogs':
+            return {'jsonrpc': '2.0', 'id': 1, 'result': []}
+        if method == 'eth_getBlockByNumber':
+            return {'jsonrpc': '2.0', 'id': 1, 'result': {'number': '0x10', 'hash': '0x1', 'timestamp': '0x5'}}
+        return {'jsonrpc': '2.0', 'id': 1, 'result': hex(len(self.requests))}
+
+
+class ProviderJSONRPCTest(unittest.TestCase):
+
+    def test_call_goes_through_provider(self):
+        provider = FakeProvider()
+        rpc = ProviderJSONRPC(provider)
+        self.assertEqual(rpc.call('eth_blockNumber', []), '0x1')
+        self.assertEqual(provider.requests, [('eth_blockNumber', [])])
+
+    def test_batch_without_endpoint_goes_through_provider(self):
+        provider = FakeProvider()
+        results = ProviderJSONRPC(provider).batch([('eth_blockNumber', []), ('eth_fail', []), ('eth_gasPrice', [])])
+        self.assertEqual(results[0], '0x1')
+        self.assertIsInstance(results[1], RPCError)
+        self.assertEqual(results[2], '0x3')
+        self.assertEqual(len(provider.requests), 3)
+
+
+class ClientProviderTest(unittest.TestCase):
+
+    def test_provider_without_endpoint_is_used_for_reads(self):
+        provider = FakeProvider()
+        client = etherdelta.Client(provider=provider)
+        self.assertIsInstance(client.rpc, ProviderJSONRPC)
+        self.assertIsNone(client.rpc.endpoint_uri)
+        client.rpc.call('eth_blockNumber', [])
+        self.assertEqual(provider.requests, [('eth_blockNumber', [])])
+
+    def test_block_number_is_read_through_provider(self):
+        provider = FakeProvider()
+        client = etherdelta.Client(provider=provider)
+        self.assertEqual(client.get_block_number(), 16)
+        self.assertEqual(client.get_block_number(), 16)
+        self.assertFalse(client.get_chain_head().running)
+        # without a running chain head, each call asks the node
+        self.assertEqual([method for method, _ in provider.requests].count('eth_getBlockByNumber'), 2)
+
+    def test_validation_reads_block_number_once_per_interval(self):
+        provider = FakeProvider()
+        client = etherdelta.Client(provider=provider)
+        client.validate_orders([])
+        client.validate_orders([])
+        self.assertEqual([method for method, _ in provider.requests].count('eth_getBlockByNumber'), 1)
+        client.get_chain_head().updated -= client.get_chain_head().interval
+        client.validate_orders([])
+        self.assertEqual([method for method, _ in provider.requests].count('eth_getBlockByNumber'), 2)
+
+    def test_events_are_ingested_through_provider(self):
+        provider = FakeProvider()
+        client = etherdelta.Client(provider=provider)
+        path = tempfile.mkdtemp()
+        try:
+            self.assertEqual(client.ingest_events(path, 0, 10), 0)
+        finally:
+            shutil.rmtree(path)
+        self.assertIn('eth_getLogs', [method for method, _ in provider.requests])
+
+    def test_rpc_url_overrides_provider(self):
+        client = etherdelta.Client(rpc_url='http://localhost:8545', provider=FakeProvider())
+        self.assertNotIsInstance(client.rpc, ProviderJSONRPC)
+        self.assertEqual(client.rpc.endpoint_uri, 'http://localhost:8545')
+
+
+if __name__ == '__main__':
+    unittest.main()
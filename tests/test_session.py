@@ -0,0 +1,109 @@
+import threading
+import time
+import unittest
+from collections import deque
+
+from etherdelta.session import SocketSession, _Waiter, pick_waiter
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+TOKEN_C = '0x' + 'c' * 40
+ETH = '0x0000000000000000000000000000000000000000'
+
+
+def market(token_addr):
+    order = {'tokenGet': ETH, 'tokenGive': token_addr, 'amountGet': '1', 'amountGive': '1'}
+    return {'orders': {'buys': [], 'sells': [order]}, 'returnTicker': {}}
+
+
+EMPTY_MARKET = {'orders': {'buys': [], 'sells': []}, 'returnTicker': {}}
+
+
+class PickWaiterTest(unittest.TestCase):
+
+    def waiters(self, *keys):
+        return deque(_Waiter('', 'market', key) for key in keys)
+
+    def test_keyed_reply_goes_to_its_waiter(self):
+        waiters = self.waiters(TOKEN_A, TOKEN_B)
+        self.assertIs(pick_waiter(waiters, TOKEN_B), waiters[1])
+
+    def test_keyed_reply_never_goes_to_another_key(self):
+        self.assertIsNone(pick_waiter(self.waiters(TOKEN_A, TOKEN_B), TOKEN_C))
+
+    def test_keyed_reply_goes_to_waiter_expecting_any_reply(self):
+        waiters = self.waiters(TOKEN_A, None)
+        self.assertIs(pick_waiter(waiters, TOKEN_C), waiters[1])
+
+    def test_keyless_reply_is_not_guessed(self):
+        self.assertIsNone(pick_waiter(self.waiters(TOKEN_B, TOKEN_A), None))
+
+    def test_keyless_reply_goes_to_only_waiter(self):
+        waiters = self.waiters(TOKEN_A)
+        self.assertIs(pick_waiter(waiters, None), waiters[0])
+
+
+class DispatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.session = SocketSession('ws://localhost:0')
+
+    def add_waiters(self, *keys):
+        waiters = [_Waiter('', 'market', key) for key in keys]
+        self.session._waiters['market'] = deque(waiters)
+        return waiters
+
+    def test_reply_for_unrequested_token(self):
+        a, b = self.add_waiters(TOKEN_A, TOKEN_B)
+        self.session._dispatch('market', market(TOKEN_C))
+        self.assertFalse(a.event.is_set())
+        self.assertFalse(b.event.is_set())
+        self.session._dispatch('market', market(TOKEN_A))
+        self.session._dispatch('market', market(TOKEN_B))
+        self.assertEqual(a.payload, market(TOKEN_A))
+        self.assertEqual(b.payload, market(TOKEN_B))
+
+    def test_empty_reply_before_keyed_reply(self):
+        # A's market is empty and arrives first, while B is the oldest waiter
+        b, a = self.add_waiters(TOKEN_B, TOKEN_A)
+        self.session._dispatch('market', EMPTY_MARKET)
+        self.assertFalse(a.event.is_set())
+        self.assertFalse(b.event.is_set())
+        self.session._dispatch('market', market(TOKEN_B))
+        self.assertEqual(b.payload, market(TOKEN_B))
+        self.assertFalse(a.event.is_set())
+        # once A is the only waiter, the empty reply can only be its own
+        self.session._dispatch('market', EMPTY_MARKET)
+        self.assertIs(a.payload, EMPTY_MARKET)
+
+    def test_keyed_retry_is_sent_alone(self):
+        session = self.session
+        session._connected.set()
+        session.ws = FakeSocket(session)
+        b, = self.add_waiters(TOKEN_B)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            session.request('getMarket A', 'market', 1, 1, TOKEN_A, exclusive=True)))
+        thread.start()
+        time.sleep(0.05)
+        # A waits until B is answered before it is sent
+        self.assertEqual(session.ws.sent, [])
+        session._dispatch('market', market(TOKEN_B))
+        thread.join(2)
+        self.assertEqual(session.ws.sent, ['getMarket A'])
+        self.assertEqual(results, [EMPTY_MARKET])
+
+
+class FakeSocket(object):
+
+    def __init__(self, session):
+        self.session = session
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+        self.session._dispatch('market', EMPTY_MARKET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import hashlib
+import random
+import unittest
+from unittest import mock
+
+import etherdelta
+from etherdelta import addressEtherDelta
+from etherdelta.signing import ORDER_TYPES, order_hash, order_hashes, solidity_sha256
+
+try:
+    import web3
+except ImportError:
+    web3 = None
+
+
+def hex_round_trip(values):
+    # what solidity_sha256 does for ORDER_TYPES: each value as hex, addresses
+    # without their 0x prefix and padded to 40 digits, then back to bytes
+    parts = []
+    for abi_type, value in zip(ORDER_TYPES, values):
+        if abi_type == 'address':
+            digits = value[2:] if value[:2] in ('0x', '0X') else value
+            parts.append(digits.lower().rjust(40, '0'))
+        else:
+            parts.append('%064x' % value)
+    return hashlib.sha256(bytes.fromhex(''.join(parts))).hexdigest()
+
+
+def orders():
+    rng = random.Random(1)
+    token = '0x' + '%040x' % rng.getrandbits(160)
+    values = [[addressEtherDelta, token, rng.getrandbits(72), '0x' + '0' * 40, rng.getrandbits(64),
+               rng.randint(5000000, 6000000), rng.randint(0, 10000000000)] for _ in range(50)]
+    # the hex round trip normalised these addresses
+    values += [
+        [addressEtherDelta, '0x0', 1, '0x' + '0' * 40, 2, 3, 4],
+        [addressEtherDelta, '0x123', 1, '0x00', 2, 3, 4],
+        [addressEtherDelta, '0x00' + 'ab' * 19, 1, '0x' + '0' * 39 + '1', 2, 3, 4],
+        [addressEtherDelta, '0xAB' + 'cd' * 19, 1, 'ab' * 20, 2, 3, 0],
+        [addressEtherDelta.upper().replace('0X', '0x'), 'f' * 39, 0, '0x1', 0, 0, 0],
+    ]
+    return values
+
+
+class OrderHashTest(unittest.TestCase):
+
+    def test_matches_hex_round_trip(self):
+        for values in orders():
+            self.assertEqual(order_hash(*values), hex_round_trip(values), values)
+
+    def test_order_hashes_matches_order_hash(self):
+        values = orders()
+        self.assertEqual(order_hashes(values), [order_hash(*v) for v in values])
+
+    def test_long_address_is_rejected(self):
+        with self.assertRaises(ValueError):
+            order_hash(addressEtherDelta, '0x' + '1' * 42, 1, '0x' + '0' * 40, 2, 3, 4)
+
+    @unittest.skipIf(web3 is None, 'web3 is not installed')
+    def test_matches_solidity_sha256(self):
+        for values in orders():
+            self.assertEqual(order_hash(*values), solidity_sha256(ORDER_TYPES, values), values)
+
+
+PRIVATE_KEY = '4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318'
+TOKEN = '0x0d8775f648430679a709e98d2b0cb6250d2887ef'
+
+
+@unittest.skipIf(web3 is None, 'web3 is not installed')
+class CreateOrdersTest(unittest.TestCase):
+
+    specs = [('buy', 0.0001, 10, TOKEN, 5000000), ('sell', 0.0002, 25, TOKEN, 5000100), ('sell', 0.0003, 1, TOKEN, 5000200)]
+
+    def expected(self, client, seed):
+        # create_orders draws the nonces of the orders in turn from Random(seed)
+        rng = random.Random(seed)
+        orders = []
+        for side, price, amount, token_addr, expires in self.specs:
+            with mock.patch.object(etherdelta.random, 'randint', return_value=rng.randint(0, 10000000000)):
+                orders.append(client.create_order(side, expires, price, amount, token_addr, None, PRIVATE_KEY))
+        return orders
+
+    def test_matches_create_order(self):
+        client = etherdelta.Client()
+        self.assertEqual(client.create_orders(self.specs, PRIVATE_KEY, randomseed=7, workers=1), self.expected(client, 7))
+
+    def test_parallel_matches_create_order(self):
+        client = etherdelta.Client()
+        self.assertEqual(client.create_orders(self.specs, PRIVATE_KEY, randomseed=7, workers=2), self.expected(client, 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import etherdelta
+from etherdelta.orderbook import LocalOrderBook
+from etherdelta.session import SocketSession
+from etherdelta.snapshot import Snapshot, write_snapshot
+
+TOKEN = '0x' + 'a' * 40
+ETH = '0x0000000000000000000000000000000000000000'
+
+
+def order(order_id, price, expires=1000, side='sell', updated='2018-01-01T00:00:00.000Z'):
+    token_get, token_give = (TOKEN, ETH) if side == 'buy' else (ETH, TOKEN)
+    return {'id': order_id + '_' + side, 'price': str(price), 'expires': str(expires), 'tokenGet': token_get,
+            'tokenGive': token_give, 'amountGet': '1', 'amountGive': '1', 'updated': updated}
+
+
+BOOK = {'buys': [order('b1', 0.002, side='buy'), order('b2', 0.001, expires=50, side='buy')],
+        'sells': [order('s1', 0.003), order('s2', 0.004, expires=50)]}
+TICKERS = {'ETH_AAA': {'tokenAddr': TOKEN, 'last': 0.003}}
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'books.snap')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        self.assertEqual(write_snapshot(self.path, {'0x' + 'A' * 40: BOOK}, TICKERS, 42), 4)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(snapshot.tokens, [TOKEN])
+            self.assertEqual(snapshot.block_number, 42)
+            self.assertEqual(snapshot.tickers, TICKERS)
+            self.assertEqual(len(snapshot), 4)
+            self.assertEqual(snapshot.book(TOKEN), BOOK)
+
+    def test_expired_orders_are_dropped(self):
+        write_snapshot(self.path, {TOKEN: BOOK})
+        with Snapshot(self.path) as snapshot:
+            book = snapshot.book(TOKEN, block_number=50)
+            self.assertEqual([o['id'] for o in book['buys']], ['b1_buy'])
+            self.assertEqual([o['id'] for o in book['sells']], ['s1_sell'])
+
+    def test_concurrent_writers(self):
+        errors = []
+
+        def write():
+            try:
+                for _ in range(20):
+                    write_snapshot(self.path, {TOKEN: BOOK}, TICKERS, 42)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.dir), ['books.snap'])
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(snapshot.book(TOKEN), BOOK)
+
+    def test_client_save_and_restore(self):
+        client = etherdelta.Client()
+        book = LocalOrderBook(TOKEN)
+        book.load_snapshot(BOOK)
+        client.local_books[TOKEN] = book
+        self.assertEqual(client.save_snapshot(self.path), 4)
+
+        restored = etherdelta.Client()
+        session = SocketSession('ws://localhost:0')
+        with Snapshot(self.path) as snapshot:
+            books = restored._restore_books(snapshot, 10, session)
+        self.assertEqual(list(books), [TOKEN])
+        self.assertIs(restored.local_books[TOKEN], books[TOKEN])
+        self.assertEqual(books[TOKEN].snapshot(), book.snapshot())
+        # the restored book applies pushed updates right away
+        session._dispatch('orders', {'buys': [], 'sells': [dict(order('s1', 0.003), deleted=True)]})
+        self.assertIsNone(books[TOKEN].get('s1_sell'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest import mock
+
+from etherdelta import addressEtherDelta
+from etherdelta.signing import order_hash
+from etherdelta.validation import BAD_HASH, EXPIRED, MALFORMED, check_orders, check_row, order_row
+
+TOKEN = '0x' + '1' * 40
+ETH = '0x0000000000000000000000000000000000000000'
+
+
+def unsigned_order(nonce=1, expires=1000, order_id=None):
+    order = {'tokenGet': TOKEN, 'amountGet': '100', 'tokenGive': ETH, 'amountGive': '200',
+             'expires': str(expires), 'nonce': str(nonce), 'user': '0x' + '2' * 40}
+    hashhex = order_hash(addressEtherDelta, TOKEN, 100, ETH, 200, expires, nonce)
+    order['id'] = hashhex + '_buy' if order_id is None else order_id
+    return order, hashhex
+
+
+class CheckRowTest(unittest.TestCase):
+
+    def check(self, order, block_number=None):
+        return check_row(order_row(order), block_number, addressEtherDelta)
+
+    def test_matching_id_is_valid(self):
+        order, hashhex = unsigned_order()
+        self.assertIsNone(self.check(order))
+        order['id'] = '0x' + hashhex.upper() + '_sell'
+        self.assertIsNone(self.check(order))
+
+    def test_any_hash_prefix_is_checked(self):
+        order, hashhex = unsigned_order()
+        for order_id in (hashhex[:-1] + '_buy', hashhex[2:] + '_buy', '0x' + hashhex + '00', 'ab_sell'):
+            order['id'] = order_id
+            self.assertEqual(self.check(order), BAD_HASH, order_id)
+
+    def test_out_of_range_amounts_are_malformed(self):
+        for field, value in (('amountGet', str(2 ** 256)), ('amountGive', '-1'), ('nonce', str(2 ** 300))):
+            order, _ = unsigned_order()
+            order[field] = value
+            self.assertEqual(self.check(order), MALFORMED, field)
+
+    def test_one_malformed_order_does_not_fail_the_book(self):
+        orders = [unsigned_order(nonce)[0] for nonce in range(3)]
+        orders[1]['amountGet'] = str(2 ** 256)
+        self.assertEqual(check_orders(orders, 10, addressEtherDelta), [None, MALFORMED, None])
+
+    def test_expired(self):
+        order, _ = unsigned_order(expires=1000)
+        self.assertEqual(self.check(order, 1000), EXPIRED)
+
+
+class CheckOrdersTest(unittest.TestCase):
+
+    def test_large_books_stay_in_process_without_executor(self):
+        orders = [unsigned_order(nonce)[0] for nonce in range(600)]
+        with mock.patch('concurrent.futures.ProcessPoolExecutor') as pool:
+            reasons = check_orders(orders, 10, addressEtherDelta)
+        self.assertFalse(pool.called)
+        self.assertEqual(reasons, [None] * 600)
+
+
+if __name__ == '__main__':
+    unittest.main()